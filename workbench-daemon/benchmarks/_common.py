@@ -0,0 +1,75 @@
+"""
+Shared helpers for the database benchmarks.
+
+Benchmarks talk to a real MongoDB instance. Point them at a scratch database, since
+they create and drop their own collections:
+
+    MONGODB_URI=mongodb://localhost:27017 MONGODB_DB_NAME=feecc-benchmark make bench
+
+The engine agnostic ones run against SQLite as well, so the two engines can be compared:
+
+    STORAGE_ENGINE=sqlite SQLITE_DB_PATH=/tmp/feecc-benchmark.sqlite3 make bench
+"""
+import statistics
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any
+
+import bson
+from feecc_workbench.storage import StorageEngine, get_storage
+from pymongo import monitoring
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands and bytes sent to the server to show the number of round-trips per operation"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.bytes_sent = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.count += 1
+        self.bytes_sent += len(bson.encode(event.command))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+COMMAND_COUNTER = CommandCounter()
+monitoring.register(COMMAND_COUNTER)
+
+
+def count_commands() -> int:
+    """commands sent to MongoDB or statements executed by SQLite so far"""
+    sqlite_stats = get_storage().stats.get("sqlite")
+    return sqlite_stats["statements"] if sqlite_stats else COMMAND_COUNTER.count
+
+
+def drop_unit_cache(database: StorageEngine, unit_internal_id: str) -> None:
+    """make the next load of the unit a cold one. Only MongoDbWrapper caches units."""
+    if unit_cache := getattr(database, "_unit_cache", None):
+        unit_cache.invalidate([unit_internal_id])
+
+
+async def measure(func: Callable[[], Awaitable[Any]], repeat: int = 20) -> tuple[float, int]:
+    """Run the coroutine function several times, return median latency in ms and commands sent per run"""
+    await func()  # warm up
+    timings: list[float] = []
+    commands_before = count_commands()
+
+    for _ in range(repeat):
+        t1 = perf_counter()
+        await func()
+        timings.append((perf_counter() - t1) * 1000)
+
+    commands = (count_commands() - commands_before) // repeat
+    return statistics.median(timings), commands
+
+
+def print_table(header: list[str], rows: list[list[Any]]) -> None:
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    for row in [header, *rows]:
+        print("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))  # noqa: T201
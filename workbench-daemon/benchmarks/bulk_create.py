@@ -0,0 +1,69 @@
+"""
+Unit creation one by one VS in bulk.
+
+Creates a batch of units with a push_unit per unit (what POST /unit/new/{schema_id} does)
+and with a single insert_units call on units built from a precompiled biography template
+(what POST /unit/new/{schema_id}/bulk does).
+"""
+import asyncio
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from uuid import uuid4
+
+from _common import count_commands, print_table
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.storage import StorageEngine, get_storage
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import BiographyTemplate
+
+BATCH_SIZES = [10, 100, 500]
+STAGES_PER_UNIT = 20
+SCHEMA = ProductionSchema(
+    schema_id="bench_bulk_create",
+    unit_name="Benchmark unit",
+    production_stages=[
+        ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{i}") for i in range(STAGES_PER_UNIT)
+    ],
+)
+
+
+async def _create_one_by_one(database: StorageEngine, count: int) -> None:
+    for _ in range(count):
+        await database.push_unit(Unit(SCHEMA))
+
+
+async def _create_in_bulk(database: StorageEngine, count: int) -> None:
+    template = BiographyTemplate(SCHEMA)
+    units = []
+
+    for _ in range(count):
+        uuid = uuid4().hex
+        units.append(Unit(SCHEMA, uuid=uuid, biography=template.build(uuid)))
+
+    await database.insert_units(units)
+
+
+async def _measure(
+    database: StorageEngine, create: Callable[[StorageEngine, int], Awaitable[None]], count: int
+) -> tuple[float, int]:
+    commands_before = count_commands()
+    t1 = perf_counter()
+    await create(database, count)
+    return (perf_counter() - t1) * 1000, count_commands() - commands_before
+
+
+async def main() -> None:
+    database = get_storage()
+    rows = []
+
+    for count in BATCH_SIZES:
+        single_ms, single_commands = await _measure(database, _create_one_by_one, count)
+        bulk_ms, bulk_commands = await _measure(database, _create_in_bulk, count)
+        rows.append([count, f"{single_ms:.1f}", single_commands, f"{bulk_ms:.1f}", bulk_commands])
+
+    print_table(["units", "one by one, ms", "commands", "bulk, ms", "commands"], rows)
+    database.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Throughput of the conversion between units and their DB documents.
+
+Encodes and decodes a single stage and a unit with its stages the way they are written to and read from
+the DB and reports the operations per second. Runs in process, no DB is involved.
+"""
+import datetime as dt
+import timeit
+
+from _common import print_table
+from feecc_workbench._codec import decode_stage, decode_unit, encode_stage, encode_unit
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.Unit import Unit
+
+STAGES_PER_UNIT = 10
+STAGE_RUNS = 20_000
+UNIT_RUNS = 2_000
+SCHEMA = ProductionSchema(
+    schema_id="bench_codec",
+    unit_name="Benchmark unit",
+    production_stages=[
+        ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{i}") for i in range(STAGES_PER_UNIT)
+    ],
+)
+
+
+def _get_unit() -> Unit:
+    now = dt.datetime.now()
+    unit = Unit(SCHEMA, creation_time=now)
+
+    for stage in unit.biography:
+        stage.employee_name = "bench_employee"
+        stage.session_start_time = now
+        stage.session_end_time = now
+        stage.additional_info = {"bench": {"values": [1, 2, 3]}}
+        stage.prod_data_hashes = ["bench_hash_1", "bench_hash_2"]
+        stage.completed = True
+
+    return unit
+
+
+def main() -> None:
+    unit = _get_unit()
+    stage = unit.biography[0]
+    stage_dict = encode_stage(stage)
+    unit_dict = encode_unit(unit)
+    stage_dicts = [encode_stage(stage) for stage in unit.biography]
+
+    cases = [
+        ("stage encode", STAGE_RUNS, lambda: encode_stage(stage)),
+        ("stage decode", STAGE_RUNS, lambda: decode_stage(stage_dict, True)),
+        ("unit encode", UNIT_RUNS, lambda: (encode_unit(unit), [encode_stage(stage) for stage in unit.biography])),
+        (
+            "unit decode",
+            UNIT_RUNS,
+            lambda: decode_unit(unit_dict, SCHEMA, [decode_stage(stage_dict, True) for stage_dict in stage_dicts], []),
+        ),
+    ]
+    rows = []
+
+    for name, runs, func in cases:
+        elapsed = timeit.timeit(func, number=runs)
+        rows.append([name, runs, f"{elapsed / runs * 1e6:.1f}", round(runs / elapsed)])
+
+    print_table(["operation", "runs", "us per op", "ops/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
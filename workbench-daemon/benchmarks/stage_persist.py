@@ -0,0 +1,74 @@
+"""
+Production stage persistence cost per end_operation VS biography length.
+
+Compares writing only the modified stages and fields (dirty tracking) with
+rewriting every stage and the whole unit document on every push.
+Bytes sent are only tracked for MongoDB, SQLite reports the executed statements instead.
+"""
+import asyncio
+import statistics
+from time import perf_counter
+
+from _common import COMMAND_COUNTER, count_commands, print_table
+from feecc_workbench.Employee import Employee
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.storage import STORAGE_ENGINE, StorageEngine, StorageEngineType, get_storage
+from feecc_workbench.Unit import Unit
+
+BIOGRAPHY_LENGTHS = [10, 40, 100, 200]
+OPERATIONS = 10
+EMPLOYEE = Employee(rfid_card_id="0000000000", name="Benchmark", position="Benchmark")
+
+
+def _mark_everything_dirty(unit: Unit) -> None:
+    unit.mark_dirty(*unit._tracked_fields)
+    for stage in unit.biography:
+        stage.mark_dirty(*stage._tracked_fields)
+
+
+def _sent() -> int:
+    return count_commands() if STORAGE_ENGINE is StorageEngineType.sqlite else COMMAND_COUNTER.bytes_sent
+
+
+async def _run(database: StorageEngine, schema: ProductionSchema, full_rewrite: bool) -> tuple[float, float]:
+    unit = Unit(schema)
+    await database.push_unit(unit)
+    timings: list[float] = []
+    sent_before = _sent()
+
+    for _ in range(OPERATIONS):
+        unit.start_operation(EMPLOYEE, {"Benchmark": "true"})
+        await unit.end_operation(video_hashes=["QmBenchmark"])
+        if full_rewrite:
+            _mark_everything_dirty(unit)
+
+        t1 = perf_counter()
+        await database.push_unit(unit, include_components=False)
+        timings.append((perf_counter() - t1) * 1000)
+
+    return statistics.median(timings), (_sent() - sent_before) / OPERATIONS
+
+
+async def main() -> None:
+    database = get_storage()
+    rows = []
+
+    for length in BIOGRAPHY_LENGTHS:
+        schema = ProductionSchema(
+            schema_id=f"bench_stages_{length}",
+            unit_name=f"Benchmark unit, {length} stages",
+            production_stages=[
+                ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{i}") for i in range(length)
+            ],
+        )
+        full_ms, full_bytes = await _run(database, schema, full_rewrite=True)
+        dirty_ms, dirty_bytes = await _run(database, schema, full_rewrite=False)
+        rows.append([length, f"{full_ms:.2f}", int(full_bytes), f"{dirty_ms:.2f}", int(dirty_bytes)])
+
+    unit = "statements" if STORAGE_ENGINE is StorageEngineType.sqlite else "bytes"
+    print_table(["stages", "full, ms", f"full, {unit}", "dirty, ms", f"dirty, {unit}"], rows)
+    database.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
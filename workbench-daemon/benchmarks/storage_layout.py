@@ -0,0 +1,78 @@
+"""
+Split VS embedded storage layout.
+
+Measures the cold load of a unit (the unit cache is invalidated before every read)
+and the persist latency of an end_operation for both layouts across biography lengths.
+Layouts only exist in MongoDB, so the benchmark is skipped for the other engines.
+"""
+import asyncio
+import statistics
+from time import perf_counter
+
+from _common import COMMAND_COUNTER, measure, print_table
+from feecc_workbench.database import MongoDbWrapper, StorageLayout
+from feecc_workbench.Employee import Employee
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.storage import STORAGE_ENGINE, StorageEngineType
+from feecc_workbench.Unit import Unit
+
+BIOGRAPHY_LENGTHS = [10, 40, 100]
+OPERATIONS = 10
+EMPLOYEE = Employee(rfid_card_id="0000000000", name="Benchmark", position="Benchmark")
+
+
+async def _load(database: MongoDbWrapper, unit: Unit) -> tuple[float, int]:
+    async def load_cold() -> Unit:
+        database._unit_cache.invalidate([unit.internal_id])
+        return await database.get_unit_by_internal_id(unit.internal_id)
+
+    return await measure(load_cold)
+
+
+async def _persist(database: MongoDbWrapper, unit: Unit) -> tuple[float, int]:
+    timings: list[float] = []
+    commands_before = COMMAND_COUNTER.count
+
+    for _ in range(OPERATIONS):
+        unit.start_operation(EMPLOYEE, {"Benchmark": "true"})
+        await unit.end_operation(video_hashes=["QmBenchmark"])
+
+        t1 = perf_counter()
+        await database.push_unit(unit, include_components=False)
+        timings.append((perf_counter() - t1) * 1000)
+
+    return statistics.median(timings), (COMMAND_COUNTER.count - commands_before) // OPERATIONS
+
+
+async def main() -> None:
+    if STORAGE_ENGINE is not StorageEngineType.mongodb:
+        print(f"Storage layouts are not applicable to {STORAGE_ENGINE.value}, skipping")  # noqa: T201
+        return
+
+    database = MongoDbWrapper()
+    rows = []
+
+    for length in BIOGRAPHY_LENGTHS:
+        schema = ProductionSchema(
+            schema_id=f"bench_layout_stages_{length}",
+            unit_name=f"Benchmark unit, {length} stages",
+            production_stages=[
+                ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{i}") for i in range(length)
+            ],
+        )
+        await database.upsert_schemas([schema])
+
+        for layout in StorageLayout:
+            database._layout = layout
+            unit = Unit(schema)
+            await database.push_unit(unit)
+            load_ms, load_commands = await _load(database, unit)
+            persist_ms, persist_commands = await _persist(database, unit)
+            rows.append([length, layout.value, f"{load_ms:.2f}", load_commands, f"{persist_ms:.2f}", persist_commands])
+
+    print_table(["stages", "layout", "load, ms", "commands", "persist, ms", "commands"], rows)
+    database.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+Memory footprint of loaded units.
+
+Builds Unit objects from 10k unit documents the way a unit tree or a page of units is loaded
+from the DB and reports the memory they retain, the allocation peak and the time it takes.
+Runs in process, no DB is involved.
+"""
+import datetime as dt
+import gc
+import tracemalloc
+from time import perf_counter
+from uuid import uuid4
+
+from _common import print_table
+from feecc_workbench._db_utils import _get_unit_from_raw_db_data
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.Types import Document
+from feecc_workbench.Unit import Unit
+
+UNITS = 10_000
+STAGES_PER_UNIT = 10
+SCHEMA = ProductionSchema(
+    schema_id="bench_unit_memory",
+    unit_name="Benchmark unit",
+    production_stages=[
+        ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{i}") for i in range(STAGES_PER_UNIT)
+    ],
+)
+
+
+def _get_documents() -> list[tuple[Document, list[Document]]]:
+    now = dt.datetime.now()
+    documents = []
+
+    for _ in range(UNITS):
+        unit = Unit(SCHEMA, creation_time=now)
+        unit_dict: Document = {
+            "schema_id": SCHEMA.schema_id,
+            "uuid": unit.uuid,
+            "internal_id": unit.internal_id,
+            "components_internal_ids": [],
+            "creation_time": now,
+            "status": unit.status.value,
+        }
+        stage_dicts = [
+            {
+                "name": stage.name,
+                "parent_unit_uuid": unit.uuid,
+                "number": stage.number,
+                "schema_stage_id": stage.schema_stage_id,
+                "employee_name": "bench_employee",
+                "session_start_time": now,
+                "session_end_time": now,
+                "id": uuid4().hex,
+                "creation_time": now,
+                "completed": True,
+            }
+            for stage in unit.biography
+        ]
+        documents.append((unit_dict, stage_dicts))
+
+    return documents
+
+
+def _load(documents: list[tuple[Document, list[Document]]]) -> list[Unit]:
+    schemas = {SCHEMA.schema_id: SCHEMA}
+    return [
+        _get_unit_from_raw_db_data(unit_dict, {}, {unit_dict["uuid"]: stage_dicts}, schemas, 0)
+        for unit_dict, stage_dicts in documents
+    ]
+
+
+def main() -> None:
+    documents = _get_documents()
+    gc.collect()
+
+    tracemalloc.start()
+    t1 = perf_counter()
+    units = _load(documents)
+    elapsed_ms = (perf_counter() - t1) * 1000
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print_table(
+        ["units", "stages", "load, ms", "retained, MiB", "peak, MiB", "bytes per unit"],
+        [
+            [
+                len(units),
+                len(units) * STAGES_PER_UNIT,
+                f"{elapsed_ms:.1f}",
+                f"{retained / 2**20:.1f}",
+                f"{peak / 2**20:.1f}",
+                retained // len(units),
+            ]
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Unit summary VS full unit reconstruction.
+
+Measures what GET /unit/{unit_internal_id}/info costs when the unit is rebuilt with
+get_unit_by_internal_id (with a cold unit cache) and when only the summary fields are
+projected with get_unit_summary, for composite units of growing biography length.
+"""
+import asyncio
+
+from _common import drop_unit_cache, measure, print_table
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.storage import get_storage
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import UnitStatus
+
+BIOGRAPHY_LENGTHS = [10, 40, 100]
+COMPONENTS = 4
+
+
+def _get_schemas(length: int) -> list[ProductionSchema]:
+    stages = [ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{i}") for i in range(length)]
+    component_ids = [f"bench_summary_{length}_component_{i}" for i in range(COMPONENTS)]
+    components = [
+        ProductionSchema(schema_id=schema_id, unit_name="Benchmark component", production_stages=stages)
+        for schema_id in component_ids
+    ]
+    composite = ProductionSchema(
+        schema_id=f"bench_summary_{length}",
+        unit_name=f"Benchmark unit, {length} stages",
+        production_stages=stages,
+        required_components_schema_ids=component_ids,
+    )
+    return [composite, *components]
+
+
+async def main() -> None:
+    database = get_storage()
+    rows = []
+
+    for length in BIOGRAPHY_LENGTHS:
+        composite_schema, *component_schemas = _get_schemas(length)
+        await database.upsert_schemas([composite_schema, *component_schemas])
+        components = [Unit(schema) for schema in component_schemas]
+        unit = Unit(composite_schema, components_units=components)
+
+        for component in components:
+            component.featured_in_int_id = unit.internal_id
+            component.status = UnitStatus.built
+
+        await database.push_unit(unit)
+
+        async def load_full() -> Unit:
+            drop_unit_cache(database, unit.internal_id)
+            return await database.get_unit_by_internal_id(unit.internal_id)
+
+        full_ms, full_commands = await measure(load_full)
+        summary_ms, summary_commands = await measure(lambda: database.get_unit_summary(unit.internal_id))
+        rows.append([length, f"{full_ms:.2f}", full_commands, f"{summary_ms:.2f}", summary_commands])
+
+    print_table(["stages", "full, ms", "full commands", "summary, ms", "summary commands"], rows)
+    database.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Unit tree load latency VS tree depth.
+
+Builds chains of composite units of growing depth and measures how long
+get_unit_by_internal_id takes to load the whole tree and how many commands
+it sends to the server (statements for SQLite), both with a cold unit cache
+and when the tree is served from the cache.
+"""
+import asyncio
+
+from _common import drop_unit_cache, measure, print_table
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.storage import get_storage
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import UnitStatus
+
+DEPTHS = [1, 2, 4, 8, 12, 16]
+STAGES_PER_UNIT = 5
+
+
+def _get_schemas(depth: int) -> list[ProductionSchema]:
+    return [
+        ProductionSchema(
+            schema_id=f"bench_depth_{depth}_level_{level}",
+            unit_name=f"Benchmark unit, level {level}",
+            production_stages=[
+                ProductionSchemaStage(name=f"Stage {i}", stage_id=f"bench_stage_{level}_{i}")
+                for i in range(STAGES_PER_UNIT)
+            ],
+            required_components_schema_ids=[f"bench_depth_{depth}_level_{level + 1}"] if level < depth - 1 else None,
+        )
+        for level in range(depth)
+    ]
+
+
+def _build_chain(schemas: list[ProductionSchema]) -> Unit:
+    component: Unit | None = None
+
+    for schema in reversed(schemas):
+        unit = Unit(schema, components_units=[component] if component else None)
+        if component is not None:
+            component.featured_in_int_id = unit.internal_id
+            component.status = UnitStatus.built
+        component = unit
+
+    assert component is not None
+    return component
+
+
+async def main() -> None:
+    database = get_storage()
+    rows = []
+
+    for depth in DEPTHS:
+        schemas = _get_schemas(depth)
+        await database.upsert_schemas(schemas)
+        root = _build_chain(schemas)
+        await database.push_unit(root)
+
+        async def load_cold() -> Unit:
+            drop_unit_cache(database, root.internal_id)
+            return await database.get_unit_by_internal_id(root.internal_id)
+
+        latency, commands = await measure(load_cold)
+        cached_latency, cached_commands = await measure(lambda: database.get_unit_by_internal_id(root.internal_id))
+        rows.append(
+            [depth, depth * STAGES_PER_UNIT, f"{latency:.2f}", commands, f"{cached_latency:.2f}", cached_commands]
+        )
+
+    print_table(["depth", "stages", "load, ms", "commands", "cached, ms", "cached commands"], rows)
+    database.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,6 @@
-from dependencies import get_employee_by_card_id
+from dataclasses import asdict
+
+from dependencies import get_employee, get_employee_by_card_id
 from fastapi import APIRouter, Depends, HTTPException
 from feecc_workbench import models as mdl
 from feecc_workbench.Employee import Employee
@@ -27,13 +29,15 @@ def get_employee_data(
 
 @router.post("/log-in", response_model=mdl.EmployeeOut)
 def log_in_employee(
-    employee: mdl.EmployeeWCardModel = Depends(get_employee_by_card_id),  # noqa: B008
+    employee: Employee = Depends(get_employee),  # noqa: B008
 ) -> mdl.EmployeeOut:
     """handle logging in the Employee at a given Workbench"""
     try:
-        WORKBENCH.log_in(Employee(rfid_card_id=employee.rfid_card_id, name=employee.name, position=employee.position))
+        WORKBENCH.log_in(employee)
         return mdl.EmployeeOut(
-            status_code=status.HTTP_200_OK, detail="Employee logged in successfully", employee_data=employee
+            status_code=status.HTTP_200_OK,
+            detail="Employee logged in successfully",
+            employee_data=mdl.EmployeeWCardModel(**asdict(employee)),
         )
 
     except StateForbiddenError as e:
@@ -1,9 +1,14 @@
-from dependencies import get_revision_pending_units, get_schema_by_id, get_unit_by_internal_id
-from fastapi import APIRouter, Depends, HTTPException
+from collections.abc import AsyncGenerator
+
+from dependencies import get_revision_pending_units, get_schema_by_id, get_unit_by_internal_id, get_unit_summary
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from feecc_workbench import models as mdl
 from feecc_workbench.exceptions import StateForbiddenError
 from feecc_workbench.states import State
+from feecc_workbench.storage import get_storage
 from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import UnitStatus, UnitSummary
 from feecc_workbench.WorkBench import WorkBench
 from loguru import logger
 from starlette import status
@@ -33,8 +38,28 @@ async def create_unit(schema: mdl.ProductionSchema = Depends(get_schema_by_id))
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)) from e
 
 
+@router.post("/new/{schema_id}/bulk", response_model=mdl.UnitsOut)
+async def create_units(
+    schema: mdl.ProductionSchema = Depends(get_schema_by_id),  # noqa: B008
+    count: int = Query(..., ge=1, le=1000),  # noqa: B008
+) -> mdl.UnitsOut:
+    """handle creation of a batch of units of the same schema"""
+    try:
+        units: list[Unit] = await WORKBENCH.create_new_units(schema, count)
+        logger.info(f"Initialized {len(units)} new units of schema {schema.schema_id}")
+        return mdl.UnitsOut(
+            status_code=status.HTTP_200_OK,
+            detail=f"{len(units)} new units created successfully",
+            unit_internal_ids=[unit.internal_id for unit in units],
+        )
+
+    except Exception as e:
+        logger.error(f"Exception occurred while creating new Units: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)) from e
+
+
 @router.get("/{unit_internal_id}/info", response_model=mdl.UnitInfo)
-def get_unit_data(unit: Unit = Depends(get_unit_by_internal_id)) -> mdl.UnitInfo:  # noqa: B008
+def get_unit_data(unit: UnitSummary = Depends(get_unit_summary)) -> mdl.UnitInfo:  # noqa: B008
     """return data for a Unit with matching ID"""
     return mdl.UnitInfo(
         status_code=status.HTTP_200_OK,
@@ -58,24 +83,39 @@ def get_unit_data(unit: Unit = Depends(get_unit_by_internal_id)) -> mdl.UnitInfo
             if not stage.completed
         ],
         unit_components=unit.components_schema_ids or None,
-        schema_id=unit.schema.schema_id,
+        schema_id=unit.schema_id,
     )
 
 
 @router.get("/pending_revision", response_model=mdl.UnitOutPending)
 def get_revision_pending(
-    units: list[dict[str, str]] = Depends(get_revision_pending_units)  # noqa: B008
+    page: tuple[list[dict[str, str]], str | None] = Depends(get_revision_pending_units)  # noqa: B008
 ) -> mdl.UnitOutPending:
-    """return all units staged for revision"""
+    """return a page of units staged for revision. Pass `next_cursor` as `cursor` to get the next page."""
+    units, next_cursor = page
     return mdl.UnitOutPending(
         status_code=status.HTTP_200_OK,
         detail=f"{len(units)} units awaiting revision.",
         units=[
             mdl.UnitOutPendingEntry(unit_internal_id=unit["internal_id"], unit_name=unit["unit_name"]) for unit in units
         ],
+        next_cursor=next_cursor,
     )
 
 
+async def revision_pending_generator() -> AsyncGenerator[str, None]:
+    """Revision pending units generator for NDJSON streaming"""
+    async for unit in get_storage().iter_unit_ids_and_names_by_status(UnitStatus.revision):
+        entry = mdl.UnitOutPendingEntry(unit_internal_id=unit["internal_id"], unit_name=unit["unit_name"])
+        yield entry.json() + "\n"
+
+
+@router.get("/pending_revision/stream")
+def stream_revision_pending() -> StreamingResponse:
+    """stream all units staged for revision as newline delimited JSON"""
+    return StreamingResponse(revision_pending_generator(), media_type="application/x-ndjson")
+
+
 @router.post("/upload", response_model=mdl.GenericResponse)
 async def unit_upload_record() -> mdl.GenericResponse:
     """handle Unit lifecycle end"""
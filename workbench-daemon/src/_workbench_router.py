@@ -4,11 +4,12 @@ from collections.abc import AsyncGenerator
 from dependencies import get_schema_by_id, get_unit_by_internal_id, identify_sender
 from fastapi import APIRouter, Depends, HTTPException, status
 from feecc_workbench import models as mdl
-from feecc_workbench.database import MongoDbWrapper
 from feecc_workbench.Employee import Employee
 from feecc_workbench.exceptions import EmployeeNotFoundError
 from feecc_workbench.Messenger import messenger
+from feecc_workbench.stage_stats import StageDurationStats
 from feecc_workbench.states import State
+from feecc_workbench.storage import get_storage
 from feecc_workbench.Unit import Unit
 from feecc_workbench.WorkBench import STATE_SWITCH_EVENT, WorkBench
 from loguru import logger
@@ -129,7 +130,7 @@ async def end_operation(workbench_data: mdl.WorkbenchExtraDetailsWithoutStage) -
 @router.get("/production-schemas/names", response_model=mdl.SchemasList)
 async def get_schemas() -> mdl.SchemasList:
     """get all available schemas"""
-    all_schemas = {schema.schema_id: schema for schema in await MongoDbWrapper().get_all_schemas()}
+    all_schemas = {schema.schema_id: schema for schema in await get_storage().get_all_schemas()}
     handled_schemas = set()
 
     def get_schema_list_entry(schema: mdl.ProductionSchema) -> mdl.SchemaListEntry:
@@ -160,6 +161,16 @@ async def get_schemas() -> mdl.SchemasList:
     )
 
 
+@router.get("/database/stats", response_model=mdl.DatabaseStats)
+def get_database_stats() -> mdl.DatabaseStats:
+    """get in-process database cache statistics"""
+    return mdl.DatabaseStats(
+        status_code=status.HTTP_200_OK,
+        detail="Database statistics retrieved",
+        stats=get_storage().stats,
+    )
+
+
 @router.get("/production-schemas/{schema_id}", response_model=mdl.ProductionSchemaResponse)
 async def get_schema(
     schema: mdl.ProductionSchema = Depends(get_schema_by_id),  # noqa: B008
@@ -172,13 +183,54 @@ async def get_schema(
     )
 
 
+@router.get("/production-schemas/{schema_id}/stage-stats", response_model=mdl.StageStatsReport)
+async def get_stage_stats(
+    schema: mdl.ProductionSchema = Depends(get_schema_by_id),  # noqa: B008
+) -> mdl.StageStatsReport:
+    """get duration statistics of the schema stages, the slowest ones first"""
+    schema_stats = await get_storage().get_stage_duration_stats(schema.schema_id)
+    all_stats = {stats.schema_stage_id: stats for stats in schema_stats}
+    entries = []
+
+    for stage in schema.production_stages or []:
+        stats = all_stats.get(stage.stage_id, StageDurationStats(stage.stage_id))
+        median = stats.quantile(0.5)
+        entries.append(
+            mdl.StageStatsEntry(
+                stage_id=stage.stage_id,
+                stage_name=stage.name,
+                expected_duration_seconds=stage.duration_seconds,
+                count=stats.count,
+                mean_seconds=stats.mean_seconds,
+                min_seconds=stats.min_seconds,
+                max_seconds=stats.max_seconds,
+                p50_seconds=median,
+                p90_seconds=stats.quantile(0.9),
+                p99_seconds=stats.quantile(0.99),
+                overrun=median / stage.duration_seconds if median is not None and stage.duration_seconds else None,
+            )
+        )
+
+    entries.sort(key=lambda entry: entry.p50_seconds or 0.0, reverse=True)
+
+    return mdl.StageStatsReport(
+        status_code=status.HTTP_200_OK,
+        detail=f"Gathered duration statistics of {len(entries)} stages",
+        schema_id=schema.schema_id,
+        stages=entries,
+    )
+
+
 async def handle_barcode_event(event_string: str) -> None:
     """Handle HID event produced by the barcode reader"""
     if WORKBENCH.state == State.PRODUCTION_STAGE_ONGOING_STATE:
         await WORKBENCH.end_operation()
         return
 
-    unit = await get_unit_by_internal_id(event_string)
+    if WORKBENCH.unit is not None and WORKBENCH.unit.internal_id == event_string:
+        unit = WORKBENCH.unit
+    else:
+        unit = await get_unit_by_internal_id(event_string)
 
     match WORKBENCH.state:
         case State.AUTHORIZED_IDLING_STATE:
@@ -202,7 +254,7 @@ async def handle_rfid_event(event_string: str) -> None:
         return
 
     try:
-        employee: Employee = await MongoDbWrapper().get_employee_by_card_id(event_string)
+        employee: Employee = await get_storage().get_employee_by_card_id(event_string)
     except EmployeeNotFoundError as e:
         messenger.warning("Сотрудник не найден.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
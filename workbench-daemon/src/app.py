@@ -5,11 +5,13 @@ import _unit_router
 import _workbench_router
 import uvicorn
 from _logging import HANDLERS
-from fastapi import FastAPI, status
+from fastapi import FastAPI, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from feecc_workbench.database import MongoDbWrapper
+from feecc_workbench.events import ChangeEventType, EventFilter, change_event_generator
 from feecc_workbench.Messenger import MessageLevels, message_generator, messenger
 from feecc_workbench.models import GenericResponse
+from feecc_workbench.storage import get_storage
+from feecc_workbench.unit_utils import UnitStatus
 from feecc_workbench.WorkBench import WorkBench
 from loguru import logger
 from sse_starlette import EventSourceResponse
@@ -36,8 +38,8 @@ app.add_middleware(
 
 
 @app.on_event("startup")
-def startup_event() -> None:
-    MongoDbWrapper()
+async def startup_event() -> None:
+    await get_storage().connect()
     app_version = os.getenv("VERSION", "Unknown")
     logger.info(f"Runtime app version: {app_version}")
 
@@ -45,7 +47,8 @@ def startup_event() -> None:
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     await WorkBench().shutdown()
-    MongoDbWrapper().close_connection()
+    await get_storage().flush_pending_writes()
+    get_storage().close_connection()
 
 
 @app.get("/notifications", tags=["notifications"])
@@ -62,5 +65,24 @@ async def emit_notification(level: MessageLevels, message: str) -> GenericRespon
     return GenericResponse(status_code=status.HTTP_200_OK, detail="Notification emitted")
 
 
+@app.get("/events", tags=["events"])
+async def stream_change_events(
+    types: list[ChangeEventType] | None = Query(None),  # noqa: B008
+    unit_internal_id: str | None = None,
+    unit_uuid: str | None = None,
+    schema_id: str | None = None,
+    unit_status: UnitStatus | None = Query(None, alias="status"),  # noqa: B008
+) -> EventSourceResponse:
+    """Stream the changes of units and their production stages made by any workbench into an SSE stream"""
+    event_filter = EventFilter(
+        types=frozenset(types) if types else None,
+        unit_uuid=unit_uuid,
+        unit_internal_id=unit_internal_id,
+        schema_id=schema_id,
+        status=unit_status.value if unit_status is not None else None,
+    )
+    return EventSourceResponse(change_event_generator(event_filter))
+
+
 if __name__ == "__main__":
     uvicorn.run("app:app", port=5000)
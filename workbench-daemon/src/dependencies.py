@@ -1,14 +1,14 @@
 from dataclasses import asdict
 from os import getenv
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Query, status
 from feecc_workbench import models
-from feecc_workbench.database import MongoDbWrapper
 from feecc_workbench.Employee import Employee
 from feecc_workbench.exceptions import EmployeeNotFoundError, UnitNotFoundError
 from feecc_workbench.Messenger import messenger
+from feecc_workbench.storage import get_storage
 from feecc_workbench.Unit import Unit
-from feecc_workbench.unit_utils import UnitStatus
+from feecc_workbench.unit_utils import UnitStatus, UnitSummary
 from feecc_workbench.utils import is_a_ean13_barcode
 from loguru import logger
 
@@ -18,34 +18,57 @@ HID_DEVICES_BARCODE_READER: str = getenv("HID_DEVICES_BARCODE_READER")
 
 async def get_unit_by_internal_id(unit_internal_id: str) -> Unit:
     try:
-        return await MongoDbWrapper().get_unit_by_internal_id(unit_internal_id)
+        return await get_storage().get_unit_by_internal_id(unit_internal_id)
 
     except UnitNotFoundError as e:
         messenger.warning("Изделие не найдено")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
 
-async def get_employee_by_card_id(employee_data: models.EmployeeID) -> models.EmployeeWCardModel:
+async def get_unit_summary(unit_internal_id: str) -> UnitSummary:
+    try:
+        return await get_storage().get_unit_summary(unit_internal_id)
+
+    except UnitNotFoundError as e:
+        messenger.warning("Изделие не найдено")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+
+
+async def get_employee(employee_data: models.EmployeeID) -> Employee:
     try:
-        employee: Employee = await MongoDbWrapper().get_employee_by_card_id(employee_data.employee_rfid_card_no)
-        return models.EmployeeWCardModel(**asdict(employee))
+        return await get_storage().get_employee_by_card_id(employee_data.employee_rfid_card_no)
 
     except EmployeeNotFoundError as e:
         messenger.warning("Сотрудник не найден")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
 
+async def get_employee_by_card_id(employee_data: models.EmployeeID) -> models.EmployeeWCardModel:
+    employee: Employee = await get_employee(employee_data)
+    return models.EmployeeWCardModel(**asdict(employee))
+
+
 async def get_schema_by_id(schema_id: str) -> models.ProductionSchema:
     """get the specified production schema"""
     try:
-        return await MongoDbWrapper().get_schema_by_id(schema_id)
+        return await get_storage().get_schema_by_id(schema_id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
 
-async def get_revision_pending_units() -> list[dict[str, str]]:
-    """get all the units headed for revision"""
-    return await MongoDbWrapper().get_unit_ids_and_names_by_status(UnitStatus.revision)  # type: ignore
+async def get_revision_pending_units(
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),  # noqa: B008
+) -> tuple[list[dict[str, str]], str | None]:
+    """get a page of the units headed for revision and a cursor pointing to the next page"""
+    try:
+        page: tuple[list[dict[str, str]], str | None] = await get_storage().get_unit_ids_and_names_by_status(
+            UnitStatus.revision, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)) from e
+
+    return page
 
 
 def identify_sender(event: models.HidEvent) -> models.HidEvent:
@@ -1,23 +1,43 @@
 import datetime as dt
 from dataclasses import dataclass, field
+from typing import ClassVar
 from uuid import uuid4
 
+from ._dirty_tracking import DirtyTracker
 from .Types import AdditionalInfo
 
 
-@dataclass
-class ProductionStage:
+@dataclass(slots=True)
+class ProductionStage(DirtyTracker):
+    _tracked_fields: ClassVar[frozenset[str]] = frozenset(
+        {
+            "name",
+            "parent_unit_uuid",
+            "number",
+            "schema_stage_id",
+            "employee_name",
+            "session_start_time",
+            "session_end_time",
+            "ended_prematurely",
+            "prod_data_hashes",
+            "additional_info",
+            "id",
+            "creation_time",
+            "completed",
+        }
+    )
+
     name: str
     parent_unit_uuid: str
     number: int
     schema_stage_id: str
     employee_name: str | None = None
-    session_start_time: str | None = None
-    session_end_time: str | None = None
+    session_start_time: dt.datetime | None = None
+    session_end_time: dt.datetime | None = None
     ended_prematurely: bool = False
     prod_data_hashes: list[str] | None = None
     additional_info: AdditionalInfo | None = None
     id: str = field(default_factory=lambda: uuid4().hex)  # noqa: A003
     is_in_db: bool = False
-    creation_time: dt.datetime = field(default_factory=lambda: dt.datetime.now())
+    creation_time: dt.datetime = field(default_factory=dt.datetime.now)
     completed: bool = False
@@ -1,26 +1,75 @@
 from __future__ import annotations
 
 import datetime as dt
-from functools import reduce
-from operator import add
-from typing import no_type_check
+from collections.abc import Iterator, Sequence
+from typing import ClassVar, no_type_check
 from uuid import uuid4
 
 from loguru import logger
 
-from ._Barcode import Barcode
+from ._Barcode import Barcode, get_internal_id, get_unit_code
+from ._dirty_tracking import DirtyTracker
 from .Employee import Employee
 from .Messenger import messenger
 from .models import ProductionSchema
 from .ProductionStage import ProductionStage
 from .Types import AdditionalInfo
-from .unit_utils import UnitStatus, biography_factory
-from .utils import TIMESTAMP_FORMAT, timestamp
+from .unit_tree import UnitNode, UnitTree
+from .unit_utils import STAGE_NUMBER_STEP, UnitStatus, biography_factory
+from .utils import timestamp
 
 
-class Unit:
+def get_initial_status(schema: ProductionSchema, status: UnitStatus | str) -> UnitStatus:
+    """units without production stages are built right away"""
+    status = UnitStatus(status) if isinstance(status, str) else status
+
+    if not schema.production_stages and status is UnitStatus.production:
+        return UnitStatus.built
+
+    return status
+
+
+class Unit(DirtyTracker):
     """Unit class corresponds to one uniquely identifiable physical production unit"""
 
+    __slots__ = (
+        "_status",
+        "schema",
+        "uuid",
+        "internal_id",
+        "passport_ipfs_cid",
+        "txn_hash",
+        "serial_number",
+        "components_units",
+        "featured_in_int_id",
+        "employee",
+        "biography",
+        "is_in_db",
+        "creation_time",
+        "_component_slots",
+        "_pending_stage_index",
+        "_assembly_time",
+        "_tree_assembly_time",
+        "_parent",
+        "_tree",
+    )
+
+    _tracked_fields: ClassVar[frozenset[str]] = frozenset(
+        {
+            "schema",
+            "uuid",
+            "internal_id",
+            "passport_ipfs_cid",
+            "txn_hash",
+            "serial_number",
+            "components_units",
+            "featured_in_int_id",
+            "creation_time",
+            "status",
+        }
+    )
+    _status: UnitStatus  # behind the status property, which keeps the indexes of the unit trees up to date
+
     def __init__(  # noqa: CFQ002,CCR001
         self,
         schema: ProductionSchema,
@@ -28,7 +77,7 @@ class Unit:
         internal_id: str | None = None,
         is_in_db: bool | None = None,
         biography: list[ProductionStage] | None = None,
-        components_units: list[Unit] | None = None,
+        components_units: Sequence[UnitNode] | None = None,
         featured_in_int_id: str | None = None,
         passport_ipfs_cid: str | None = None,
         txn_hash: str | None = None,
@@ -36,34 +85,92 @@ class Unit:
         creation_time: dt.datetime | None = None,
         status: UnitStatus | str = UnitStatus.production,
     ) -> None:
-        self.status: UnitStatus = UnitStatus(status) if isinstance(status, str) else status
-
-        if not schema.production_stages and self.status is UnitStatus.production:
-            self.status = UnitStatus.built
-
+        # units loaded from the DB skip this, keep `_codec.decode_unit` in sync with the attributes set here
+        self.status: UnitStatus = get_initial_status(schema, status)
         self.schema: ProductionSchema = schema
         self.uuid: str = uuid or uuid4().hex
-        self.barcode: Barcode = Barcode(str(int(self.uuid, 16))[:12])
-        self.internal_id: str = internal_id or str(self.barcode.barcode.get_fullcode())
+        self.internal_id: str = internal_id or get_internal_id(self.uuid)
         self.passport_ipfs_cid: str | None = passport_ipfs_cid
         self.txn_hash: str | None = txn_hash
         self.serial_number: str | None = serial_number
-        self.components_units: list[Unit] = components_units or []
+        self.components_units: list[UnitNode] = list(components_units or [])
         self.featured_in_int_id: str | None = featured_in_int_id
         self.employee: Employee | None = None
         self.biography: list[ProductionStage] = biography or biography_factory(schema, self.uuid)
+        self._pending_stage_index: int = 0  # all the stages before it are completed
+        self._assembly_time: dt.timedelta | None = None  # of the ended stages, summed up on the first access
+        self._tree_assembly_time: tuple[dt.timedelta, list[Unit]] | None = None
+        self._parent: UnitNode | None = None
+        self._tree: UnitTree | None = None
         self.is_in_db: bool = is_in_db or False
         self.creation_time: dt.datetime = creation_time or dt.datetime.now()
 
         if self.components_units:
-            slots: dict[str, Unit | None] = {u.schema.schema_id: u for u in self.components_units}
+            slots: dict[str, UnitNode | None] = {u.schema.schema_id: u for u in self.components_units}
             assert all(
                 k in (self.schema.required_components_schema_ids or []) for k in slots
             ), "Provided components are not a part of the unit schema"
         else:
             slots = {schema_id: None for schema_id in (schema.required_components_schema_ids or [])}
 
-        self._component_slots: dict[str, Unit | None] = slots
+        self._component_slots: dict[str, UnitNode | None] = slots
+
+        for component in self.components_units:
+            component.parent = self
+
+    @property
+    def status(self) -> UnitStatus:
+        return self._status
+
+    @status.setter
+    def status(self, status: UnitStatus) -> None:
+        previous: UnitStatus | None = getattr(self, "_status", None)
+        object.__setattr__(self, "_status", status)
+
+        if previous is not None and previous is not status:
+            for unit in self._get_lineage():
+                if unit._tree is not None:
+                    unit._tree.update_status(self, previous)
+
+    @property
+    def parent(self) -> UnitNode | None:
+        """the unit it is a component of"""
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent: UnitNode | None) -> None:
+        self._parent = parent
+
+    @property
+    def loaded_unit(self) -> Unit:
+        """the unit itself, see `UnitProxy`"""
+        return self
+
+    def load(self) -> Unit:
+        """the unit itself, see `UnitProxy`"""
+        return self
+
+    @property
+    def tree(self) -> UnitTree:
+        """index of the unit and its component tree, built on first access and kept up to date afterwards"""
+        if self._tree is None:
+            self._tree = UnitTree(self)
+
+        return self._tree
+
+    def _get_lineage(self) -> Iterator[Unit]:
+        """the unit and all the loaded units it is a component of, up to the root of the tree"""
+        unit: UnitNode | None = self
+
+        while unit is not None:
+            if (loaded := unit.loaded_unit) is not None:
+                yield loaded
+
+            unit = unit.parent
+
+    @property
+    def barcode(self) -> Barcode:
+        return Barcode(get_unit_code(self.uuid))
 
     @property
     def components_schema_ids(self) -> list[str]:
@@ -83,26 +190,78 @@ class Unit:
 
     @property
     def next_pending_operation(self) -> ProductionStage | None:
-        """get next pending operation if any"""
-        return next((operation for operation in self.biography if not operation.completed), None)
+        """
+        get next pending operation if any. Stages are only completed in order, so the cursor
+        to the first pending one only moves forward.
+        """
+        biography, index = self.biography, self._pending_stage_index
+
+        while index < len(biography) and biography[index].completed:
+            index += 1
+
+        self._pending_stage_index = index
+        return biography[index] if index < len(biography) else None
+
+    @property
+    def _ended_stages_time(self) -> dt.timedelta:
+        if self._assembly_time is None:
+            self._assembly_time = sum(
+                (
+                    stage.session_end_time - stage.session_start_time
+                    for stage in self.biography
+                    if stage.session_start_time is not None and stage.session_end_time is not None
+                ),
+                dt.timedelta(0),
+            )
+
+        return self._assembly_time
+
+    @property
+    def _ongoing_stage(self) -> ProductionStage | None:
+        stage = self.next_pending_operation
+        return stage if stage is not None and stage.session_start_time is not None else None
+
+    def _ongoing_stage_time(self) -> dt.timedelta:
+        stage = self._ongoing_stage
+        return dt.datetime.now() - stage.session_start_time if stage is not None else dt.timedelta(0)  # type: ignore
 
     @property
     def total_assembly_time(self) -> dt.timedelta:
-        """calculate total time spent during all production stages"""
+        """total time spent during all production stages, the ongoing one included"""
+        return self._ended_stages_time + self._ongoing_stage_time()
 
-        def stage_len(stage: ProductionStage) -> dt.timedelta:
-            if stage.session_start_time is None:
-                return dt.timedelta(0)
+    def _get_tree_assembly_time(self) -> tuple[dt.timedelta, list[Unit]]:
+        """time of the ended stages of the unit tree and the units of the tree with an ongoing stage"""
+        if self._tree_assembly_time is None:
+            ended_time, ongoing = self._ended_stages_time, [self] if self._ongoing_stage is not None else []
 
-            start_time: dt.datetime = dt.datetime.strptime(stage.session_start_time, TIMESTAMP_FORMAT)
-            end_time: dt.datetime = (
-                dt.datetime.strptime(stage.session_end_time, TIMESTAMP_FORMAT)
-                if stage.session_end_time is not None
-                else dt.datetime.now()
-            )
-            return end_time - start_time
+            for component in self.components_units:
+                component_ended_time, component_ongoing = component.load()._get_tree_assembly_time()
+                ended_time += component_ended_time
+                ongoing.extend(component_ongoing)
 
-        return reduce(add, (stage_len(stage) for stage in self.biography)) if self.biography else dt.timedelta(0)
+            self._tree_assembly_time = ended_time, ongoing
+
+        return self._tree_assembly_time
+
+    @property
+    def total_tree_assembly_time(self) -> dt.timedelta:
+        """
+        total assembly time of the unit and all its components. The time of the ended stages of the tree
+        is memoised until a stage of the tree starts or ends or a component is assigned.
+        """
+        ended_time, ongoing = self._get_tree_assembly_time()
+        return sum((unit._ongoing_stage_time() for unit in ongoing), ended_time)
+
+    def _invalidate_tree_assembly_time(self) -> None:
+        """forget the memoised tree assembly time of the unit and all the units it is a component of"""
+        for unit in self._get_lineage():
+            unit._tree_assembly_time = None
+
+    def prefetch_components(self) -> None:
+        """load the whole component tree at once, e.g. before walking all of it"""
+        for unit in self.tree:
+            unit.load()
 
     @no_type_check
     def assigned_components(self) -> dict[str, str | None] | None:
@@ -149,7 +308,14 @@ class Unit:
 
         self._component_slots[component.schema.schema_id] = component
         self.components_units.append(component)
+        self.mark_dirty("components_units")
         component.featured_in_int_id = self.internal_id
+        component.parent = self
+        self._invalidate_tree_assembly_time()
+
+        for unit in self._get_lineage():
+            if unit._tree is not None:
+                unit._tree.add_component(self, component)
         logger.info(f"Component {component.model_name} has been assigned to a composite Unit {self.model_name}")
         messenger.success(f'Компонент {component.model_name} присвоен изделию {self.model_name}.')
 
@@ -164,30 +330,48 @@ class Unit:
         operation.session_start_time = timestamp()
         operation.additional_info = additional_info
         operation.employee_name = employee.passport_code
-        self.biography[operation.number] = operation
+        self._invalidate_tree_assembly_time()
         logger.debug(f"Started production stage {operation.name} for unit {self.uuid}")
 
+    def cancel_operation(self) -> None:
+        """undo start_operation, e.g. when the started stage could not be persisted"""
+        operation = self._ongoing_stage
+        assert operation is not None, f"Unit {self.uuid} has no ongoing operations"
+        operation.session_start_time = None
+        operation.additional_info = None
+        operation.employee_name = None
+        self._invalidate_tree_assembly_time()
+        logger.debug(f"Cancelled production stage {operation.name} for unit {self.uuid}")
+
     def _duplicate_current_operation(self) -> None:
+        """
+        Insert a copy of the current stage right after it. The copy takes the next free number before the
+        following stage, so the following stages keep their numbers and need not be written again. Only once
+        the gap is used up (or for the densely numbered stages of the earlier versions) the following stages
+        are spread out again.
+        """
         cur_stage = self.next_pending_operation
         assert cur_stage is not None, "No pending stages to duplicate"
-        target_pos = cur_stage.number + 1
+        target_pos = self._pending_stage_index + 1
         dup_operation = ProductionStage(
             name=cur_stage.name,
             parent_unit_uuid=cur_stage.parent_unit_uuid,
-            number=target_pos,
+            number=cur_stage.number + 1,
             schema_stage_id=cur_stage.schema_stage_id,
         )
-        self.biography.insert(target_pos, dup_operation)
 
-        for i in range(target_pos + 1, len(self.biography)):
-            self.biography[i].number += 1
+        if target_pos < len(self.biography) and self.biography[target_pos].number <= dup_operation.number:
+            for i, stage in enumerate(self.biography[target_pos:], start=1):
+                stage.number = cur_stage.number + i * STAGE_NUMBER_STEP
+
+        self.biography.insert(target_pos, dup_operation)
 
     async def end_operation(
         self,
         video_hashes: list[str] | None = None,
         additional_info: AdditionalInfo | None = None,
         premature: bool = False,
-        override_timestamp: str | None = None,
+        override_timestamp: dt.datetime | None = None,
     ) -> None:
         """
         wrap up the session when video recording stops and save video data
@@ -199,7 +383,8 @@ class Unit:
             raise ValueError("No pending operations found")
 
         logger.info(f"Ending production stage {operation.name} on unit {self.uuid}")
-        operation.session_end_time = override_timestamp or timestamp()
+        end_time = override_timestamp or timestamp()
+        operation.session_end_time = end_time
 
         if premature:
             self._duplicate_current_operation()
@@ -213,9 +398,13 @@ class Unit:
             operation.additional_info = {**operation.additional_info, **(additional_info or {})}
 
         operation.completed = True
-        self.biography[operation.number] = operation
 
-        if all(stage.completed for stage in self.biography):
+        if self._assembly_time is not None and operation.session_start_time is not None:
+            self._assembly_time += end_time - operation.session_start_time
+
+        self._invalidate_tree_assembly_time()
+
+        if self.next_pending_operation is None:
             prev_status = self.status
             self.status = UnitStatus.built
             logger.info(
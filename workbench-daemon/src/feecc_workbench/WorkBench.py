@@ -1,9 +1,10 @@
 import asyncio
+import datetime as dt
 from pathlib import Path
+from uuid import uuid4
 
 from loguru import logger
 
-from .database import MongoDbWrapper
 from .Employee import Employee
 from .Camera import Camera
 from .exceptions import StateForbiddenError
@@ -11,11 +12,14 @@ from .ipfs import publish_file
 from .Messenger import messenger
 from .models import ProductionSchema
 from .passport_generator import construct_unit_passport
+from .ProductionStage import ProductionStage
 from .Singleton import SingletonMeta
+from .stage_stats import get_stage_duration
 from .states import STATE_TRANSITION_MAP, State
+from .storage import StorageEngine, get_storage
 from .Types import AdditionalInfo
 from .Unit import Unit
-from .unit_utils import UnitStatus, get_first_unit_matching_status
+from .unit_utils import BiographyTemplate, UnitEvent, UnitStatus, get_first_unit_matching_status
 from .utils import timestamp
 
 STATE_SWITCH_EVENT = asyncio.Event()
@@ -27,6 +31,15 @@ async def _print_unit_barcode(unit: Unit) -> None:
     messenger.info(f"Это сообщение иллюстрирует процесс печати принтером этикеток штрих-кода изделия {unit.barcode.barcode}.")
 
 
+async def _print_unit_barcodes(units: list[Unit]) -> None:
+    """Print barcodes of a batch of units in a single print job"""
+
+    messenger.info(
+        f"Это сообщение иллюстрирует процесс печати принтером этикеток штрих-кодов {len(units)} изделий: "
+        f"{units[0].barcode.barcode} – {units[-1].barcode.barcode}."
+    )
+
+
 async def _print_security_tag() -> None:
     """Print security tag for the unit"""
 
@@ -41,7 +54,6 @@ class WorkBench(metaclass=SingletonMeta):
 
     @logger.catch
     def __init__(self) -> None:
-        self._database: MongoDbWrapper = MongoDbWrapper()
         self.number: int = 1
         self.employee: Employee | None = None
         self.camera: Camera = Camera()
@@ -59,10 +71,34 @@ class WorkBench(metaclass=SingletonMeta):
             raise StateForbiddenError(message)
         unit = Unit(schema)
         await _print_unit_barcode(unit)
-        await self._database.push_unit(unit)
+        await self._database.push_unit(unit, event=UnitEvent.unit_created)
 
         return unit
 
+    @logger.catch(reraise=True, exclude=(StateForbiddenError, AssertionError))
+    async def create_new_units(self, schema: ProductionSchema, count: int) -> list[Unit]:
+        """initialize a batch of units of the same schema and insert them in bulk"""
+        if self.state != State.AUTHORIZED_IDLING_STATE:
+            message = "Невозможно создать новые изделия, рабочий стол не в статусе AuthorizedIdling."
+            messenger.error(message)
+            raise StateForbiddenError(message)
+        template = BiographyTemplate(schema)
+        units = []
+
+        for _ in range(count):
+            uuid = uuid4().hex
+            units.append(Unit(schema, uuid=uuid, biography=template.build(uuid)))
+
+        await self._database.insert_units(units)
+        await _print_unit_barcodes(units)
+
+        return units
+
+    @property
+    def _database(self) -> StorageEngine:
+        """the storage engine is created lazily, so that importing the routers does not configure the DB client"""
+        return get_storage()
+
     def _validate_state_transition(self, new_state: State) -> None:
         """check if state transition can be performed using the map"""
         if new_state not in STATE_TRANSITION_MAP.get(self.state, []):
@@ -173,6 +209,15 @@ class WorkBench(metaclass=SingletonMeta):
 
         self.unit.start_operation(self.employee, additional_info)
 
+        # without a journal the started stage is written along with its end, not to wait on the DB here
+        if self._database.is_journaled:
+            try:
+                await self._database.push_unit(self.unit, include_components=False, event=UnitEvent.stage_started)
+            except Exception:
+                self.unit.cancel_operation()
+                await self.camera.end_record()
+                raise
+
         self.switch_state(State.PRODUCTION_STAGE_ONGOING_STATE)
 
     @logger.catch(reraise=True, exclude=(StateForbiddenError, AssertionError, ValueError))
@@ -186,10 +231,10 @@ class WorkBench(metaclass=SingletonMeta):
         STATE_SWITCH_EVENT.set()
 
         if self.unit.components_filled:
-            await self._database.push_unit(self.unit)
+            await self._database.push_unit(self.unit, event=UnitEvent.component_assigned)
             self.switch_state(State.UNIT_ASSIGNED_IDLING_STATE)
 
-    async def _end_record(self) -> tuple[list[str], str]:  # noqa: CAC001
+    async def _end_record(self) -> tuple[list[str], dt.datetime]:  # noqa: CAC001
         """End ongoing records and publish them to IPFS"""
         assert self.camera is not None and self.employee is not None
         override_timestamp = timestamp()
@@ -233,6 +278,7 @@ class WorkBench(metaclass=SingletonMeta):
             raise AssertionError(message)
 
         logger.info("Trying to end operation")
+        stage = self.unit.next_pending_operation
         override_timestamp = timestamp()
         ipfs_hashes: list[str] = []
 
@@ -245,10 +291,21 @@ class WorkBench(metaclass=SingletonMeta):
             premature=premature,
             override_timestamp=override_timestamp,
         )
-        await self._database.push_unit(self.unit, include_components=False)
+        await self._database.push_unit(self.unit, include_components=False, event=UnitEvent.stage_ended)
+        await self._record_stage_duration(stage)
 
         self.switch_state(State.UNIT_ASSIGNED_IDLING_STATE)
 
+    async def _record_stage_duration(self, stage: ProductionStage | None) -> None:
+        """count the ended stage into the duration statistics. Failing to do so does not fail the stage."""
+        if self.unit is None or stage is None or (seconds := get_stage_duration(stage)) is None:
+            return
+
+        try:
+            await self._database.record_stage_durations(self.unit.schema.schema_id, [(stage.schema_stage_id, seconds)])
+        except Exception as e:
+            logger.error(f"Failed to record the duration of the production stage {stage.name}: {e}")
+
     async def _print_qr(self, url: str) -> None:
         """Print passport QR-code tag for the unit"""
         assert self.employee is not None
@@ -280,7 +337,7 @@ class WorkBench(metaclass=SingletonMeta):
         await _print_security_tag()
 
         # Update unit data saved in the DB
-        await self._database.push_unit(self.unit)
+        await self._database.push_unit(self.unit, event=UnitEvent.passport_cid_set)
 
     async def shutdown(self) -> None:
         logger.info("Workbench shutdown sequence initiated")
@@ -1,7 +1,35 @@
 import barcode
 
 
+def ean13_check_digit(code: str) -> str:
+    """check digit of a 12 digit EAN13 code: digits weighted 1 and 3 alternately must sum up to a multiple of 10"""
+    weighted_sum = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(code))
+    return str(-weighted_sum % 10)
+
+
+def get_unit_code(uuid: str) -> str:
+    """12 digit code of the unit barcode derived from the unit UUID"""
+    return str(int(uuid, 16))[:12]
+
+
+def get_internal_id(uuid: str) -> str:
+    """EAN13 internal ID of the unit, same as the full code of its barcode"""
+    unit_code = get_unit_code(uuid)
+    return unit_code + ean13_check_digit(unit_code)
+
+
 class Barcode:
+    """Unit barcode. The EAN13 image object is only built when the barcode is printed."""
+
+    __slots__ = ("unit_code", "_barcode")
+
     def __init__(self, unit_code: str) -> None:
         self.unit_code: str = unit_code
-        self.barcode: barcode.EAN13 = barcode.get("ean13", self.unit_code)
+        self._barcode: barcode.EAN13 | None = None
+
+    @property
+    def barcode(self) -> barcode.EAN13:
+        if self._barcode is None:
+            self._barcode = barcode.get("ean13", self.unit_code)
+
+        return self._barcode
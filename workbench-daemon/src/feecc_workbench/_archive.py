@@ -0,0 +1,167 @@
+import asyncio
+import datetime as dt
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import PyMongoError
+
+from .Types import Document
+from .unit_utils import UnitStatus
+
+# hot collection -> its archive
+ARCHIVE_COLLECTIONS: dict[str, str] = {
+    "unitData": "unitDataArchive",
+    "productionStagesData": "productionStagesDataArchive",
+}
+
+
+def _without_id(document: Document) -> Document:
+    # documents restored from the archive get new _ids, so the archived copies are matched by their own keys
+    return {key: value for key, value in document.items() if key != "_id"}
+
+
+async def _get_unit_trees(database: AsyncIOMotorDatabase, roots: list[Document]) -> dict[Any, list[Document]]:
+    """documents of the units in the trees of the provided root units, keyed by the root _id, the root last"""
+    pipeline = [
+        {"$match": {"_id": {"$in": [root["_id"] for root in roots]}}},
+        {
+            "$graphLookup": {
+                "from": "unitData",
+                "startWith": "$components_internal_ids",
+                "connectFromField": "components_internal_ids",
+                "connectToField": "internal_id",
+                "as": "component_dicts",
+            }
+        },
+    ]
+    trees: dict[Any, list[Document]] = {}
+
+    async for root in database.unitData.aggregate(pipeline):
+        trees[root["_id"]] = [*root.pop("component_dicts"), root]
+
+    return trees
+
+
+async def _delete_guarded(database: AsyncIOMotorDatabase, unit_docs: list[Document]) -> set[str]:
+    """delete the unit documents which did not change since they were read. Returns UUIDs of the deleted ones."""
+    if not unit_docs:
+        return set()
+
+    tasks = [DeleteOne({"_id": doc["_id"], "version": doc.get("version")}) for doc in unit_docs]
+    await database.unitData.bulk_write(tasks, ordered=False)
+    uuids = [doc["uuid"] for doc in unit_docs]
+    remaining = {doc["uuid"] async for doc in database.unitData.find({"uuid": {"$in": uuids}}, {"uuid": 1})}
+    return set(uuids) - remaining
+
+
+async def _archive_batch(database: AsyncIOMotorDatabase, roots: list[Document]) -> int:
+    trees = await _get_unit_trees(database, roots)
+    unit_docs = [doc for tree in trees.values() for doc in tree]
+    uuids = [doc["uuid"] for doc in unit_docs]
+    stage_docs = await database.productionStagesData.find({"parent_unit_uuid": {"$in": uuids}}).to_list(None)
+
+    # copy first, so an interrupted run loses nothing. Copying again is harmless.
+    if stage_docs:
+        stage_tasks = [ReplaceOne({"id": doc["id"]}, _without_id(doc), upsert=True) for doc in stage_docs]
+        await database.productionStagesDataArchive.bulk_write(stage_tasks, ordered=False)
+
+    unit_tasks = [ReplaceOne({"internal_id": doc["internal_id"]}, _without_id(doc), upsert=True) for doc in unit_docs]
+    await database.unitDataArchive.bulk_write(unit_tasks, ordered=False)
+
+    # the roots go first, so the hot units never reference archived components. Units modified
+    # in the meantime are left in place and archived again by the next run.
+    deleted = await _delete_guarded(database, [tree[-1] for tree in trees.values()])
+    components = [doc for tree in trees.values() if tree[-1]["uuid"] in deleted for doc in tree[:-1]]
+    deleted_components = await _delete_guarded(database, components)
+
+    if kept := len(components) - len(deleted_components):
+        logger.warning(f"{kept} components of the archived units were modified and are kept in unitData")
+
+    await database.productionStagesData.delete_many({"parent_unit_uuid": {"$in": [*deleted, *deleted_components]}})
+    return len(deleted)
+
+
+async def archive_finalized_units(
+    database: AsyncIOMotorDatabase, batch_size: int = 500, min_age_days: float = 90
+) -> int:
+    """
+    Move the finalized units created more than `min_age_days` ago into the archive collections along with
+    their components and production stages. Only the units which are not components of other units are
+    selected, so whole unit trees are archived together. Returns the number of archived unit trees.
+    """
+    cutoff = dt.datetime.now() - dt.timedelta(days=min_age_days)
+    query: Document = {
+        "status": UnitStatus.finalized.value,
+        "featured_in_int_id": None,
+        "creation_time": {"$lt": cutoff},
+    }
+    last_id, archived = None, 0
+
+    while True:
+        batch_query = query if last_id is None else {**query, "_id": {"$gt": last_id}}
+        cursor = database.unitData.find(batch_query, {"_id": 1})
+        roots: list[Document] = await cursor.sort("_id", 1).limit(batch_size).to_list(length=None)
+
+        if not roots:
+            break
+
+        archived += await _archive_batch(database, roots)
+        last_id = roots[-1]["_id"]
+        logger.info(f"{archived} unit trees archived so far")
+
+    logger.info(f"{archived} finalized unit trees created before {cutoff} have been archived")
+    return archived
+
+
+class UnitArchive:
+    """
+    Hot/cold tiering of the units.
+
+    Finalized unit trees older than `min_age_days` are moved into the archive collections every `interval`
+    seconds (never if it is 0, so the job can be run by `migrate.py archive` instead), which keeps the hot
+    collections bounded by the units in production. The archive is read when a unit is missing from the
+    hot collections. Collection sizes are estimated from the collection metadata after every run.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, min_age_days: float, interval: float, batch_size: int) -> None:
+        self._database: AsyncIOMotorDatabase = database
+        self._min_age_days: float = min_age_days
+        self._interval: float = interval
+        self._batch_size: int = batch_size
+        self._sizes: dict[str, int] = {}
+        self._archiver: asyncio.Task[None] | None = None
+        self.hits: int = 0
+        self.runs: int = 0
+        self.archived: int = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {"hits": self.hits, "runs": self.runs, "archived_trees": self.archived, "collection_sizes": self._sizes}
+
+    async def start(self) -> None:
+        await self.refresh_sizes()
+
+        if self._interval > 0 and self._archiver is None:
+            self._archiver = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._archiver is not None:
+            self._archiver.cancel()
+            self._archiver = None
+
+    async def refresh_sizes(self) -> None:
+        for collection_name in [*ARCHIVE_COLLECTIONS, *ARCHIVE_COLLECTIONS.values()]:
+            self._sizes[collection_name] = await self._database[collection_name].estimated_document_count()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+
+            try:
+                self.archived += await archive_finalized_units(self._database, self._batch_size, self._min_age_days)
+                self.runs += 1
+                await self.refresh_sizes()
+            except PyMongoError as e:
+                logger.error(f"Failed to archive finalized units: {e}")
@@ -0,0 +1,232 @@
+import asyncio
+import dataclasses
+import datetime as dt
+import re
+from collections import OrderedDict
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
+
+from .events import ChangeEventType, EventBus, StageChangeEvent, UnitChangeEvent
+from .Types import Document
+
+UNIT_COLLECTION = "unitData"
+STAGE_COLLECTION = "productionStagesData"
+
+# how many deleted units can still be told apart, the delete notifications only carry the document _id
+_KNOWN_UNITS_SIZE = 4096
+_UNIT_PROJECTION = {
+    "_id": 1,
+    "uuid": 1,
+    "internal_id": 1,
+    "schema_id": 1,
+    "status": 1,
+    "version": 1,
+    "updated_at": 1,
+}
+_EPOCH = dt.datetime(1970, 1, 1)
+_EMBEDDED_STAGE_PATH = re.compile(r"biography\.(\d+)(?:\.|$)")
+
+
+def _get_unit_event(event_type: ChangeEventType, unit_doc: Document) -> UnitChangeEvent:
+    return UnitChangeEvent(
+        type=event_type,
+        unit_uuid=unit_doc.get("uuid"),
+        unit_internal_id=unit_doc.get("internal_id"),
+        schema_id=unit_doc.get("schema_id"),
+        status=unit_doc.get("status"),
+        version=unit_doc.get("version"),
+    )
+
+
+def _get_stage_event(stage_doc: Document) -> StageChangeEvent:
+    return StageChangeEvent(
+        type=ChangeEventType.stage_updated,
+        unit_uuid=stage_doc.get("parent_unit_uuid"),
+        stage_id=stage_doc.get("id"),
+        schema_stage_id=stage_doc.get("schema_stage_id"),
+        name=stage_doc.get("name"),
+        number=stage_doc.get("number"),
+        completed=stage_doc.get("completed"),
+    )
+
+
+def _get_changed_embedded_stages(change: Document) -> list[Document]:
+    """the stages of the embedded layout touched by the change of the unit document"""
+    biography: list[Document] = (change.get("fullDocument") or {}).get("biography") or []
+
+    if change["operationType"] != "update":
+        return biography
+
+    updated_fields: Document = change.get("updateDescription", {}).get("updatedFields", {})
+
+    if "biography" in updated_fields:
+        return biography
+
+    indices = {int(match.group(1)) for path in updated_fields if (match := _EMBEDDED_STAGE_PATH.match(path))}
+    return [biography[index] for index in sorted(indices) if index < len(biography)]
+
+
+class ChangeFeed:
+    """
+    Publishes the changes of the units and their stages made by any instance sharing the DB on the event bus.
+
+    The changes are read from a change stream on the DB if the server supports one (replica sets). A broken
+    stream is resumed after the last seen change. Otherwise the units are polled every `poll_interval` seconds
+    while the bus has subscribers. Every write of a unit or its stages stamps its `updated_at` and increments
+    its `version`, so a poll only reads the units stamped after the last seen change, less `poll_lookback`
+    seconds to cover the clock skew between the instances and the writes still in flight, and skips the versions
+    already published. Polling cannot tell which stages have changed, nor see the deleted (archived) units,
+    so only the unit creations and updates are published in that mode.
+    """
+
+    def __init__(
+        self, database: AsyncIOMotorDatabase, bus: EventBus, poll_interval: float, poll_lookback: float
+    ) -> None:
+        self._database: AsyncIOMotorDatabase = database
+        self._bus: EventBus = bus
+        self._poll_interval: float = poll_interval
+        self._poll_lookback: dt.timedelta = dt.timedelta(seconds=poll_lookback)
+        self._known_units: OrderedDict[Any, UnitChangeEvent] = OrderedDict()  # document _id -> last event
+        self._watermark: dt.datetime | None = None  # the latest `updated_at` seen by the poller
+        self._polled_versions: dict[Any, int | None] = {}  # document _id -> version, of the units within the lookback
+        self._resume_token: Document | None = None
+        self._watcher: asyncio.Task[None] | None = None
+        self._mode: str = "off"
+        self.events: int = 0
+        self.polls: int = 0
+        self.resumes: int = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {"mode": self._mode, "events": self.events, "polls": self.polls, "resumes": self.resumes}
+
+    def start(self) -> None:
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def _publish(self, event: UnitChangeEvent | StageChangeEvent) -> None:
+        self.events += 1
+        self._bus.publish(event)
+
+    def _publish_unit_event(self, document_id: Any, event: UnitChangeEvent) -> None:
+        self._known_units[document_id] = event
+        self._known_units.move_to_end(document_id)
+
+        while len(self._known_units) > _KNOWN_UNITS_SIZE:
+            self._known_units.popitem(last=False)
+
+        self._publish(event)
+
+    def _publish_unit_deletion(self, document_id: Any) -> None:
+        last_event = self._known_units.pop(document_id, None)
+        self._publish(
+            dataclasses.replace(last_event, type=ChangeEventType.unit_deleted)
+            if last_event is not None
+            else UnitChangeEvent(type=ChangeEventType.unit_deleted, unit_uuid=None)
+        )
+
+    def _handle_change(self, change: Document) -> None:
+        operation: str = change["operationType"]
+
+        if operation not in ("insert", "update", "replace", "delete"):
+            return
+
+        document_id = change["documentKey"]["_id"]
+        document: Document | None = change.get("fullDocument")
+
+        if change["ns"]["coll"] == UNIT_COLLECTION:
+            if operation == "delete":
+                self._publish_unit_deletion(document_id)
+                return
+
+            if document is None:  # deleted before it was looked up
+                return
+
+            event_type = ChangeEventType.unit_created if operation == "insert" else ChangeEventType.unit_updated
+            self._publish_unit_event(document_id, _get_unit_event(event_type, document))
+
+            for stage_doc in _get_changed_embedded_stages(change):
+                self._publish(_get_stage_event(stage_doc))
+
+        # stage documents are only deleted by the layout migration, which does not change the stages
+        elif document is not None:
+            self._publish(_get_stage_event(document))
+
+    async def _follow_change_stream(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": [UNIT_COLLECTION, STAGE_COLLECTION]}}}]
+
+        async with self._database.watch(
+            pipeline, full_document="updateLookup", resume_after=self._resume_token
+        ) as change_stream:
+            self._mode = "change_stream"
+            logger.info("Unit changes are published from the change stream")
+
+            async for change in change_stream:
+                self._handle_change(change)
+                self._resume_token = change_stream.resume_token
+
+    async def _poll(self) -> None:
+        if not self._bus.has_subscribers:
+            # nobody is listening. The watermark is looked up anew once somebody subscribes.
+            self._watermark = None
+            return
+
+        collection = self._database[UNIT_COLLECTION]
+        is_catching_up = self._watermark is None
+
+        if self._watermark is None:
+            latest = await collection.find_one(
+                {"updated_at": {"$gt": _EPOCH}}, {"updated_at": 1}, sort=[("updated_at", -1)]
+            )
+            self._watermark = latest["updated_at"] if latest is not None else _EPOCH
+
+        query = {"updated_at": {"$gte": self._watermark - self._poll_lookback}}
+        cursor = collection.find(query, _UNIT_PROJECTION).sort("updated_at", 1)
+        previous, self._polled_versions = self._polled_versions, {}
+        self.polls += 1
+
+        async for unit_doc in cursor:
+            key, version = unit_doc["_id"], unit_doc.get("version")
+            self._polled_versions[key] = version
+            self._watermark = max(self._watermark, unit_doc["updated_at"])
+
+            # the changes made before the first poll are not published
+            if is_catching_up or (key in previous and previous[key] == version):
+                continue
+
+            event_type = ChangeEventType.unit_created if version == 0 else ChangeEventType.unit_updated
+            self._publish_unit_event(key, _get_unit_event(event_type, unit_doc))
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await self._follow_change_stream()
+                # the stream has been invalidated, so it cannot be resumed
+                self._resume_token = None
+                continue
+            except PyMongoError as e:
+                if self._mode != "change_stream":
+                    logger.info(f"Change streams are unavailable ({e}). Units are polled every {self._poll_interval}s")
+                    break
+
+                logger.warning(f"Unit change stream broke ({e}). Resuming in {self._poll_interval}s")
+
+            self.resumes += 1
+            await asyncio.sleep(self._poll_interval)
+
+        self._mode = "polling"
+
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                await self._poll()
+            except PyMongoError as e:
+                logger.error(f"Failed to poll unit changes: {e}")
@@ -0,0 +1,146 @@
+"""
+Conversion between Unit and ProductionStage objects and their MongoDB documents.
+
+Field lists are computed once at import. Encoding reads the attributes into a new dict without copying
+the values, so mutable values (`additional_info`, `prod_data_hashes`) are shared with the object until
+the document is written. That is safe as the code replaces these values rather than modifying them in place.
+Decoding fills the slots of a new object directly, skipping the constructors and the per attribute dirty
+tracking, and leaves the object clean as it matches the DB.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from collections.abc import Callable
+from dataclasses import MISSING, fields
+from operator import attrgetter
+from typing import Any
+from uuid import uuid4
+
+from ._Barcode import get_internal_id
+from .models import ProductionSchema
+from .ProductionStage import ProductionStage
+from .Types import Document
+from .Unit import Unit, get_initial_status
+from .unit_tree import UnitNode
+from .unit_utils import UnitStatus, biography_factory
+from .utils import parse_timestamp
+
+_set = object.__setattr__
+
+STAGE_FIELDS: tuple[str, ...] = tuple(field.name for field in fields(ProductionStage) if field.name != "is_in_db")
+STAGE_TIMESTAMP_FIELDS = ("session_start_time", "session_end_time")
+
+# how to fill in the stage fields missing from a document: no default (required), a default value or a factory
+_REQUIRED = object()
+_STAGE_FIELD_DEFAULTS: tuple[tuple[str, Any, Callable[[], Any] | None], ...] = tuple(
+    (
+        field.name,
+        field.default if field.default is not MISSING else _REQUIRED,
+        field.default_factory if field.default_factory is not MISSING else None,
+    )
+    for field in fields(ProductionStage)
+    if field.name != "is_in_db"
+)
+_get_stage_values = attrgetter(*STAGE_FIELDS)
+
+# unit attributes stored as is
+_UNIT_PLAIN_FIELDS = (
+    "uuid",
+    "internal_id",
+    "passport_ipfs_cid",
+    "txn_hash",
+    "serial_number",
+    "featured_in_int_id",
+    "creation_time",
+)
+_get_unit_values = attrgetter(*_UNIT_PLAIN_FIELDS)
+
+
+def encode_stage(stage: ProductionStage) -> Document:
+    return dict(zip(STAGE_FIELDS, _get_stage_values(stage)))
+
+
+def encode_unit(unit: Unit) -> Document:
+    """the unit document without the stages"""
+    unit_dict = dict(zip(_UNIT_PLAIN_FIELDS, _get_unit_values(unit)))
+    unit_dict["schema_id"] = unit.schema.schema_id
+    unit_dict["components_internal_ids"] = [component.internal_id for component in unit.components_units]
+    unit_dict["status"] = unit.status.value
+    return unit_dict
+
+
+def decode_status(unit_dict: Document, schema: ProductionSchema) -> UnitStatus:
+    """status of the unit document. Documents without one are taken for units which are in production."""
+    status: str | None = unit_dict.get("status")
+    return get_initial_status(schema, UnitStatus.production if status is None else status)
+
+
+def decode_stage(stage_dict: Document, is_in_db: bool) -> ProductionStage:
+    """
+    Construct a ProductionStage from its document. Timestamps left as strings by the earlier versions
+    are parsed and marked dirty, so the next write of the stage stores them as datetimes.
+    """
+    stage = object.__new__(ProductionStage)
+    _set(stage, "_dirty_fields", {})
+
+    for name, default, factory in _STAGE_FIELD_DEFAULTS:
+        value = stage_dict.get(name, default)
+
+        if value is _REQUIRED:
+            if factory is None:
+                raise KeyError(f"Stage document {stage_dict.get('id')} has no {name}")
+            value = factory()
+
+        _set(stage, name, value)
+
+    _set(stage, "is_in_db", is_in_db)
+
+    if legacy_timestamps := [name for name in STAGE_TIMESTAMP_FIELDS if isinstance(stage_dict.get(name), str)]:
+        for name in legacy_timestamps:
+            _set(stage, name, parse_timestamp(stage_dict[name]))
+
+        stage.mark_dirty(*legacy_timestamps)
+
+    return stage
+
+
+def decode_unit(
+    unit_dict: Document, schema: ProductionSchema, biography: list[ProductionStage], components_units: list[UnitNode]
+) -> Unit:
+    """Construct a Unit stored in the DB from its document, the decoded stages and the components"""
+    unit = object.__new__(Unit)
+    uuid: str = unit_dict.get("uuid") or uuid4().hex
+
+    if components_units:
+        slots: dict[str, UnitNode | None] = {component.schema.schema_id: component for component in components_units}
+        assert all(
+            schema_id in (schema.required_components_schema_ids or []) for schema_id in slots
+        ), "Provided components are not a part of the unit schema"
+    else:
+        slots = {schema_id: None for schema_id in (schema.required_components_schema_ids or [])}
+
+    _set(unit, "_dirty_fields", {})
+    _set(unit, "_status", decode_status(unit_dict, schema))
+    _set(unit, "schema", schema)
+    _set(unit, "uuid", uuid)
+    _set(unit, "internal_id", unit_dict.get("internal_id") or get_internal_id(uuid))
+    _set(unit, "passport_ipfs_cid", unit_dict.get("passport_ipfs_cid"))
+    _set(unit, "txn_hash", unit_dict.get("txn_hash"))
+    _set(unit, "serial_number", unit_dict.get("serial_number"))
+    _set(unit, "components_units", components_units)
+    _set(unit, "featured_in_int_id", unit_dict.get("featured_in_int_id"))
+    _set(unit, "employee", None)
+    _set(unit, "biography", biography or biography_factory(schema, uuid))
+    _set(unit, "_pending_stage_index", 0)
+    _set(unit, "_assembly_time", None)
+    _set(unit, "_tree_assembly_time", None)
+    _set(unit, "_parent", None)
+    _set(unit, "_tree", None)
+    _set(unit, "is_in_db", True)
+    _set(unit, "creation_time", unit_dict.get("creation_time") or dt.datetime.now())
+    _set(unit, "_component_slots", slots)
+
+    for component in components_units:
+        component.parent = unit
+
+    return unit
@@ -0,0 +1,149 @@
+import datetime as dt
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .Types import Document
+
+# Index definitions owned by the daemon. Created on startup if missing.
+INDEXES: dict[str, list[IndexModel]] = {
+    "employeeData": [
+        IndexModel([("rfid_card_id", ASCENDING)], name="rfid_card_id_unique", unique=True),
+    ],
+    "productionSchemas": [
+        IndexModel([("schema_id", ASCENDING)], name="schema_id_unique", unique=True),
+    ],
+    "productionStagesData": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("parent_unit_uuid", ASCENDING), ("number", ASCENDING)], name="parent_unit_uuid_number"),
+        IndexModel([("session_end_time", ASCENDING)], name="session_end_time"),
+    ],
+    "productionStageStats": [
+        IndexModel(
+            [("schema_id", ASCENDING), ("schema_stage_id", ASCENDING)], name="schema_id_stage_id_unique", unique=True
+        ),
+    ],
+    "unitData": [
+        IndexModel([("internal_id", ASCENDING)], name="internal_id_unique", unique=True),
+        IndexModel([("uuid", ASCENDING)], name="uuid_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("schema_id", ASCENDING)], name="status_schema_id"),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+        IndexModel([("biography.session_end_time", ASCENDING)], name="biography_session_end_time"),
+        IndexModel([("status", ASCENDING), ("creation_time", ASCENDING)], name="status_creation_time"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "unitDataArchive": [
+        IndexModel([("internal_id", ASCENDING)], name="internal_id_unique", unique=True),
+        IndexModel([("uuid", ASCENDING)], name="uuid_unique", unique=True),
+    ],
+    "productionStagesDataArchive": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("parent_unit_uuid", ASCENDING), ("number", ASCENDING)], name="parent_unit_uuid_number"),
+    ],
+}
+
+# Text indexes created by the former mongodb-local/init.js. Lookups cannot use them, yet every write maintains them.
+LEGACY_INDEXES: dict[str, list[str]] = {
+    "employeeData": ["rfid_card_id_text"],
+    "productionSchemas": ["schema_id_text_parent_schema_id_1"],
+    "productionStagesData": ["id_1_parent_unit_uuid_text"],
+    "unitData": ["internal_id_text_uuid_1_status_1"],
+}
+
+_EPOCH = dt.datetime(1970, 1, 1)
+
+# Queries issued by MongoDbWrapper on the hot path and the reporting queries: (collection, filter, sort)
+HOT_QUERIES: list[tuple[str, Document, list[tuple[str, int]] | None]] = [
+    ("employeeData", {"rfid_card_id": ""}, None),
+    ("productionSchemas", {"schema_id": {"$in": [""]}}, None),
+    ("productionStagesData", {"parent_unit_uuid": {"$in": [""]}}, [("parent_unit_uuid", 1), ("number", 1)]),
+    ("productionStagesData", {"parent_unit_uuid": ""}, [("number", 1)]),
+    ("productionStagesData", {"id": ""}, None),
+    ("productionStagesData", {"session_end_time": {"$gte": _EPOCH, "$lt": _EPOCH}}, None),
+    ("productionStageStats", {"schema_id": ""}, None),
+    ("unitData", {"internal_id": ""}, None),
+    ("unitData", {"uuid": ""}, None),
+    ("unitData", {"status": ""}, [("_id", 1)]),
+    ("unitData", {"biography.session_end_time": {"$gte": _EPOCH, "$lt": _EPOCH}}, None),
+    ("unitData", {"updated_at": {"$gte": _EPOCH}}, [("updated_at", 1)]),
+]
+
+
+async def ensure_indexes(database: AsyncIOMotorDatabase) -> None:
+    """
+    Drop the legacy indexes and create the missing ones. Conflicting pre-existing indexes are reported
+    and left intact, as are the unknown ones.
+    """
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        existing: set[str] = set(await collection.index_information())
+
+        for name in LEGACY_INDEXES.get(collection_name, []):
+            if name not in existing:
+                continue
+
+            try:
+                await collection.drop_index(name)
+            except OperationFailure as e:
+                logger.warning(f"Failed to drop legacy index {name} on {collection_name}: {e}")
+            else:
+                existing.discard(name)
+                logger.info(f"Dropped legacy index {name} on {collection_name}")
+
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                logger.warning(f"Failed to create index {index.document['name']} on {collection_name}: {e}")
+
+        if unknown := existing - {"_id_"} - {index.document["name"] for index in indexes}:
+            logger.warning(f"Indexes {', '.join(sorted(unknown))} on {collection_name} are not managed by the daemon")
+
+        logger.debug(f"Indexes on {collection_name} are in place")
+
+
+def _plan_stages(plan: Any) -> set[str]:
+    """list all the stage names found in the explain() output"""
+    stages: set[str] = set()
+
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for entry in plan:
+            stages |= _plan_stages(entry)
+
+    return stages
+
+
+async def verify_query_plans(database: AsyncIOMotorDatabase) -> list[str]:
+    """Explain the hot queries and warn about the ones falling back to a collection scan"""
+    collscans: list[str] = []
+
+    for collection_name, query_filter, sort in HOT_QUERIES:
+        cursor = database[collection_name].find(query_filter)
+        if sort:
+            cursor = cursor.sort(sort)
+
+        try:
+            explanation: Document = await cursor.explain()
+        except PyMongoError as e:
+            logger.warning(f"Failed to explain query {query_filter} on {collection_name}: {e}")
+            continue
+
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            description = f"{collection_name}.find({query_filter})"
+            collscans.append(description)
+            logger.warning(f"Query {description} falls back to a collection scan (COLLSCAN)")
+
+    if not collscans:
+        logger.info(f"All {len(HOT_QUERIES)} hot queries are served by indexes")
+
+    return collscans
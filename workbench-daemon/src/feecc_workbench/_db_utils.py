@@ -1,18 +1,34 @@
 import datetime as dt
 import sys
+from collections.abc import Mapping, Sequence
+from functools import partial
+from typing import Any
 
 from loguru import logger
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 
+from ._codec import decode_stage, decode_status, decode_unit, encode_stage, encode_unit
+from ._unit_proxy import UnitProxy
+from .exceptions import UnitNotFoundError
+from .models import ProductionSchema
+from .ProductionStage import ProductionStage
+from .stage_stats import StageDurationStats, bucket_index
+from .Types import BulkWriteTask, Document
 from .Unit import Unit
+from .unit_tree import UnitNode
 
 
-def _get_database_client(mongo_connection_uri: str) -> AsyncIOMotorClient:
-    """Get MongoDB connection url"""
+def _get_database_client(mongo_connection_uri: str, **options: Any) -> AsyncIOMotorClient:
+    """Get MongoDB client. It does not connect until the first operation, see `_check_database_connection`."""
+    return AsyncIOMotorClient(mongo_connection_uri, **options)
+
+
+async def _check_database_connection(db_client: AsyncIOMotorClient, mongo_connection_uri: str) -> None:
+    """Make sure the DB is reachable. Exit otherwise."""
     try:
-        db_client = AsyncIOMotorClient(mongo_connection_uri, serverSelectionTimeoutMS=10000)
-        db_client.server_info()
-        return db_client
+        await db_client.admin.command("ping")
 
     except Exception as e:
         message = (
@@ -23,16 +39,222 @@ def _get_database_client(mongo_connection_uri: str) -> AsyncIOMotorClient:
         sys.exit(1)
 
 
-def _get_unit_dict_data(unit: Unit) -> dict[str, str | bool | None | list[str] | dt.datetime]:
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+
+def _get_failed_task_indices(error: BulkWriteError, tasks_count: int, ordered: bool) -> set[int]:
+    """
+    Get indices of the bulk write tasks which have not been applied.
+    Duplicate key errors mean the document is already in place, so such tasks are not considered failed.
+    """
+    write_errors = error.details.get("writeErrors", [])
+    failed = {err["index"] for err in write_errors if err.get("code") != DUPLICATE_KEY_ERROR_CODE}
+
+    if ordered and write_errors:
+        # ordered bulk writes stop on the first error
+        failed |= set(range(min(err["index"] for err in write_errors) + 1, tasks_count))
+
+    return failed
+
+
+def _get_unit_tree(unit: Unit) -> list[Unit]:
+    """
+    list the unit and all its nested components, components first. Components which have not been
+    loaded are left out, as nothing could have changed in them since they were read from the DB.
+    """
+    return [loaded for item in unit.tree.post_order() if (loaded := item.loaded_unit) is not None]
+
+
+# Unit attributes stored in the DB under a different name
+_UNIT_DOCUMENT_FIELDS: dict[str, str] = {"schema": "schema_id", "components_units": "components_internal_ids"}
+
+
+def _get_unit_changes(unit: Unit, dirty_fields: Mapping[str, int]) -> Document:
+    """get the unit document fields affected by the modified unit attributes"""
+    unit_dict = encode_unit(unit)
+    return {key: unit_dict[key] for key in (_UNIT_DOCUMENT_FIELDS.get(name, name) for name in dirty_fields)}
+
+
+def _get_stage_changes(stage: ProductionStage, dirty_fields: Mapping[str, int]) -> Document:
+    """get the stage document fields modified since the last write"""
+    return {name: getattr(stage, name) for name in dirty_fields}
+
+
+def _get_stage_duration_update(seconds: float) -> Document:
+    """count the duration into the stage duration statistics document"""
+    index = bucket_index(seconds)
+    counter = "zero_count" if index is None else f"buckets.{index}"
+    return {"$inc": {"count": 1, "sum": seconds, counter: 1}, "$min": {"min": seconds}, "$max": {"max": seconds}}
+
+
+def _get_stage_stats_dict_data(schema_id: str, stats: StageDurationStats) -> Document:
     return {
-        "schema_id": unit.schema.schema_id,
-        "uuid": unit.uuid,
-        "internal_id": unit.internal_id,
-        "passport_ipfs_cid": unit.passport_ipfs_cid,
-        "txn_hash": unit.txn_hash,
-        "serial_number": unit.serial_number,
-        "components_internal_ids": unit.components_internal_ids,
-        "featured_in_int_id": unit.featured_in_int_id,
-        "creation_time": unit.creation_time,
-        "status": unit.status.value,
+        "schema_id": schema_id,
+        "schema_stage_id": stats.schema_stage_id,
+        "count": stats.count,
+        "sum": stats.total_seconds,
+        "min": stats.min_seconds,
+        "max": stats.max_seconds,
+        "zero_count": stats.zero_count,
+        "buckets": {str(index): count for index, count in stats.buckets.items()},
     }
+
+
+def _get_stage_stats_from_raw_db_data(stats_dict: Document) -> StageDurationStats:
+    return StageDurationStats(
+        schema_stage_id=stats_dict["schema_stage_id"],
+        count=stats_dict.get("count", 0),
+        total_seconds=stats_dict.get("sum", 0.0),
+        min_seconds=stats_dict.get("min"),
+        max_seconds=stats_dict.get("max"),
+        zero_count=stats_dict.get("zero_count", 0),
+        buckets={int(index): count for index, count in stats_dict.get("buckets", {}).items()},
+    )
+
+
+def _get_embedded_unit_dict_data(unit: Unit) -> Document:
+    """the unit document of the embedded layout, as inserted for a new unit"""
+    biography = [encode_stage(stage) for stage in unit.biography]
+    return {**encode_unit(unit), "version": 0, "updated_at": dt.datetime.now(dt.timezone.utc), "biography": biography}
+
+
+def _get_embedded_unit_task(
+    unit: Unit, dirty_fields: Mapping[str, int], stage_dirty_fields: Sequence[Mapping[str, int]]
+) -> BulkWriteTask | None:
+    """
+    Build the write of a unit document with the production stages embedded into it. Modified stages are
+    updated in place with positional updates, matched by their ID. The whole array is rewritten only when
+    new stages were added. Returns None if there is nothing to write.
+    """
+    if not unit.is_in_db:
+        return InsertOne(_get_embedded_unit_dict_data(unit))
+
+    changes = _get_unit_changes(unit, dirty_fields)
+    array_filters: list[Mapping[str, Any]] = []
+
+    if any(not stage.is_in_db for stage in unit.biography):
+        changes["biography"] = [encode_stage(stage) for stage in unit.biography]
+    else:
+        for i, (stage, stage_dirty) in enumerate(zip(unit.biography, stage_dirty_fields)):
+            if stage_dirty:
+                array_filters.append({f"stage{i}.id": stage.id})
+                stage_changes = _get_stage_changes(stage, stage_dirty)
+                changes.update({f"biography.$[stage{i}].{name}": value for name, value in stage_changes.items()})
+
+    if not changes:
+        return None
+
+    changes["updated_at"] = dt.datetime.now(dt.timezone.utc)
+    return UpdateOne(
+        {"uuid": unit.uuid}, {"$set": changes, "$inc": {"version": 1}}, array_filters=array_filters or None
+    )
+
+
+def _check_unit_tree_documents(unit_dict: Document, unit_docs: Mapping[str, Document], max_depth: int) -> None:
+    """make sure all the components of the tree are present and it is not nested too deep"""
+    pending: list[tuple[Document, int]] = [(unit_dict, 0)]
+
+    while pending:
+        doc, depth = pending.pop()
+
+        if depth > max_depth:
+            message = f"Изделие {doc.get('internal_id')} превышает допустимую глубину вложенности ({max_depth})."
+            logger.error(message)
+            raise UnitNotFoundError(message)
+
+        for component_internal_id in doc.get("components_internal_ids") or []:
+            component_dict = unit_docs.get(component_internal_id)
+
+            if component_dict is None:
+                message = f"Компонент {component_internal_id} изделия {doc.get('internal_id')} не найден!"
+                logger.error(message)
+                raise UnitNotFoundError(message)
+
+            pending.append((component_dict, depth + 1))
+
+
+def _get_component_proxies(
+    unit_dict: Document,
+    unit_docs: Mapping[str, Document],
+    stage_docs: Mapping[str, list[Document]],
+    schemas: Mapping[str, ProductionSchema],
+    overrides: Mapping[str, Unit] | None,
+    embedded: bool,
+) -> list[UnitNode]:
+    """proxies of the components of the unit, each holding the proxies of its own components down to the leaves"""
+    components_units: list[UnitNode] = []
+    pending: list[tuple[Document, list[UnitNode], UnitProxy | None]] = [(unit_dict, components_units, None)]
+
+    while pending:
+        doc, components, parent_proxy = pending.pop()
+
+        for component_internal_id in doc.get("components_internal_ids") or []:
+            if overrides and (component_unit := overrides.get(component_internal_id)) is not None:
+                if parent_proxy is not None:
+                    component_unit.parent = parent_proxy
+                components.append(component_unit)
+                continue
+
+            component_dict = unit_docs[component_internal_id]
+            schema = schemas[component_dict["schema_id"]]
+            proxy_components: list[UnitNode] = []
+            loader = partial(
+                _get_unit_from_raw_db_data,
+                component_dict,
+                unit_docs,
+                stage_docs,
+                schemas,
+                overrides=overrides,
+                embedded=embedded,
+                components_units=proxy_components,
+            )
+            component_proxy = UnitProxy(
+                component_internal_id,
+                schema,
+                decode_status(component_dict, schema),
+                component_dict.get("featured_in_int_id"),
+                proxy_components,
+                loader,
+            )
+            component_proxy.parent = parent_proxy
+            components.append(component_proxy)
+            pending.append((component_dict, proxy_components, component_proxy))
+
+    return components_units
+
+
+def _get_unit_from_raw_db_data(
+    unit_dict: Document,
+    unit_docs: Mapping[str, Document],
+    stage_docs: Mapping[str, list[Document]],
+    schemas: Mapping[str, ProductionSchema],
+    max_depth: int | None = None,
+    overrides: Mapping[str, Unit] | None = None,
+    embedded: bool = False,
+    components_units: list[UnitNode] | None = None,
+) -> Unit:
+    """
+    Construct a Unit object from the prefetched tree documents. Its components are UnitProxy objects,
+    which construct the component units from the same documents once they are needed.
+    Units found in `overrides` (keyed by internal ID) are used as is instead of the DB data.
+    The tree is checked against `max_depth` when constructing its root. Proxies construct their units
+    with the `components_units` they hold.
+
+    With the `embedded` layout the stages are taken from the unit document itself. Units which have not
+    been migrated yet fall back to `stage_docs`, and their stages are considered missing from the DB,
+    so they get embedded on the next write.
+    """
+    if overrides and (unit := overrides.get(unit_dict["internal_id"])) is not None:
+        return unit
+
+    if components_units is None:
+        if max_depth is not None:
+            _check_unit_tree_documents(unit_dict, unit_docs, max_depth)
+
+        components_units = _get_component_proxies(unit_dict, unit_docs, stage_docs, schemas, overrides, embedded)
+
+    embedded_stages: list[Document] | None = unit_dict.get("biography") if embedded else None
+    is_in_db = embedded_stages is not None or not embedded
+    stage_dicts = embedded_stages if embedded_stages is not None else stage_docs.get(unit_dict["uuid"], [])
+    biography = [decode_stage(stage_dict, is_in_db) for stage_dict in stage_dicts]
+    return decode_unit(unit_dict, schemas[unit_dict["schema_id"]], biography, components_units)
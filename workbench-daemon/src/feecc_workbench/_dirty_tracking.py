@@ -0,0 +1,58 @@
+from itertools import count
+from typing import Any, ClassVar
+
+_GENERATION = count()
+
+
+class DirtyTracker:
+    """
+    Mixin tracking which of the persisted attributes were modified since the object was last written to the DB.
+
+    Every assignment to one of the `_tracked_fields` marks the attribute dirty with a new generation number.
+    A persistence layer takes a snapshot of the dirty attributes, writes them and then clears only the entries
+    whose generation did not change in the meantime, so modifications made during an ongoing write are not lost.
+    Newly constructed objects have all their tracked attributes dirty.
+    """
+
+    __slots__ = ("_dirty_fields",)
+
+    _tracked_fields: ClassVar[frozenset[str]] = frozenset()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+
+        if name in self._tracked_fields:
+            self.mark_dirty(name)
+
+    @property
+    def _dirty(self) -> dict[str, int]:
+        try:
+            return object.__getattribute__(self, "_dirty_fields")  # type: ignore
+        except AttributeError:
+            dirty: dict[str, int] = {}
+            object.__setattr__(self, "_dirty_fields", dirty)
+            return dirty
+
+    @property
+    def dirty_fields(self) -> dict[str, int]:
+        """snapshot of the modified attributes mapped to their modification generation"""
+        return dict(self._dirty)
+
+    def mark_dirty(self, *names: str) -> None:
+        """mark attributes modified in place (e.g. appended lists) as dirty"""
+        dirty = self._dirty
+
+        for name in names:
+            dirty[name] = next(_GENERATION)
+
+    def mark_clean(self, snapshot: dict[str, int] | None = None) -> None:
+        """forget the modifications recorded in the snapshot (or all of them) once they are persisted"""
+        dirty = self._dirty
+
+        if snapshot is None:
+            dirty.clear()
+            return
+
+        for name, generation in snapshot.items():
+            if dirty.get(name) == generation:
+                del dirty[name]
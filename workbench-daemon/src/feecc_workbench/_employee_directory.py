@@ -0,0 +1,194 @@
+import asyncio
+import datetime as dt
+from collections import OrderedDict
+from time import monotonic
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import PyMongoError
+
+from .Employee import Employee
+from .Types import Document
+
+
+def _get_employee(employee_data: Document) -> Employee:
+    """construct an Employee reusing the stored passport code instead of recomputing it"""
+    return Employee(
+        rfid_card_id=employee_data["rfid_card_id"],
+        name=employee_data["name"],
+        position=employee_data["position"],
+        passport_code=employee_data.get("passport_code", ""),
+    )
+
+
+class EmployeeDirectory:
+    """
+    In-memory employee directory keyed by RFID card ID.
+
+    The whole employee collection is loaded in bulk at startup. It is then kept up to date by a change stream
+    when the server supports one, otherwise by a periodic delta sync on the `updated_at` field. As the documents
+    edited without setting `updated_at` (e.g. the ones of init.js) are invisible to the delta sync, the directory
+    is fully reloaded whenever the number of employees changes and every `reload_interval` seconds. Unknown cards
+    are remembered in a bounded negative cache for a while, so repeated taps of an unregistered card do not hit the DB.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        sync_interval: float,
+        reload_interval: float,
+        negative_cache_size: int,
+        negative_cache_ttl: float,
+    ) -> None:
+        self._collection: AsyncIOMotorCollection = collection
+        self._sync_interval: float = sync_interval
+        self._reload_interval: float = reload_interval
+        self._negative_cache_size: int = negative_cache_size
+        self._negative_cache_ttl: float = negative_cache_ttl
+        self._employees: dict[str, Employee] = {}
+        self._card_ids: dict[Any, str] = {}  # document _id -> rfid_card_id, to handle deletions
+        self._unknown_cards: OrderedDict[str, float] = OrderedDict()  # rfid_card_id -> expiry time
+        self._synced_up_to: dt.datetime | None = None
+        self._reloaded_at: float = 0.0
+        self._loaded: bool = False
+        self._watcher: asyncio.Task[None] | None = None
+        self._mode: str = "lazy"
+        self.hits: int = 0
+        self.misses: int = 0
+        self.negative_hits: int = 0
+        self.syncs: int = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses + self.negative_hits
+        return {
+            "size": len(self._employees),
+            "unknown_cards": len(self._unknown_cards),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            "syncs": self.syncs,
+            "invalidation": self._mode,
+        }
+
+    async def start(self) -> None:
+        """Load all the employees and begin watching for the changes"""
+        await self.reload()
+
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def _store(self, employee_data: Document) -> None:
+        employee = _get_employee(employee_data)
+        self._employees[employee.rfid_card_id] = employee
+        self._card_ids[employee_data["_id"]] = employee.rfid_card_id
+        self._unknown_cards.pop(employee.rfid_card_id, None)
+
+        updated_at = employee_data.get("updated_at")
+        if isinstance(updated_at, dt.datetime) and (self._synced_up_to is None or updated_at > self._synced_up_to):
+            self._synced_up_to = updated_at
+
+    def _remove(self, document_id: Any) -> None:
+        card_id = self._card_ids.pop(document_id, None)
+        if card_id is not None:
+            self._employees.pop(card_id, None)
+
+    async def reload(self) -> None:
+        self._employees, self._card_ids, self._synced_up_to = {}, {}, None
+
+        async for employee_data in self._collection.find({}):
+            self._store(employee_data)
+
+        self._unknown_cards.clear()
+        self._loaded = True
+        self._reloaded_at = monotonic()
+        self.syncs += 1
+        logger.debug(f"Employee directory loaded. {len(self._employees)} employees cached")
+
+    async def _delta_sync(self) -> None:
+        is_reload_due = monotonic() - self._reloaded_at >= self._reload_interval
+
+        if is_reload_due or await self._collection.count_documents({}) != len(self._employees):
+            await self.reload()
+            return
+
+        if self._synced_up_to is not None:
+            async for employee_data in self._collection.find({"updated_at": {"$gt": self._synced_up_to}}):
+                self._store(employee_data)
+
+        self.syncs += 1
+
+    async def _watch(self) -> None:
+        try:
+            async with self._collection.watch(full_document="updateLookup") as change_stream:
+                self._mode = "change_stream"
+                logger.info("Employee directory is kept up to date by the change stream")
+                async for change in change_stream:
+                    if change["operationType"] == "delete":
+                        self._remove(change["documentKey"]["_id"])
+                    elif change.get("fullDocument") is not None:
+                        self._store(change["fullDocument"])
+                    else:
+                        await self.reload()
+        except PyMongoError as e:
+            logger.info(
+                f"Change streams are unavailable ({e}). Employee directory is synced every {self._sync_interval}s"
+            )
+
+        self._mode = "delta_sync"
+
+        while True:
+            await asyncio.sleep(self._sync_interval)
+            try:
+                await self._delta_sync()
+            except PyMongoError as e:
+                logger.error(f"Failed to sync employee directory: {e}")
+
+    def _is_known_unknown(self, card_id: str) -> bool:
+        expiry = self._unknown_cards.get(card_id)
+
+        if expiry is None:
+            return False
+
+        if expiry < monotonic():
+            del self._unknown_cards[card_id]
+            return False
+
+        return True
+
+    def _remember_unknown(self, card_id: str) -> None:
+        self._unknown_cards[card_id] = monotonic() + self._negative_cache_ttl
+        self._unknown_cards.move_to_end(card_id)
+
+        while len(self._unknown_cards) > self._negative_cache_size:
+            self._unknown_cards.popitem(last=False)
+
+    async def get(self, card_id: str) -> Employee | None:
+        """find the employee by the RFID card ID. Cards missing from the directory are looked up in the DB."""
+        if not self._loaded:
+            await self.reload()
+
+        if (employee := self._employees.get(card_id)) is not None:
+            self.hits += 1
+            return employee
+
+        if self._is_known_unknown(card_id):
+            self.negative_hits += 1
+            return None
+
+        self.misses += 1
+        employee_data: Document | None = await self._collection.find_one({"rfid_card_id": card_id})
+
+        if employee_data is None:
+            self._remember_unknown(card_id)
+            return None
+
+        self._store(employee_data)
+        return self._employees[card_id]
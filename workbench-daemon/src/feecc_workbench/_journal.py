@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import os
+import sys
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import IO, Any, NamedTuple
+
+from bson import json_util
+from loguru import logger
+
+from ._codec import encode_stage, encode_unit
+from .Types import Document
+from .Unit import Unit
+from .unit_utils import UnitEvent
+
+# extended JSON keeps the datetimes intact across the round trip
+_JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+def _get_unit_snapshot(unit: Unit) -> Document:
+    """the full state of the unit and its production stages"""
+    return {"unit": encode_unit(unit), "stages": [encode_stage(stage) for stage in unit.biography]}
+
+
+class _BufferedEvent(NamedTuple):
+    event: Document
+    line: bytes
+    units: list[Unit]
+    committed: asyncio.Future[None]
+
+
+class UnitJournal:
+    """
+    Local write-ahead journal of unit mutations.
+
+    Every push is appended to an NDJSON file as an event carrying the full snapshot of the affected units
+    and acknowledged as soon as the file is fsynced. Events appended while an fsync is in progress are
+    committed together by the next one. A background replayer applies the committed events to the DB in
+    order. Applying a snapshot is an upsert, so an event applied twice does no harm. The sequence number
+    of the last applied event is kept in a checkpoint file next to the journal and the events after it
+    are applied on startup. The journal is truncated once everything in it is applied and it outgrows
+    `max_bytes`.
+    """
+
+    def __init__(
+        self, path: str, apply_events: Callable[[list[Document]], Awaitable[None]], max_bytes: int, retry_delay: float
+    ) -> None:
+        self._path = Path(path)
+        self._checkpoint_path = self._path.with_name(f"{self._path.name}.checkpoint")
+        self._apply_events = apply_events
+        self._max_bytes: int = max_bytes
+        self._retry_delay: float = retry_delay
+        self._file: IO[bytes] | None = None
+        self._last_seq: int = 0
+        self._checkpoint: int = 0
+        self._buffer: list[_BufferedEvent] = []
+        self._unapplied: list[Document] = []
+        self._pending_units: dict[str, tuple[int, Unit]] = {}
+        self._file_lock = asyncio.Lock()
+        self._replay_lock = asyncio.Lock()
+        self._events_committed = asyncio.Event()
+        self._committer: asyncio.Task[None] | None = None
+        self._replayer: asyncio.Task[None] | None = None
+        self._closing: bool = False
+        self.appended: int = 0
+        self.commits: int = 0
+        self.replayed: int = 0
+        self.replay_failures: int = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "appended": self.appended,
+            "commits": self.commits,
+            "events_per_commit": round(self.appended / self.commits, 2) if self.commits else None,
+            "unapplied": len(self._unapplied) + len(self._buffer),
+            "replayed": self.replayed,
+            "replay_failures": self.replay_failures,
+            "last_seq": self._last_seq,
+            "checkpoint": self._checkpoint,
+        }
+
+    @property
+    def pending_units(self) -> dict[str, Unit]:
+        """units with journaled changes not applied to the DB yet, keyed by internal ID"""
+        return {internal_id: unit for internal_id, (_, unit) in self._pending_units.items()}
+
+    def _read(self) -> tuple[list[Document], int]:
+        """read the checkpoint and the journaled events, dropping a torn write at the end of the journal"""
+        checkpoint = int(self._checkpoint_path.read_text()) if self._checkpoint_path.exists() else 0
+        events: list[Document] = []
+
+        if not self._path.exists():
+            return events, checkpoint
+
+        with self._path.open("rb+") as file:
+            offset = 0
+            line = b""
+
+            for line in file:
+                try:
+                    events.append(json_util.loads(line.decode(), json_options=_JSON_OPTIONS))
+                except ValueError:
+                    if not line.endswith(b"\n"):
+                        logger.warning(f"Dropping an incomplete event at the end of the journal {self._path}")
+                        file.truncate(offset)
+                        break
+                    raise
+
+                offset += len(line)
+            else:
+                # the write was cut right before the newline. Complete it, so the next event gets a line of its own.
+                if line and not line.endswith(b"\n"):
+                    file.write(b"\n")
+
+        return events, checkpoint
+
+    async def recover(self) -> None:
+        """open the journal and apply the events which were not applied to the DB before the last shutdown"""
+        loop = asyncio.get_running_loop()
+
+        try:
+            events, self._checkpoint = await loop.run_in_executor(None, self._read)
+        except ValueError as e:
+            message = f"Journal {self._path} is corrupted: {e}"
+            logger.critical(message)
+            sys.exit(1)
+
+        self._closing = False
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._path, "ab", buffering=0)  # noqa: SIM115
+        self._unapplied = [event for event in events if event["seq"] > self._checkpoint]
+        self._last_seq = max([self._checkpoint, *(event["seq"] for event in events)])
+
+        if not self._unapplied:
+            return
+
+        logger.warning(f"Applying {len(self._unapplied)} journaled events left from the last run")
+
+        if not await self.replay():
+            message = f"Failed to apply the journaled events. They are kept in {self._path}"
+            logger.critical(message)
+            sys.exit(1)
+
+    async def append(self, event_type: UnitEvent, units: list[Unit]) -> None:
+        """journal the event with the current state of the units. Returns once the event is on the disk."""
+        if self._file is None:
+            await self.recover()
+
+        self._last_seq += 1
+        event = {
+            "seq": self._last_seq,
+            "type": event_type.value,
+            "time": dt.datetime.now(dt.timezone.utc),
+            "units": [_get_unit_snapshot(unit) for unit in units],
+        }
+        line = json_util.dumps(event, json_options=_JSON_OPTIONS).encode() + b"\n"
+        committed: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._buffer.append(_BufferedEvent(event, line, units, committed))
+        self.appended += 1
+
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.create_task(self._commit())
+
+        await committed
+
+    def _write(self, data: bytes) -> None:
+        assert self._file is not None
+        offset = self._file.tell()
+
+        try:
+            self._file.write(data)
+            os.fsync(self._file.fileno())
+        except OSError:
+            # do not leave a partial write in the middle of the journal
+            self._file.truncate(offset)
+            raise
+
+    async def _commit(self) -> None:
+        """write the buffered events with a single fsync until the buffer is drained"""
+        loop = asyncio.get_running_loop()
+
+        while self._buffer:
+            batch, self._buffer = self._buffer, []
+
+            try:
+                async with self._file_lock:
+                    await loop.run_in_executor(None, self._write, b"".join(item.line for item in batch))
+            except OSError as e:
+                logger.error(f"Failed to write {len(batch)} events into the journal: {e}")
+                for item in batch:
+                    item.committed.set_exception(e)
+                continue
+
+            self.commits += 1
+
+            for item in batch:
+                self._unapplied.append(item.event)
+                self._pending_units.update({unit.internal_id: (item.event["seq"], unit) for unit in item.units})
+                item.committed.set_result(None)
+
+            self._events_committed.set()
+
+            if self._replayer is None and not self._closing:
+                self._replayer = asyncio.create_task(self._run_replayer())
+
+    async def _run_replayer(self) -> None:
+        while True:
+            await self._events_committed.wait()
+            self._events_committed.clear()
+
+            while self._unapplied and not await self.replay():
+                await asyncio.sleep(self._retry_delay)
+
+    def _save_checkpoint(self, seq: int) -> None:
+        # replaying is idempotent, so losing the latest checkpoint on a crash only costs some repeated writes
+        tmp_path = self._checkpoint_path.with_name(f"{self._checkpoint_path.name}.tmp")
+        tmp_path.write_text(str(seq))
+        os.replace(tmp_path, self._checkpoint_path)
+
+    def _truncate(self) -> None:
+        assert self._file is not None
+        self._file.truncate(0)
+        os.fsync(self._file.fileno())
+
+    async def replay(self) -> bool:
+        """apply the committed events to the DB. Returns False if that failed."""
+        async with self._replay_lock:
+            events = list(self._unapplied)
+
+            if not events:
+                return True
+
+            try:
+                await self._apply_events(events)
+            except Exception as e:
+                self.replay_failures += 1
+                logger.error(f"Failed to apply {len(events)} journaled events to the DB: {e}")
+                return False
+
+            last_seq = events[-1]["seq"]
+            del self._unapplied[: len(events)]
+            self.replayed += len(events)
+            self._pending_units = {key: val for key, val in self._pending_units.items() if val[0] > last_seq}
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._save_checkpoint, last_seq)
+            self._checkpoint = last_seq
+
+            async with self._file_lock:
+                if not self._unapplied and not self._buffer and self._path.stat().st_size > self._max_bytes:
+                    await loop.run_in_executor(None, self._truncate)
+                    logger.info(f"Journal {self._path} has been applied and truncated")
+
+            return True
+
+    async def close(self) -> None:
+        """stop the replayer and apply what is left. Events which could not be applied stay in the journal."""
+        # the committer must not start a new replayer once the running one is stopped
+        self._closing = True
+
+        if self._committer is not None:
+            await asyncio.gather(self._committer, return_exceptions=True)
+
+        if self._replayer is not None:
+            # holding the lock, the replayer is cancelled between replays rather than in the middle of one
+            async with self._replay_lock:
+                self._replayer.cancel()
+
+            await asyncio.gather(self._replayer, return_exceptions=True)
+            self._replayer = None
+
+        await self.replay()
+
+        if self._unapplied:
+            logger.warning(f"{len(self._unapplied)} journaled events will be applied to the DB on the next start")
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,272 @@
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+from ._archive import ARCHIVE_COLLECTIONS
+from ._codec import STAGE_TIMESTAMP_FIELDS
+from ._db_utils import _get_stage_stats_dict_data
+from .stage_stats import StageDurationStats, get_session_duration
+from .Types import Document
+from .utils import parse_timestamp
+
+MAX_PASSES = 5
+
+_BatchMigration = Callable[[AsyncIOMotorDatabase, list[Document]], Awaitable[int]]
+
+_UNIT_PROJECTION = {"_id": 1, "uuid": 1, "version": 1, "biography": 1}
+
+
+async def _migrate_in_batches(
+    database: AsyncIOMotorDatabase,
+    query: Document,
+    batch_size: int,
+    migrate_batch: _BatchMigration,
+    collection_name: str = "unitData",
+    projection: Document = _UNIT_PROJECTION,
+) -> int:
+    """
+    Walk the matching documents in _id order and migrate them batch by batch.
+
+    Every document is updated only if it did not change since it was read (units are compared by their
+    `version`). Documents written concurrently by a running daemon are therefore left intact and picked up
+    by the next pass.
+    """
+    migrated = 0
+
+    for pass_number in range(1, MAX_PASSES + 1):
+        last_id, skipped = None, 0
+
+        while True:
+            batch_query = query if last_id is None else {**query, "_id": {"$gt": last_id}}
+            cursor = database[collection_name].find(batch_query, projection)
+            documents: list[Document] = await cursor.sort("_id", 1).limit(batch_size).to_list(length=None)
+
+            if not documents:
+                break
+
+            updated = await migrate_batch(database, documents)
+            migrated += updated
+            skipped += len(documents) - updated
+            last_id = documents[-1]["_id"]
+            logger.info(f"Pass {pass_number}: {migrated} documents of {collection_name} migrated so far")
+
+        if not skipped:
+            return migrated
+
+        logger.warning(f"{skipped} documents were modified during pass {pass_number} and will be migrated again")
+
+    logger.error(f"Some units kept changing during {MAX_PASSES} passes. Run the migration again.")
+    return migrated
+
+
+async def _embed_batch(database: AsyncIOMotorDatabase, units: list[Document]) -> int:
+    stages: dict[str, list[Document]] = {unit["uuid"]: [] for unit in units}
+    cursor = database.productionStagesData.find({"parent_unit_uuid": {"$in": list(stages)}}, {"_id": 0})
+
+    async for stage_dict in cursor.sort([("parent_unit_uuid", 1), ("number", 1)]):
+        stages[stage_dict["parent_unit_uuid"]].append(stage_dict)
+
+    tasks = [
+        UpdateOne(
+            {"_id": unit["_id"], "version": unit.get("version"), "biography": {"$exists": False}},
+            {"$set": {"biography": stages[unit["uuid"]]}, "$inc": {"version": 1}},
+        )
+        for unit in units
+    ]
+    result = await database.unitData.bulk_write(tasks, ordered=False)
+    return int(result.modified_count)
+
+
+async def _split_batch(database: AsyncIOMotorDatabase, units: list[Document]) -> int:
+    # stage documents are upserted first, so the units are never left without their stages
+    stage_tasks: list[ReplaceOne[Document] | DeleteMany] = [
+        DeleteMany({"parent_unit_uuid": unit["uuid"], "id": {"$nin": [stage["id"] for stage in unit["biography"]]}})
+        for unit in units
+    ]
+    stage_tasks.extend(
+        ReplaceOne({"id": stage["id"]}, stage, upsert=True) for unit in units for stage in unit["biography"]
+    )
+
+    if stage_tasks:
+        await database.productionStagesData.bulk_write(stage_tasks, ordered=False)
+
+    tasks = [
+        UpdateOne(
+            {"_id": unit["_id"], "version": unit.get("version")},
+            {"$unset": {"biography": ""}, "$inc": {"version": 1}},
+        )
+        for unit in units
+    ]
+    result = await database.unitData.bulk_write(tasks, ordered=False)
+    return int(result.modified_count)
+
+
+async def embed_biographies(database: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """
+    Migrate the units to the embedded storage layout by copying their production stages into the unit documents.
+    The stage documents are kept, so the daemons can keep running with the split layout until they are switched.
+    Returns the number of migrated units.
+    """
+    migrated = await _migrate_in_batches(database, {"biography": {"$exists": False}}, batch_size, _embed_batch)
+    logger.info(f"{migrated} units migrated to the embedded storage layout")
+    return migrated
+
+
+async def split_biographies(database: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """
+    Migrate the units back to the split storage layout by moving the embedded production stages
+    into the stages collection. Returns the number of migrated units.
+    """
+    migrated = await _migrate_in_batches(database, {"biography": {"$exists": True}}, batch_size, _split_batch)
+    logger.info(f"{migrated} units migrated to the split storage layout")
+    return migrated
+
+
+_LEGACY_TIMESTAMP_QUERY = {"$or": [{name: {"$type": "string"}} for name in STAGE_TIMESTAMP_FIELDS]}
+
+
+def _get_parsed_timestamps(stage_dict: Document) -> Document:
+    """the stage timestamps stored as strings, parsed"""
+    return {
+        name: parse_timestamp(stage_dict[name])
+        for name in STAGE_TIMESTAMP_FIELDS
+        if isinstance(stage_dict.get(name), str)
+    }
+
+
+async def _convert_stages_batch(database: AsyncIOMotorDatabase, stages: list[Document]) -> int:
+    tasks = [
+        UpdateOne(
+            {"_id": stage["_id"], **{name: stage.get(name) for name in STAGE_TIMESTAMP_FIELDS}},
+            {"$set": _get_parsed_timestamps(stage)},
+        )
+        for stage in stages
+    ]
+    result = await database.productionStagesData.bulk_write(tasks, ordered=False)
+    return int(result.modified_count)
+
+
+async def _convert_embedded_stages_batch(database: AsyncIOMotorDatabase, units: list[Document]) -> int:
+    tasks = [
+        UpdateOne(
+            {"_id": unit["_id"], "version": unit.get("version")},
+            {
+                "$set": {"biography": [{**stage, **_get_parsed_timestamps(stage)} for stage in unit["biography"]]},
+                "$inc": {"version": 1},
+            },
+        )
+        for unit in units
+    ]
+    result = await database.unitData.bulk_write(tasks, ordered=False)
+    return int(result.modified_count)
+
+
+async def convert_stage_timestamps(database: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """
+    Convert the stage timestamps stored as formatted strings by the earlier versions into datetimes,
+    in both storage layouts. Only the documents still holding strings are selected, so an interrupted
+    run resumes where it stopped. The daemons read both forms, so it can run while they are working.
+    Returns the number of converted documents.
+    """
+    projection = {"_id": 1, **{name: 1 for name in STAGE_TIMESTAMP_FIELDS}}
+    converted = await _migrate_in_batches(
+        database, _LEGACY_TIMESTAMP_QUERY, batch_size, _convert_stages_batch, "productionStagesData", projection
+    )
+    converted += await _migrate_in_batches(
+        database, {"biography": {"$elemMatch": _LEGACY_TIMESTAMP_QUERY}}, batch_size, _convert_embedded_stages_batch
+    )
+    logger.info(f"Stage timestamps converted to datetimes in {converted} documents")
+    return converted
+
+
+async def _get_unit_stage_docs(
+    database: AsyncIOMotorDatabase, units: list[Document], stage_collection_name: str
+) -> dict[str, list[Document]]:
+    """stages of the units, embedded or stored separately for the ones which are not migrated"""
+    stages: dict[str, list[Document]] = {unit["uuid"]: unit["biography"] for unit in units if "biography" in unit}
+    split_uuids = [unit["uuid"] for unit in units if "biography" not in unit]
+
+    if split_uuids:
+        cursor = database[stage_collection_name].find({"parent_unit_uuid": {"$in": split_uuids}}, {"_id": 0})
+
+        async for stage_dict in cursor:
+            stages.setdefault(stage_dict["parent_unit_uuid"], []).append(stage_dict)
+
+    return stages
+
+
+async def _count_stage_durations(
+    database: AsyncIOMotorDatabase,
+    unit_collection_name: str,
+    stage_collection_name: str,
+    stats: dict[tuple[str, str], StageDurationStats],
+    batch_size: int,
+) -> int:
+    """add the durations of the completed stages of the units in the collection to the stats"""
+    last_id, counted = None, 0
+
+    while True:
+        query: Document = {} if last_id is None else {"_id": {"$gt": last_id}}
+        cursor = database[unit_collection_name].find(query, {"_id": 1, "uuid": 1, "schema_id": 1, "biography": 1})
+        units: list[Document] = await cursor.sort("_id", 1).limit(batch_size).to_list(length=None)
+
+        if not units:
+            break
+
+        stages = await _get_unit_stage_docs(database, units, stage_collection_name)
+
+        for unit in units:
+            for stage in stages.get(unit["uuid"], []):
+                if not stage.get("completed") or stage.get("ended_prematurely"):
+                    continue
+
+                seconds = get_session_duration(
+                    parse_timestamp(stage.get("session_start_time")), parse_timestamp(stage.get("session_end_time"))
+                )
+
+                if seconds is None:
+                    continue
+
+                key = (unit["schema_id"], stage["schema_stage_id"])
+                stats.setdefault(key, StageDurationStats(stage["schema_stage_id"])).add(seconds)
+                counted += 1
+
+        last_id = units[-1]["_id"]
+        logger.info(f"{counted} stages of {unit_collection_name} counted so far")
+
+    return counted
+
+
+async def backfill_stage_stats(database: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """
+    Rebuild the stage duration statistics from the whole production history, archived units included.
+    The statistics are computed from scratch and replace the stored ones, so the job can be rerun any time.
+    The archive is read first, so a unit tree archived while the job runs is never counted twice. It may be
+    left out though, as may be the stages ending while the job runs. A rerun picks them up.
+    Returns the number of counted stages.
+    """
+    stats: dict[tuple[str, str], StageDurationStats] = {}
+    counted = 0
+
+    for unit_collection, stage_collection in [
+        (ARCHIVE_COLLECTIONS["unitData"], ARCHIVE_COLLECTIONS["productionStagesData"]),
+        ("unitData", "productionStagesData"),
+    ]:
+        counted += await _count_stage_durations(database, unit_collection, stage_collection, stats, batch_size)
+
+    tasks = [
+        ReplaceOne(
+            {"schema_id": schema_id, "schema_stage_id": stage_id},
+            _get_stage_stats_dict_data(schema_id, stage_stats),
+            upsert=True,
+        )
+        for (schema_id, stage_id), stage_stats in stats.items()
+    ]
+
+    if tasks:
+        await database.productionStageStats.bulk_write(tasks, ordered=False)
+
+    logger.info(f"Duration statistics of {len(tasks)} stages rebuilt from {counted} completed stages")
+    return counted
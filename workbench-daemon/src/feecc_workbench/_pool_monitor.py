@@ -0,0 +1,99 @@
+import threading
+from collections import deque
+from time import perf_counter
+from typing import Any
+
+from pymongo import monitoring
+
+
+class ConnectionPoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool statistics, most importantly the time operations wait to check out a connection.
+
+    PyMongo checks connections out synchronously within the calling thread (Motor runs it in a thread pool),
+    so the start of an ongoing checkout is kept in a thread local. Wait times of the last `window`
+    checkouts are kept for the percentiles.
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wait_times: deque[float] = deque(maxlen=window)
+        self.checkouts: int = 0
+        self.failed_checkouts: int = 0
+        self.connections_created: int = 0
+        self.connections_closed: int = 0
+        self.pool_clears: int = 0
+        self.max_wait_ms: float = 0.0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+
+        def percentile(q: float) -> float | None:
+            return round(wait_times[int(q * (len(wait_times) - 1))], 3) if wait_times else None
+
+        return {
+            "open_connections": self.connections_created - self.connections_closed,
+            "connections_created": self.connections_created,
+            "checkouts": self.checkouts,
+            "failed_checkouts": self.failed_checkouts,
+            "pool_clears": self.pool_clears,
+            "checkout_wait_ms": {
+                "mean": round(sum(wait_times) / len(wait_times), 3) if wait_times else None,
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": round(self.max_wait_ms, 3),
+            },
+        }
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        self._local.started = perf_counter()
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        started: float | None = getattr(self._local, "started", None)
+        self._local.started = None
+
+        if started is None:
+            return
+
+        wait_ms = (perf_counter() - started) * 1000
+
+        with self._lock:
+            self.checkouts += 1
+            self._wait_times.append(wait_ms)
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self._local.started = None
+
+        with self._lock:
+            self.failed_checkouts += 1
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        pass
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+from collections.abc import Iterable
+from time import monotonic
+from typing import Any, NamedTuple
+
+import bson
+
+from .Types import Document
+
+
+class UnitTreeDocuments(NamedTuple):
+    """raw documents a unit tree is assembled from"""
+
+    unit_dict: Document
+    unit_docs: dict[str, Document]
+    stage_docs: dict[str, list[Document]]
+    archived: bool = False
+
+
+class _CacheEntry(NamedTuple):
+    data: bytes  # BSON encoded tree documents
+    versions: dict[str, int]  # internal ID -> document version of every unit in the tree
+
+
+class UnitCache:
+    """
+    LRU cache of unit tree documents keyed by the internal ID of the root unit.
+
+    Entries are stored BSON encoded, so every hit is decoded into fresh documents which the caller
+    is free to build mutable Unit objects from, and the memory budget is accounted in exact bytes.
+    Each entry remembers the `version` of every unit document in the tree, so it can be validated
+    against the DB when other workbenches may write into it. Local writes invalidate all the entries
+    containing the written units. Unknown internal IDs are remembered for a short while.
+    """
+
+    def __init__(self, max_bytes: int, negative_cache_size: int, negative_cache_ttl: float) -> None:
+        self._max_bytes: int = max_bytes
+        self._negative_cache_size: int = negative_cache_size
+        self._negative_cache_ttl: float = negative_cache_ttl
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._containing: dict[str, set[str]] = {}  # internal ID -> roots of the cached trees containing it
+        self._unknown: OrderedDict[str, float] = OrderedDict()  # internal ID -> expiry time
+        self._size_bytes: int = 0
+        self.generation: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.negative_hits: int = 0
+        self.stale: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses + self.negative_hits
+        return {
+            "size": len(self._entries),
+            "size_bytes": self._size_bytes,
+            "max_bytes": self._max_bytes,
+            "unknown_units": len(self._unknown),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def get(self, internal_id: str) -> tuple[UnitTreeDocuments, dict[str, int]] | None:
+        """get the cached tree documents and their versions. Lookups are counted by the caller."""
+        entry = self._entries.get(internal_id)
+
+        if entry is None:
+            return None
+
+        self._entries.move_to_end(internal_id)
+        data: Document = bson.decode(entry.data)
+        return UnitTreeDocuments(data["unit"], data["units"], data["stages"]), entry.versions
+
+    def is_known_missing(self, internal_id: str) -> bool:
+        expiry = self._unknown.get(internal_id)
+
+        if expiry is None:
+            return False
+
+        if expiry < monotonic():
+            del self._unknown[internal_id]
+            return False
+
+        return True
+
+    def put(self, internal_id: str, tree: UnitTreeDocuments, generation: int) -> None:
+        """
+        Cache the tree documents. Trees fetched before an invalidation (the generation has changed
+        since the fetch began) are dropped as they might miss the invalidated changes.
+        """
+        if not self.enabled or generation != self.generation:
+            return
+
+        data = bson.encode({"unit": tree.unit_dict, "units": tree.unit_docs, "stages": tree.stage_docs})
+
+        if len(data) > self._max_bytes:
+            return
+
+        self._discard(internal_id)
+        versions = {unit_id: doc.get("version", 0) for unit_id, doc in tree.unit_docs.items()}
+        self._entries[internal_id] = _CacheEntry(data, versions)
+        self._size_bytes += len(data)
+
+        for unit_id in versions:
+            self._containing.setdefault(unit_id, set()).add(internal_id)
+
+        while self._size_bytes > self._max_bytes:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def remember_missing(self, internal_id: str, generation: int) -> None:
+        if not self.enabled or generation != self.generation:
+            return
+
+        self._unknown[internal_id] = monotonic() + self._negative_cache_ttl
+        self._unknown.move_to_end(internal_id)
+
+        while len(self._unknown) > self._negative_cache_size:
+            self._unknown.popitem(last=False)
+
+    def _discard(self, root_internal_id: str) -> None:
+        entry = self._entries.pop(root_internal_id, None)
+
+        if entry is None:
+            return
+
+        self._size_bytes -= len(entry.data)
+
+        for unit_id in entry.versions:
+            roots = self._containing.get(unit_id)
+            if roots is not None:
+                roots.discard(root_internal_id)
+                if not roots:
+                    del self._containing[unit_id]
+
+    def invalidate(self, internal_ids: Iterable[str]) -> None:
+        """drop all the cached trees containing any of the provided units"""
+        self.generation += 1
+
+        for internal_id in internal_ids:
+            self._unknown.pop(internal_id, None)
+
+            for root_internal_id in self._containing.pop(internal_id, set()):
+                self._discard(root_internal_id)
+                self.invalidations += 1
+
+    def mark_stale(self, root_internal_id: str) -> None:
+        """drop a tree found to be modified by another writer"""
+        self._discard(root_internal_id)
+        self.stale += 1
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .models import ProductionSchema
+    from .Unit import Unit
+    from .unit_tree import UnitNode
+    from .unit_utils import UnitStatus
+
+
+class UnitProxy:
+    """
+    Stand-in for a component of a loaded unit tree.
+
+    Holds what the composite unit itself needs to know about the component (its internal ID, schema,
+    status, the unit it is featured in and its own components, proxies as well) and builds the full Unit,
+    biography included, from the already fetched tree documents on the first access to anything else,
+    or when the tree is prefetched with `Unit.prefetch_components`. Once loaded, all the attribute reads
+    and writes go to the loaded unit.
+    """
+
+    __slots__ = (
+        "_internal_id",
+        "_schema",
+        "_status",
+        "_featured_in_int_id",
+        "_components_units",
+        "_parent",
+        "_loader",
+        "_unit",
+    )
+
+    _internal_id: str
+    _schema: ProductionSchema
+    _status: UnitStatus
+    _featured_in_int_id: str | None
+    _components_units: list[UnitNode]
+    _parent: UnitNode | None
+    _loader: Callable[[], Unit] | None
+    _unit: Unit | None
+
+    def __init__(
+        self,
+        internal_id: str,
+        schema: ProductionSchema,
+        status: UnitStatus,
+        featured_in_int_id: str | None,
+        components_units: list[UnitNode],
+        loader: Callable[[], Unit],
+    ) -> None:
+        object.__setattr__(self, "_internal_id", internal_id)
+        object.__setattr__(self, "_schema", schema)
+        object.__setattr__(self, "_status", status)
+        object.__setattr__(self, "_featured_in_int_id", featured_in_int_id)
+        object.__setattr__(self, "_components_units", components_units)
+        object.__setattr__(self, "_parent", None)
+        object.__setattr__(self, "_loader", loader)
+        object.__setattr__(self, "_unit", None)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<UnitProxy {self._internal_id} ({state})>"
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._unit is not None
+
+    @property
+    def loaded_unit(self) -> Unit | None:
+        return self._unit
+
+    @property
+    def internal_id(self) -> str:
+        return self._unit.internal_id if self._unit is not None else self._internal_id
+
+    @property
+    def schema(self) -> ProductionSchema:
+        return self._unit.schema if self._unit is not None else self._schema
+
+    @property
+    def status(self) -> UnitStatus:
+        return self._unit.status if self._unit is not None else self._status
+
+    @property
+    def featured_in_int_id(self) -> str | None:
+        return self._unit.featured_in_int_id if self._unit is not None else self._featured_in_int_id
+
+    @property
+    def components_units(self) -> list[UnitNode]:
+        return self._unit.components_units if self._unit is not None else self._components_units
+
+    @property
+    def parent(self) -> UnitNode | None:
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent: UnitNode | None) -> None:
+        object.__setattr__(self, "_parent", parent)
+
+        if self._unit is not None:
+            self._unit.parent = parent
+
+    def load(self) -> Unit:
+        if self._unit is None:
+            assert self._loader is not None
+            unit = self._loader()
+            unit.parent = self._parent
+            object.__setattr__(self, "_unit", unit)
+            object.__setattr__(self, "_loader", None)
+            return unit
+
+        return self._unit
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "parent":
+            object.__setattr__(self, name, value)
+            return
+
+        setattr(self.load(), name, value)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from loguru import logger
+
+from .Unit import Unit
+
+
+class WriteBehindQueue:
+    """
+    Deferred unit persistence.
+
+    Pushed units are acknowledged immediately and written to the DB by a background flusher once
+    either `max_pending` units are queued or `max_delay` seconds have passed. Units are queued by
+    reference and keyed by UUID, so repeated pushes of the same unit coalesce into a single write
+    of its latest in-memory state.
+    """
+
+    def __init__(
+        self, flush_units: Callable[[list[Unit]], Awaitable[dict[str, bool]]], max_pending: int, max_delay: float
+    ) -> None:
+        self._flush_units = flush_units
+        self._max_pending: int = max_pending
+        self._max_delay: float = max_delay
+        self._pending: dict[str, Unit] = {}
+        self._in_flight: dict[str, Unit] = {}
+        self._threshold_reached = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: asyncio.Task[None] | None = None
+        self._is_closing: bool = False
+        self.enqueued: int = 0
+        self.written: int = 0
+        self.flushes: int = 0
+        self.failures: int = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "coalesced": self.enqueued - self.written - len(self._pending) - len(self._in_flight),
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
+
+    def enqueue(self, unit: Unit) -> None:
+        self._pending[unit.uuid] = unit
+        self.enqueued += 1
+
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+        if len(self._pending) >= self._max_pending:
+            self._threshold_reached.set()
+
+    @property
+    def pending_units(self) -> dict[str, Unit]:
+        """all units with unflushed changes keyed by internal ID"""
+        return {unit.internal_id: unit for units in (self._in_flight, self._pending) for unit in units.values()}
+
+    async def _run_flusher(self) -> None:
+        while not self._is_closing:
+            try:
+                await asyncio.wait_for(self._threshold_reached.wait(), timeout=self._max_delay)
+            except asyncio.TimeoutError:
+                pass
+
+            self._threshold_reached.clear()
+
+            if self._pending:
+                await self.flush()
+
+    async def flush(self) -> None:
+        """write all the pending units into the DB"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            self._in_flight, self._pending = self._pending, {}
+            units = list(self._in_flight.values())
+
+            try:
+                result = await self._flush_units(units)
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(units)} units failed: {e}")
+                result = {unit.uuid: False for unit in units}
+
+            failed = {uuid: self._in_flight[uuid] for uuid, is_written in result.items() if not is_written}
+            self.written += len(units) - len(failed)
+            self.flushes += 1
+            self._in_flight = {}
+
+            if failed:
+                self.failures += 1
+                logger.error(f"{len(failed)} units were not written and will be retried on the next flush")
+                # units re-pushed in the meantime carry the newer state already
+                self._pending = {**failed, **self._pending}
+
+    async def close(self) -> None:
+        """stop the background flusher and write everything still pending"""
+        if self._flusher is not None:
+            # not cancelled, so that the write in progress is not interrupted
+            self._is_closing = True
+            self._threshold_reached.set()
+            await self._flusher
+            self._flusher = None
+
+        await self.flush()
+
+        if self._pending:
+            logger.critical(f"{len(self._pending)} units could not be written into the DB on shutdown")
@@ -1,36 +1,220 @@
+import asyncio
+import datetime as dt
+import enum
+from collections.abc import AsyncGenerator
 from dataclasses import asdict
 from os import getenv
+from time import monotonic
 from typing import Any
 
 import pydantic
+from bson import ObjectId
+from bson.errors import InvalidId
 from loguru import logger
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
-from pymongo import InsertOne, UpdateOne
-
-from ._db_utils import _get_database_client, _get_unit_dict_data
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from ._archive import ARCHIVE_COLLECTIONS, UnitArchive
+from ._change_feed import ChangeFeed
+from ._codec import encode_stage, encode_unit
+from ._db_indexes import ensure_indexes, verify_query_plans
+from ._db_utils import (
+    _check_database_connection,
+    _get_database_client,
+    _get_embedded_unit_dict_data,
+    _get_embedded_unit_task,
+    _get_failed_task_indices,
+    _get_stage_changes,
+    _get_stage_duration_update,
+    _get_stage_stats_from_raw_db_data,
+    _get_unit_changes,
+    _get_unit_from_raw_db_data,
+    _get_unit_tree,
+)
+from ._employee_directory import EmployeeDirectory
+from ._journal import UnitJournal
+from ._pool_monitor import ConnectionPoolMonitor
+from ._unit_cache import UnitCache, UnitTreeDocuments
+from ._write_behind import WriteBehindQueue
 from .Employee import Employee
+from .events import event_bus
 from .exceptions import EmployeeNotFoundError, UnitNotFoundError
 from .models import ProductionSchema
 from .ProductionStage import ProductionStage
-from .Singleton import SingletonMeta
+from .stage_stats import StageDurationStats
+from .storage import StorageEngine
 from .Types import BulkWriteTask, Document
 from .Unit import Unit
-from .unit_utils import UnitStatus
+from .unit_utils import StageSummary, UnitEvent, UnitStatus, UnitSummary
 from .utils import async_time_execution
 
+
+class StorageLayout(enum.Enum):
+    """supported unit storage layouts"""
+
+    split = "split"  # production stages are stored in a collection of their own
+    embedded = "embedded"  # production stages are embedded into the unit documents
+
+
 MONGODB_URI: str = getenv("MONGODB_URI")
 MONGODB_DB_NAME: str = getenv("MONGODB_DB_NAME")
+MONGODB_MAX_POOL_SIZE: int = int(getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE: int = int(getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_WARM_CONNECTIONS: int = int(getenv("MONGODB_WARM_CONNECTIONS", "4"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGODB_CONNECT_TIMEOUT_MS: int = int(getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+MONGODB_SOCKET_TIMEOUT_MS: int | None = int(getenv("MONGODB_SOCKET_TIMEOUT_MS", "0")) or None
+MONGODB_WAIT_QUEUE_TIMEOUT_MS: int | None = int(getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "0")) or None
+MONGODB_COMPRESSORS: str = getenv("MONGODB_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+MONGODB_STORAGE_LAYOUT: StorageLayout = StorageLayout(getenv("MONGODB_STORAGE_LAYOUT", "split"))
+UNIT_TREE_MAX_DEPTH: int = int(getenv("UNIT_TREE_MAX_DEPTH", "16"))
+SCHEMA_CACHE_TTL: float = float(getenv("SCHEMA_CACHE_TTL", "300"))
+MONGODB_MANAGE_INDEXES: bool = getenv("MONGODB_MANAGE_INDEXES", "true").lower() == "true"
+EMPLOYEE_DIRECTORY_SYNC_INTERVAL: float = float(getenv("EMPLOYEE_DIRECTORY_SYNC_INTERVAL", "60"))
+EMPLOYEE_DIRECTORY_RELOAD_INTERVAL: float = float(getenv("EMPLOYEE_DIRECTORY_RELOAD_INTERVAL", "600"))
+EMPLOYEE_NEGATIVE_CACHE_SIZE: int = int(getenv("EMPLOYEE_NEGATIVE_CACHE_SIZE", "256"))
+EMPLOYEE_NEGATIVE_CACHE_TTL: float = float(getenv("EMPLOYEE_NEGATIVE_CACHE_TTL", "30"))
+MONGODB_WRITE_BEHIND: bool = getenv("MONGODB_WRITE_BEHIND", "false").lower() == "true"
+MONGODB_WRITE_BEHIND_MAX_PENDING: int = int(getenv("MONGODB_WRITE_BEHIND_MAX_PENDING", "50"))
+MONGODB_WRITE_BEHIND_MAX_DELAY: float = float(getenv("MONGODB_WRITE_BEHIND_MAX_DELAY", "1.0"))
+MONGODB_INSERT_CHUNK_SIZE: int = int(getenv("MONGODB_INSERT_CHUNK_SIZE", "100"))
+MONGODB_JOURNAL: bool = getenv("MONGODB_JOURNAL", "false").lower() == "true"
+MONGODB_JOURNAL_PATH: str = getenv("MONGODB_JOURNAL_PATH", "feecc-workbench.journal")
+MONGODB_JOURNAL_MAX_SIZE_MB: float = float(getenv("MONGODB_JOURNAL_MAX_SIZE_MB", "16"))
+MONGODB_JOURNAL_RETRY_DELAY: float = float(getenv("MONGODB_JOURNAL_RETRY_DELAY", "1.0"))
+MONGODB_CHANGE_FEED: bool = getenv("MONGODB_CHANGE_FEED", "true").lower() == "true"
+MONGODB_CHANGE_FEED_POLL_INTERVAL: float = float(getenv("MONGODB_CHANGE_FEED_POLL_INTERVAL", "2.0"))
+# seconds. Changes stamped this much before the last seen one are read again, to cover the clock skew between instances
+MONGODB_CHANGE_FEED_POLL_LOOKBACK: float = float(getenv("MONGODB_CHANGE_FEED_POLL_LOOKBACK", "10.0"))
+UNIT_ARCHIVE_AFTER_DAYS: float = float(getenv("UNIT_ARCHIVE_AFTER_DAYS", "90"))
+UNIT_ARCHIVE_INTERVAL: float = float(getenv("UNIT_ARCHIVE_INTERVAL", "0"))  # seconds, 0 disables the archiver
+UNIT_ARCHIVE_BATCH_SIZE: int = int(getenv("UNIT_ARCHIVE_BATCH_SIZE", "500"))
+UNIT_CACHE_SIZE_MB: float = float(getenv("UNIT_CACHE_SIZE_MB", "16"))
+UNIT_CACHE_NEGATIVE_SIZE: int = int(getenv("UNIT_CACHE_NEGATIVE_SIZE", "256"))
+UNIT_CACHE_NEGATIVE_TTL: float = float(getenv("UNIT_CACHE_NEGATIVE_TTL", "5"))
+UNIT_CACHE_VERIFY_VERSIONS: bool = getenv("UNIT_CACHE_VERIFY_VERSIONS", "true").lower() == "true"
+
+
+class _SchemaCache:
+    """
+    In-process production schema cache.
+
+    All the schemas are preloaded at startup and served from a dict afterwards. The cache is kept
+    up to date by a change stream on the schemas collection if the server supports one (replica sets),
+    otherwise it is fully reloaded every SCHEMA_CACHE_TTL seconds.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, ttl: float) -> None:
+        self._collection: AsyncIOMotorCollection = collection
+        self._ttl: float = ttl
+        self._schemas: dict[str, ProductionSchema] = {}
+        self._loaded: bool = False
+        self._loaded_at: float = 0.0
+        self._watcher: asyncio.Task[None] | None = None
+        self._mode: str = "lazy"
+        self.hits: int = 0
+        self.misses: int = 0
+        self.reloads: int = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._schemas),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "reloads": self.reloads,
+            "invalidation": self._mode,
+            "age_seconds": round(monotonic() - self._loaded_at, 1) if self._loaded else None,
+        }
+
+    async def start(self) -> None:
+        """Preload all the schemas and begin watching for the changes"""
+        await self.reload()
+
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    async def reload(self) -> None:
+        schema_data = await self._collection.find({}, {"_id": 0}).to_list(length=None)
+        self._schemas = {schema["schema_id"]: pydantic.parse_obj_as(ProductionSchema, schema) for schema in schema_data}
+        self._loaded, self._loaded_at = True, monotonic()
+        self.reloads += 1
+        logger.debug(f"Schema cache reloaded. {len(self._schemas)} schemas cached")
+
+    async def _watch(self) -> None:
+        try:
+            async with self._collection.watch() as change_stream:
+                self._mode = "change_stream"
+                logger.info("Schema cache is invalidated by the change stream")
+                async for _ in change_stream:
+                    await self.reload()
+        except PyMongoError as e:
+            logger.info(f"Change streams are unavailable ({e}). Schema cache is reloaded every {self._ttl}s")
+
+        self._mode = "ttl"
+
+        while True:
+            await asyncio.sleep(self._ttl)
+            try:
+                await self.reload()
+            except PyMongoError as e:
+                logger.error(f"Failed to reload schema cache: {e}")
+
+    async def get_many(self, schema_ids: set[str]) -> dict[str, ProductionSchema]:
+        """get the cached schemas, fetching the ones missing from the cache in one query"""
+        if not self._loaded:
+            await self.reload()
+
+        schemas = {schema_id: self._schemas[schema_id] for schema_id in schema_ids if schema_id in self._schemas}
+        self.hits += len(schemas)
+
+        if missing := list(schema_ids - schemas.keys()):
+            self.misses += len(missing)
+            cursor = self._collection.find({"schema_id": {"$in": missing}}, {"_id": 0})
 
+            async for schema_data in cursor:
+                schema = pydantic.parse_obj_as(ProductionSchema, schema_data)
+                self._schemas[schema.schema_id] = schemas[schema.schema_id] = schema
 
-class MongoDbWrapper(metaclass=SingletonMeta):
+        return schemas
+
+    async def get_all(self) -> list[ProductionSchema]:
+        if not self._loaded:
+            await self.reload()
+
+        self.hits += 1
+        return list(self._schemas.values())
+
+
+class MongoDbWrapper(StorageEngine):
     """handles interactions with MongoDB database"""
 
     @logger.catch
     def __init__(self) -> None:
-        logger.info("Trying to connect to MongoDB")
-
-        uri: str = MONGODB_URI
-        self._client: AsyncIOMotorClient = _get_database_client(uri)
+        self._pool_monitor = ConnectionPoolMonitor()
+        client_options: dict[str, Any] = {
+            "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": MONGODB_MIN_POOL_SIZE,
+            "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": MONGODB_SOCKET_TIMEOUT_MS,
+            "waitQueueTimeoutMS": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            "event_listeners": [self._pool_monitor],
+        }
+
+        if MONGODB_COMPRESSORS:
+            client_options["compressors"] = MONGODB_COMPRESSORS
+
+        # no connection is made until connect() is awaited
+        self._client: AsyncIOMotorClient = _get_database_client(MONGODB_URI, **client_options)
         db_name: str = MONGODB_DB_NAME
         self._database: AsyncIOMotorDatabase = self._client[db_name]
 
@@ -39,173 +223,729 @@ class MongoDbWrapper(metaclass=SingletonMeta):
         self._unit_collection: AsyncIOMotorCollection = self._database.unitData
         self._prod_stage_collection: AsyncIOMotorCollection = self._database.productionStagesData
         self._schemas_collection: AsyncIOMotorCollection = self._database.productionSchemas
+        self._stage_stats_collection: AsyncIOMotorCollection = self._database.productionStageStats
+        self._archived_unit_collection: AsyncIOMotorCollection = self._database[ARCHIVE_COLLECTIONS["unitData"]]
+        self._archived_stage_collection: AsyncIOMotorCollection = self._database[
+            ARCHIVE_COLLECTIONS["productionStagesData"]
+        ]
+        self._layout: StorageLayout = MONGODB_STORAGE_LAYOUT
+
+        # caches
+        self._schema_cache = _SchemaCache(self._schemas_collection, SCHEMA_CACHE_TTL)
+        self._employee_directory = EmployeeDirectory(
+            self._employee_collection,
+            EMPLOYEE_DIRECTORY_SYNC_INTERVAL,
+            EMPLOYEE_DIRECTORY_RELOAD_INTERVAL,
+            EMPLOYEE_NEGATIVE_CACHE_SIZE,
+            EMPLOYEE_NEGATIVE_CACHE_TTL,
+        )
+        self._unit_cache = UnitCache(
+            int(UNIT_CACHE_SIZE_MB * 1024 * 1024),
+            UNIT_CACHE_NEGATIVE_SIZE,
+            UNIT_CACHE_NEGATIVE_TTL,
+        )
+
+        # deferred persistence
+        self._write_behind: WriteBehindQueue | None = (
+            WriteBehindQueue(self._bulk_push_units, MONGODB_WRITE_BEHIND_MAX_PENDING, MONGODB_WRITE_BEHIND_MAX_DELAY)
+            if MONGODB_WRITE_BEHIND
+            else None
+        )
+        # takes precedence over the write-behind queue, as it survives restarts
+        self._journal: UnitJournal | None = (
+            UnitJournal(
+                MONGODB_JOURNAL_PATH,
+                self._apply_journal_events,
+                int(MONGODB_JOURNAL_MAX_SIZE_MB * 1024 * 1024),
+                MONGODB_JOURNAL_RETRY_DELAY,
+            )
+            if MONGODB_JOURNAL
+            else None
+        )
+
+        # hot/cold tiering
+        self._archive = UnitArchive(
+            self._database, UNIT_ARCHIVE_AFTER_DAYS, UNIT_ARCHIVE_INTERVAL, UNIT_ARCHIVE_BATCH_SIZE
+        )
+
+        # cross-instance change propagation
+        self._change_feed: ChangeFeed | None = (
+            ChangeFeed(self._database, event_bus, MONGODB_CHANGE_FEED_POLL_INTERVAL, MONGODB_CHANGE_FEED_POLL_LOOKBACK)
+            if MONGODB_CHANGE_FEED
+            else None
+        )
+
+    async def connect(self) -> None:
+        """
+        Check the connection, pre-warm the connection pool, bootstrap indexes, apply the events left
+        in the journal, preload in-process caches and start following the changes made by other instances
+        """
+        logger.info("Trying to connect to MongoDB")
+        await _check_database_connection(self._client, MONGODB_URI)
+        logger.info(f"Successfully connected to MongoDB. Storage layout: {self._layout.value}")
+
+        # concurrent commands make the pool open as many connections
+        await asyncio.gather(*(self._client.admin.command("ping") for _ in range(MONGODB_WARM_CONNECTIONS)))
+        logger.debug(f"Connection pool pre-warmed: {self._pool_monitor.stats['open_connections']} connections open")
+
+        if MONGODB_MANAGE_INDEXES:
+            await ensure_indexes(self._database)
+            await verify_query_plans(self._database)
+
+        if self._journal is not None:
+            await self._journal.recover()
+
+        await self._schema_cache.start()
+        await self._employee_directory.start()
+        await self._archive.start()
 
-        logger.info("Successfully connected to MongoDB")
+        if self._change_feed is not None:
+            self._change_feed.start()
+
+    @property
+    def is_journaled(self) -> bool:
+        return self._journal is not None
+
+    @property
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Connection pool and in-process cache statistics"""
+        stats = {
+            "connection_pool": self._pool_monitor.stats,
+            "schema_cache": self._schema_cache.stats,
+            "employee_directory": self._employee_directory.stats,
+            "unit_cache": self._unit_cache.stats,
+            "archive": self._archive.stats,
+        }
+
+        if self._write_behind is not None:
+            stats["write_behind"] = self._write_behind.stats
+
+        if self._journal is not None:
+            stats["journal"] = self._journal.stats
+
+        if self._change_feed is not None:
+            stats["change_feed"] = self._change_feed.stats
+            stats["event_bus"] = event_bus.stats
+
+        return stats
+
+    async def flush_pending_writes(self) -> None:
+        """Write all the deferred changes into the DB. Must be awaited before closing the connection."""
+        if self._write_behind is not None:
+            await self._write_behind.close()
+
+        if self._journal is not None:
+            await self._journal.close()
 
     def close_connection(self) -> None:
+        self._schema_cache.stop()
+        self._employee_directory.stop()
+        self._archive.stop()
+
+        if self._change_feed is not None:
+            self._change_feed.stop()
+
         self._client.close()
         logger.info("MongoDB connection closed")
 
-    async def _bulk_push_production_stages(self, production_stages: list[ProductionStage]) -> None:
+    async def _bulk_write(
+        self, collection: AsyncIOMotorCollection, tasks: list[BulkWriteTask], ordered: bool = True
+    ) -> set[int]:
+        """Run a bulk write and return the indices of the tasks which have not been applied"""
+        if not tasks:
+            return set()
+
+        try:
+            result = await collection.bulk_write(tasks, ordered=ordered)
+            logger.debug(f"Bulk write operation result: {result.bulk_api_result}")
+            return set()
+        except BulkWriteError as e:
+            logger.error(f"Bulk write operation on {collection.name} failed: {e.details.get('writeErrors')}")
+            return _get_failed_task_indices(e, len(tasks), ordered)
+
+    async def _bulk_push_production_stages(self, production_stages: list[ProductionStage]) -> set[str]:
+        """
+        Insert new stages and update only the modified fields of the known ones. Unchanged stages are skipped.
+        Returns UUIDs of the units whose stages could not be written.
+        """
         tasks: list[BulkWriteTask] = []
+        written: list[tuple[ProductionStage, dict[str, int]]] = []
 
         for stage in production_stages:
-            stage_dict = asdict(stage)
-            del stage_dict["is_in_db"]
+            dirty_fields = stage.dirty_fields
+
+            if not stage.is_in_db:
+                task: BulkWriteTask = InsertOne(encode_stage(stage))
+            elif dirty_fields:
+                task = UpdateOne({"id": stage.id}, {"$set": _get_stage_changes(stage, dirty_fields)})
+            else:
+                continue
+
+            tasks.append(task)
+            written.append((stage, dirty_fields))
+
+        failed = await self._bulk_write(self._prod_stage_collection, tasks, ordered=False)
+        failed_units: set[str] = set()
 
-            if stage.is_in_db:
-                task: BulkWriteTask = UpdateOne({"id": stage.id}, {"$set": stage_dict})
+        for i, (stage, dirty_fields) in enumerate(written):
+            if i in failed:
+                failed_units.add(stage.parent_unit_uuid)
             else:
-                task = InsertOne(stage_dict)
                 stage.is_in_db = True
+                stage.mark_clean(dirty_fields)
+
+        return failed_units
+
+    async def _bulk_push_units(self, units: list[Unit]) -> dict[str, bool]:
+        """
+        Write the provided units and their production stages with a single unordered bulk write per collection.
+        Returns a mapping of unit UUIDs to whether the unit and all its stages were written successfully.
+
+        The `version` of every unit document affected by the write is incremented. Stages are written
+        before the units, so a reader seeing the new version is guaranteed to see the new stages too.
+        """
+        if self._layout is StorageLayout.embedded:
+            return await self._bulk_push_embedded_units(units)
+
+        tasks: list[BulkWriteTask] = []
+        written: list[tuple[Unit, dict[str, int]]] = []
+        now = dt.datetime.now(dt.timezone.utc)
+
+        for unit in units:
+            dirty_fields = unit.dirty_fields
+
+            if not unit.is_in_db:
+                task: BulkWriteTask = InsertOne({**encode_unit(unit), "version": 0, "updated_at": now})
+            elif dirty_fields:
+                changes = _get_unit_changes(unit, dirty_fields)
+                task = UpdateOne({"uuid": unit.uuid}, {"$set": {**changes, "updated_at": now}, "$inc": {"version": 1}})
+            elif any(not stage.is_in_db or stage.dirty_fields for stage in unit.biography):
+                task = UpdateOne({"uuid": unit.uuid}, {"$set": {"updated_at": now}, "$inc": {"version": 1}})
+            else:
+                continue
 
             tasks.append(task)
+            written.append((unit, dirty_fields))
+
+        failed_stage_units = await self._bulk_push_production_stages(
+            [stage for unit in units for stage in unit.biography]
+        )
+        failed_tasks = await self._bulk_write(self._unit_collection, tasks, ordered=False)
+        self._unit_cache.invalidate(unit.internal_id for unit in units)
+        result = {unit.uuid: unit.uuid not in failed_stage_units for unit in units}
+
+        for i, (unit, dirty_fields) in enumerate(written):
+            if i in failed_tasks:
+                result[unit.uuid] = False
+            else:
+                unit.is_in_db = True
+                unit.mark_clean(dirty_fields)
+
+        return result
+
+    async def _bulk_push_embedded_units(self, units: list[Unit]) -> dict[str, bool]:
+        """Write the provided units with their embedded production stages in a single unordered bulk write"""
+        tasks: list[BulkWriteTask] = []
+        written: list[tuple[Unit, dict[str, int], list[dict[str, int]]]] = []
+
+        for unit in units:
+            dirty_fields = unit.dirty_fields
+            stage_dirty_fields = [stage.dirty_fields for stage in unit.biography]
+            task = _get_embedded_unit_task(unit, dirty_fields, stage_dirty_fields)
+
+            if task is not None:
+                tasks.append(task)
+                written.append((unit, dirty_fields, stage_dirty_fields))
+
+        failed_tasks = await self._bulk_write(self._unit_collection, tasks, ordered=False)
+        self._unit_cache.invalidate(unit.internal_id for unit in units)
+        result = {unit.uuid: True for unit in units}
 
-        result = await self._prod_stage_collection.bulk_write(tasks)
-        logger.debug(f"Bulk write operation result: {result.bulk_api_result}")
+        for i, (unit, dirty_fields, stage_dirty_fields) in enumerate(written):
+            if i in failed_tasks:
+                result[unit.uuid] = False
+                continue
+
+            unit.is_in_db = True
+            unit.mark_clean(dirty_fields)
+
+            for stage, stage_dirty in zip(unit.biography, stage_dirty_fields):
+                stage.is_in_db = True
+                stage.mark_clean(stage_dirty)
+
+        return result
+
+    async def _apply_journal_events(self, events: list[Document]) -> None:
+        """Upsert the latest unit snapshots found in the journaled events"""
+        snapshots: dict[str, Document] = {}
+
+        for event in events:
+            snapshots.update({snapshot["unit"]["uuid"]: snapshot for snapshot in event["units"]})
+
+        stage_tasks: list[BulkWriteTask] = []
+        unit_tasks: list[BulkWriteTask] = []
+        now = dt.datetime.now(dt.timezone.utc)
+
+        for uuid, snapshot in snapshots.items():
+            unit_doc = {**snapshot["unit"], "updated_at": now}
+
+            if self._layout is StorageLayout.embedded:
+                unit_doc["biography"] = snapshot["stages"]
+            else:
+                stage_tasks.extend(
+                    UpdateOne({"id": stage["id"]}, {"$set": stage}, upsert=True) for stage in snapshot["stages"]
+                )
+
+            unit_tasks.append(UpdateOne({"uuid": uuid}, {"$set": unit_doc, "$inc": {"version": 1}}, upsert=True))
+
+        try:
+            # the stages go first, so that a unit never refers to stages missing from the DB
+            if await self._bulk_write(self._prod_stage_collection, stage_tasks, ordered=False):
+                raise PyMongoError("Failed to write journaled production stages")
+            if await self._bulk_write(self._unit_collection, unit_tasks, ordered=False):
+                raise PyMongoError("Failed to write journaled units")
+        finally:
+            self._unit_cache.invalidate(snapshot["unit"]["internal_id"] for snapshot in snapshots.values())
+
+    async def _journal_units(self, units: list[Unit], event: UnitEvent) -> None:
+        """Record the units in the journal. They count as written once it is on the disk."""
+        assert self._journal is not None
+        written: list[tuple[Unit | ProductionStage, dict[str, int]]] = []
+
+        for unit in units:
+            items: list[Unit | ProductionStage] = [unit, *unit.biography]
+            written.extend((item, item.dirty_fields) for item in items)
+
+        await self._journal.append(event, units)
+
+        for item, dirty_fields in written:
+            item.is_in_db = True
+            item.mark_clean(dirty_fields)
 
     @async_time_execution
-    async def push_unit(self, unit: Unit, include_components: bool = True) -> None:
-        """Upload or update data about the unit into the DB"""
-        if unit.components_units and include_components:
-            for component in unit.components_units:
-                await self.push_unit(component)
+    async def push_unit(
+        self, unit: Unit, include_components: bool = True, event: UnitEvent = UnitEvent.unit_updated
+    ) -> None:
+        """Upload or update data about the unit (and its component tree) into the DB"""
+        units = _get_unit_tree(unit) if include_components else [unit]
 
-        await self._bulk_push_production_stages(unit.biography)
-        unit_dict = _get_unit_dict_data(unit)
+        if self._journal is not None:
+            await self._journal_units(units, event)
+            return
 
-        if unit.is_in_db:
-            await self._unit_collection.find_one_and_update({"uuid": unit.uuid}, {"$set": unit_dict})
-        else:
-            await self._unit_collection.insert_one(unit_dict)
+        if self._write_behind is not None:
+            for unit_ in units:
+                self._write_behind.enqueue(unit_)
+            return
+
+        result = await self._bulk_push_units(units)
+
+        if failed := [uuid for uuid, is_written in result.items() if not is_written]:
+            raise PyMongoError(f"Failed to write units {', '.join(failed)} into the DB")
+
+    @async_time_execution
+    async def insert_units(self, units: list[Unit]) -> None:
+        """
+        Insert new units along with their production stages with insert_many, MONGODB_INSERT_CHUNK_SIZE
+        units at a time. The stages of a chunk are inserted before its units.
+        """
+        for start in range(0, len(units), MONGODB_INSERT_CHUNK_SIZE):
+            chunk = units[start : start + MONGODB_INSERT_CHUNK_SIZE]
+
+            try:
+                if self._layout is StorageLayout.embedded:
+                    unit_docs = [_get_embedded_unit_dict_data(unit) for unit in chunk]
+                else:
+                    if stage_docs := [encode_stage(stage) for unit in chunk for stage in unit.biography]:
+                        await self._prod_stage_collection.insert_many(stage_docs, ordered=False)
+                    now = dt.datetime.now(dt.timezone.utc)
+                    unit_docs = [{**encode_unit(unit), "version": 0, "updated_at": now} for unit in chunk]
+
+                await self._unit_collection.insert_many(unit_docs, ordered=False)
+            except PyMongoError as e:
+                logger.error(f"Bulk insert failed after {start} of {len(units)} units were inserted: {e}")
+                raise
+            finally:
+                self._unit_cache.invalidate(unit.internal_id for unit in chunk)
+
+            for unit in chunk:
+                for item in [unit, *unit.biography]:
+                    item.is_in_db = True
+                    item.mark_clean()
+
+        logger.info(f"{len(units)} units have been inserted")
 
     @async_time_execution
     async def unit_update_single_field(self, unit_internal_id: str, field_name: str, field_val: Any) -> None:
-        await self._unit_collection.find_one_and_update(
-            {"internal_id": unit_internal_id}, {"$set": {field_name: field_val}}
+        await self._unit_collection.update_one(
+            {"internal_id": unit_internal_id},
+            {"$set": {field_name: field_val, "updated_at": dt.datetime.now(dt.timezone.utc)}, "$inc": {"version": 1}},
         )
+        self._unit_cache.invalidate([unit_internal_id])
         logger.debug(f"Unit {unit_internal_id} field '{field_name}' has been set to '{field_val}'")
 
-    async def _get_unit_from_raw_db_data(self, unit_dict: Document) -> Unit:
-        # get nested component units
-        components_internal_ids = unit_dict.get("components_internal_ids", [])
-        components_units = []
-
-        for component_internal_id in components_internal_ids:
-            component_unit = await self.get_unit_by_internal_id(component_internal_id)
-            components_units.append(component_unit)
-
-        # get biography objects instead of dicts
-        stage_dicts = unit_dict.get("prod_stage_dicts", [])
-        biography = []
-
-        for stage_dict in stage_dicts:
-            production_stage = ProductionStage(**stage_dict)
-            production_stage.is_in_db = True
-            biography.append(production_stage)
-
-        # construct a Unit object from the document data
-        return Unit(
-            schema=await self.get_schema_by_id(unit_dict["schema_id"]),
-            uuid=unit_dict.get("uuid"),
-            internal_id=unit_dict.get("internal_id"),
-            is_in_db=True,
-            biography=biography or None,
-            components_units=components_units or None,
-            featured_in_int_id=unit_dict.get("featured_in_int_id"),
-            passport_ipfs_cid=unit_dict.get("passport_ipfs_cid"),
-            txn_hash=unit_dict.get("txn_hash"),
-            serial_number=unit_dict.get("serial_number"),
-            creation_time=unit_dict.get("creation_time"),
-            status=unit_dict.get("status", None),
-        )
+    @staticmethod
+    def _get_status_query(status: UnitStatus, after: str | None) -> Document:
+        query: Document = {"status": status.value}
 
-    @async_time_execution
-    async def get_unit_ids_and_names_by_status(self, status: UnitStatus) -> list[dict[str, str]]:
-        pipeline = [  # noqa: CCR001,ECE001
-            {"$match": {"status": status.value}},
-            {
-                "$lookup": {
-                    "from": "productionSchemas",
-                    "let": {"schema_id": "$schema_id"},
-                    "pipeline": [
-                        {"$match": {"$expr": {"$eq": ["$schema_id", "$$schema_id"]}}},
-                        {"$project": {"_id": 0, "unit_name": 1}},
-                    ],
-                    "as": "unit_name",
-                }
-            },
-            {"$unwind": {"path": "$unit_name"}},
-            {"$project": {"_id": 0, "unit_name": 1, "internal_id": 1}},
-        ]
-        result: list[Document] = await self._unit_collection.aggregate(pipeline).to_list(length=None)
+        if after is not None:
+            try:
+                query["_id"] = {"$gt": ObjectId(after)}
+            except InvalidId as e:
+                raise ValueError(f"Invalid pagination cursor: {after}") from e
+
+        return query
 
+    async def _get_unit_ids_and_names(self, entries: list[Document]) -> list[dict[str, str]]:
+        """resolve unit names from the cached schemas. Units of unknown schemas are skipped."""
+        schemas = await self._schema_cache.get_many({entry["schema_id"] for entry in entries})
         return [
             {
                 "internal_id": entry["internal_id"],
-                "unit_name": entry["unit_name"]["unit_name"],
+                "unit_name": schemas[entry["schema_id"]].unit_name,
             }
-            for entry in result
+            for entry in entries
+            if entry["schema_id"] in schemas
+        ]
+
+    @async_time_execution
+    async def get_unit_ids_and_names_by_status(
+        self, status: UnitStatus, after: str | None = None, limit: int | None = None
+    ) -> tuple[list[dict[str, str]], str | None]:
+        """
+        Get a page of IDs and names of the units with the provided status.
+
+        Pages are keyset-paginated on the document _id: pass the returned cursor as `after` to get the
+        next page. The returned cursor is None once the last page is reached.
+        """
+        query = self._get_status_query(status, after)
+        cursor = self._unit_collection.find(query, {"internal_id": 1, "schema_id": 1}).sort("_id", 1)
+
+        if limit is not None:
+            cursor = cursor.limit(limit)
+
+        entries: list[Document] = await cursor.to_list(length=None)
+        next_cursor = str(entries[-1]["_id"]) if limit is not None and len(entries) == limit else None
+
+        return await self._get_unit_ids_and_names(entries), next_cursor
+
+    async def iter_unit_ids_and_names_by_status(
+        self, status: UnitStatus, batch_size: int = 100
+    ) -> AsyncGenerator[dict[str, str], None]:
+        """Yield IDs and names of the units with the provided status as the DB cursor advances"""
+        query = self._get_status_query(status, None)
+        cursor = self._unit_collection.find(query, {"internal_id": 1, "schema_id": 1}).sort("_id", 1)
+        batch: list[Document] = []
+
+        async for entry in cursor.batch_size(batch_size):
+            batch.append(entry)
+
+            if len(batch) == batch_size:
+                for unit_entry in await self._get_unit_ids_and_names(batch):
+                    yield unit_entry
+                batch = []
+
+        for unit_entry in await self._get_unit_ids_and_names(batch):
+            yield unit_entry
+
+    @async_time_execution
+    async def record_stage_durations(self, schema_id: str, durations: list[tuple[str, float]]) -> None:
+        """Count the durations into the stage statistics documents in place with $inc, $min and $max upserts"""
+        tasks: list[BulkWriteTask] = [
+            UpdateOne(
+                {"schema_id": schema_id, "schema_stage_id": schema_stage_id},
+                _get_stage_duration_update(seconds),
+                upsert=True,
+            )
+            for schema_stage_id, seconds in durations
         ]
 
+        if await self._bulk_write(self._stage_stats_collection, tasks, ordered=False):
+            raise PyMongoError(f"Failed to record stage durations of schema {schema_id}")
+
+    @async_time_execution
+    async def get_stage_duration_stats(self, schema_id: str) -> list[StageDurationStats]:
+        """Read the statistics of the schema stages. One document per stage, regardless of the history length."""
+        cursor = self._stage_stats_collection.find({"schema_id": schema_id}, {"_id": 0})
+        return [_get_stage_stats_from_raw_db_data(stats_dict) async for stats_dict in cursor]
+
     @async_time_execution
     async def get_employee_by_card_id(self, card_id: str) -> Employee:
         """find the employee with the provided RFID card id"""
-        employee_data: Document | None = await self._employee_collection.find_one({"rfid_card_id": card_id}, {"_id": 0})
+        employee = await self._employee_directory.get(card_id)
 
-        if employee_data is None:
+        if employee is None:
             message = f"Сотрудник с картой {card_id} не найден!"
             logger.error(message)
             raise EmployeeNotFoundError(message)
 
-        return Employee(**employee_data)
+        return employee
+
+    async def _get_unit_tree_documents(
+        self, unit_internal_id: str, archived: bool = False
+    ) -> tuple[Document, list[Document]] | None:
+        """Fetch the unit document along with the documents of all its nested components in one aggregation"""
+        collection = self._archived_unit_collection if archived else self._unit_collection
+        projection: Document = {"_id": 0, "component_dicts._id": 0}
+
+        if self._layout is StorageLayout.split:
+            # left behind by the migration to the embedded layout
+            projection.update({"biography": 0, "component_dicts.biography": 0})
 
-    @async_time_execution
-    async def get_unit_by_internal_id(self, unit_internal_id: str) -> Unit:
         pipeline = [  # noqa: CCR001,ECE001
             {"$match": {"internal_id": unit_internal_id}},
+            {"$limit": 1},
             {
-                "$lookup": {
-                    "from": "productionStagesData",
-                    "let": {"parent_uuid": "$uuid"},
-                    "pipeline": [
-                        {"$match": {"$expr": {"$eq": ["$parent_unit_uuid", "$$parent_uuid"]}}},
-                        {"$project": {"_id": 0}},
-                        {"$sort": {"number": 1}},
-                    ],
-                    "as": "prod_stage_dicts",
+                "$graphLookup": {
+                    "from": collection.name,
+                    "startWith": "$components_internal_ids",
+                    "connectFromField": "components_internal_ids",
+                    "connectToField": "internal_id",
+                    "as": "component_dicts",
+                    "maxDepth": UNIT_TREE_MAX_DEPTH - 1,
                 }
             },
-            {"$project": {"_id": 0}},
+            {"$project": projection},
         ]
 
         try:
-            result: list[Document] = await self._unit_collection.aggregate(pipeline).to_list(length=1)
+            result: list[Document] = await collection.aggregate(pipeline).to_list(length=1)
         except Exception as e:
             logger.error(e)
             raise e
 
         if not result:
+            return None
+
+        unit_dict: Document = result[0]
+        component_dicts: list[Document] = unit_dict.pop("component_dicts", [])
+
+        return unit_dict, component_dicts
+
+    async def _get_stages_by_parent_uuids(
+        self, parent_uuids: list[str], archived: bool = False
+    ) -> dict[str, list[Document]]:
+        """Fetch production stages of all the provided units in one query grouped by the parent unit"""
+        collection = self._archived_stage_collection if archived else self._prod_stage_collection
+        stages: dict[str, list[Document]] = {uuid: [] for uuid in parent_uuids}
+        cursor = collection.find({"parent_unit_uuid": {"$in": parent_uuids}}, {"_id": 0})
+
+        async for stage_dict in cursor.sort([("parent_unit_uuid", 1), ("number", 1)]):
+            stages[stage_dict["parent_unit_uuid"]].append(stage_dict)
+
+        return stages
+
+    async def _get_unit_versions(self, unit_internal_ids: list[str]) -> dict[str, int]:
+        cursor = self._unit_collection.find(
+            {"internal_id": {"$in": unit_internal_ids}}, {"_id": 0, "internal_id": 1, "version": 1}
+        )
+        return {doc["internal_id"]: doc.get("version", 0) async for doc in cursor}
+
+    async def _get_cached_unit_tree(self, unit_internal_id: str) -> UnitTreeDocuments:
+        """
+        Get the unit tree documents from the unit cache or the DB, falling back to the archive.
+        Cached trees are validated against the document versions in the DB unless UNIT_CACHE_VERIFY_VERSIONS is off.
+        Archived trees are not cached.
+        """
+        cache = self._unit_cache
+
+        if cache.is_known_missing(unit_internal_id):
+            cache.negative_hits += 1
             message = f"Изделие с номером {unit_internal_id} не найдено!"
             logger.warning(message)
             raise UnitNotFoundError(message)
 
-        unit_dict: Document = result[0]
+        if (cached := cache.get(unit_internal_id)) is not None:
+            tree, versions = cached
+
+            if not UNIT_CACHE_VERIFY_VERSIONS or await self._get_unit_versions(list(versions)) == versions:
+                cache.hits += 1
+                return tree
+
+            cache.mark_stale(unit_internal_id)
+
+        cache.misses += 1
+        generation = cache.generation
+
+        archived = False
+
+        if (tree_documents := await self._get_unit_tree_documents(unit_internal_id)) is None:
+            tree_documents = await self._get_unit_tree_documents(unit_internal_id, archived=True)
+            archived = True
+
+        if tree_documents is None:
+            cache.remember_missing(unit_internal_id, generation)
+            message = f"Изделие с номером {unit_internal_id} не найдено!"
+            logger.warning(message)
+            raise UnitNotFoundError(message)
+
+        unit_dict, component_dicts = tree_documents
+        unit_docs: dict[str, Document] = {doc["internal_id"]: doc for doc in component_dicts}
+        unit_docs[unit_dict["internal_id"]] = unit_dict
+
+        if self._layout is StorageLayout.embedded:
+            # only the units which have not been migrated yet have their stages stored separately
+            parent_uuids = [doc["uuid"] for doc in unit_docs.values() if "biography" not in doc]
+        else:
+            parent_uuids = [doc["uuid"] for doc in unit_docs.values()]
+
+        stage_docs = await self._get_stages_by_parent_uuids(parent_uuids, archived) if parent_uuids else {}
+
+        if archived:
+            self._archive.hits += 1
+            logger.info(f"Unit {unit_internal_id} has been loaded from the archive")
+            return UnitTreeDocuments(unit_dict, unit_docs, stage_docs, archived=True)
+
+        tree = UnitTreeDocuments(unit_dict, unit_docs, stage_docs)
+        cache.put(unit_internal_id, tree, generation)
+        return tree
+
+    def _get_pending_units(self) -> dict[str, Unit]:
+        """units with changes not written into the DB yet, keyed by internal ID"""
+        pending_units: dict[str, Unit] = {}
+
+        if self._journal is not None:
+            pending_units.update(self._journal.pending_units)
+
+        if self._write_behind is not None:
+            pending_units.update(self._write_behind.pending_units)
+
+        return pending_units
+
+    @async_time_execution
+    async def get_unit_by_internal_id(self, unit_internal_id: str) -> Unit:
+        """
+        Load the unit and its whole component tree.
+
+        The tree is fetched in a fixed number of queries regardless of its size: one aggregation
+        for the unit documents and one for the production stages (none with the embedded layout),
+        repeated on the archive collections if the unit has been archived.
+        Schemas come from the schema cache and recently loaded trees are served from the unit cache.
+        Unit objects are then assembled in memory.
+        """
+        pending_units = self._get_pending_units()
+
+        if unit_internal_id in pending_units:
+            return pending_units[unit_internal_id]
+
+        tree = await self._get_cached_unit_tree(unit_internal_id)
+        schemas = await self.get_schemas_by_ids({doc["schema_id"] for doc in tree.unit_docs.values()})
+
+        unit = _get_unit_from_raw_db_data(
+            tree.unit_dict,
+            tree.unit_docs,
+            tree.stage_docs,
+            schemas,
+            UNIT_TREE_MAX_DEPTH,
+            pending_units,
+            embedded=self._layout is StorageLayout.embedded,
+        )
+
+        if tree.archived:
+            # archived units are missing from the hot collections, so writing them restores them there
+            unit.prefetch_components()
+
+            for item in _get_unit_tree(unit):
+                item.is_in_db = False
+                for stage in item.biography:
+                    stage.is_in_db = False
+
+        return unit
+
+    @async_time_execution
+    async def get_unit_summary(self, unit_internal_id: str) -> UnitSummary:
+        """
+        Load the unit status and the names and completion of its stages.
+
+        Only these fields are projected from the unit document and the stage documents (embedded into
+        the unit document with the embedded layout). Components are not loaded. Units missing from
+        the hot collections are looked up in the archive.
+        """
+        if (pending_unit := self._get_pending_units().get(unit_internal_id)) is not None:
+            return UnitSummary.from_unit(pending_unit)
 
-        return await self._get_unit_from_raw_db_data(unit_dict)
+        projection: Document = {"_id": 0, "uuid": 1, "schema_id": 1, "status": 1}
+
+        if self._layout is StorageLayout.embedded:
+            projection.update({f"biography.{field}": 1 for field in ("name", "schema_stage_id", "completed")})
+
+        unit_doc, stage_collection = None, self._prod_stage_collection
+
+        if not self._unit_cache.is_known_missing(unit_internal_id):
+            unit_doc = await self._unit_collection.find_one({"internal_id": unit_internal_id}, projection)
+
+            if unit_doc is None:
+                unit_doc = await self._archived_unit_collection.find_one({"internal_id": unit_internal_id}, projection)
+                stage_collection = self._archived_stage_collection
+
+                if unit_doc is not None:
+                    self._archive.hits += 1
+
+        if unit_doc is None:
+            message = f"Изделие с номером {unit_internal_id} не найдено!"
+            logger.warning(message)
+            raise UnitNotFoundError(message)
+
+        # the split layout or a unit which has not been migrated to the embedded one yet
+        if (stage_docs := unit_doc.get("biography")) is None:
+            cursor = stage_collection.find(
+                {"parent_unit_uuid": unit_doc["uuid"]}, {"_id": 0, "name": 1, "schema_stage_id": 1, "completed": 1}
+            )
+            stage_docs = await cursor.sort("number", 1).to_list(None)
+
+        schema = await self.get_schema_by_id(unit_doc["schema_id"])
+
+        return UnitSummary(
+            internal_id=unit_internal_id,
+            schema_id=unit_doc["schema_id"],
+            status=UnitStatus(unit_doc["status"]),
+            biography=[StageSummary(doc["name"], doc["schema_stage_id"], doc["completed"]) for doc in stage_docs],
+            components_schema_ids=schema.required_components_schema_ids or [],
+        )
+
+    @async_time_execution
+    async def upsert_employees(self, employees: list[Employee]) -> None:
+        """create or replace the employees"""
+        now = dt.datetime.now(dt.timezone.utc)
+        tasks = [
+            ReplaceOne({"rfid_card_id": employee.rfid_card_id}, {**asdict(employee), "updated_at": now}, upsert=True)
+            for employee in employees
+        ]
+
+        if tasks:
+            await self._employee_collection.bulk_write(tasks, ordered=False)
+            await self._employee_directory.reload()
 
     @async_time_execution
     async def get_all_schemas(self) -> list[ProductionSchema]:
         """get all production schemas"""
-        schema_data = await self._schemas_collection.find({}, {"_id": 0}).to_list(length=None)
-        return [pydantic.parse_obj_as(ProductionSchema, schema) for schema in schema_data]
+        return await self._schema_cache.get_all()
+
+    @async_time_execution
+    async def get_schemas_by_ids(self, schema_ids: set[str]) -> dict[str, ProductionSchema]:
+        """get the specified production schemas"""
+        schemas = await self._schema_cache.get_many(schema_ids)
+
+        if missing := schema_ids - schemas.keys():
+            raise ValueError(f"Schemas {', '.join(sorted(missing))} not found")
+
+        return schemas
 
     @async_time_execution
     async def get_schema_by_id(self, schema_id: str) -> ProductionSchema:
         """get the specified production schema"""
-        target_schema = await self._schemas_collection.find_one({"schema_id": schema_id}, {"_id": 0})
+        schemas = await self._schema_cache.get_many({schema_id})
 
-        if target_schema is None:
+        if schema_id not in schemas:
             raise ValueError(f"Schema {schema_id} not found")
 
-        return pydantic.parse_obj_as(ProductionSchema, target_schema)
+        return schemas[schema_id]
+
+    @async_time_execution
+    async def upsert_schemas(self, schemas: list[ProductionSchema]) -> None:
+        """create or replace the production schemas"""
+        tasks = [ReplaceOne({"schema_id": schema.schema_id}, schema.dict(), upsert=True) for schema in schemas]
+
+        if tasks:
+            await self._schemas_collection.bulk_write(tasks, ordered=False)
+            await self._schema_cache.reload()
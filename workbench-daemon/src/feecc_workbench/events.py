@@ -0,0 +1,167 @@
+import asyncio
+import enum
+import json
+from collections.abc import AsyncGenerator
+from dataclasses import asdict, dataclass, field
+from os import getenv
+from typing import Any, TypeAlias
+from uuid import uuid4
+
+from loguru import logger
+
+from .Singleton import SingletonMeta
+
+EVENT_BUS_QUEUE_SIZE: int = int(getenv("EVENT_BUS_QUEUE_SIZE", "1000"))
+
+
+class ChangeEventType(enum.Enum):
+    """kinds of the stored data changes"""
+
+    unit_created = "unit_created"
+    unit_updated = "unit_updated"
+    unit_deleted = "unit_deleted"
+    stage_updated = "stage_updated"
+
+
+@dataclass(frozen=True, slots=True)
+class UnitChangeEvent:
+    """A unit document has changed"""
+
+    type: ChangeEventType  # noqa: A003
+    unit_uuid: str | None
+    unit_internal_id: str | None = None
+    schema_id: str | None = None
+    status: str | None = None
+    version: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class StageChangeEvent:
+    """A production stage of a unit has changed"""
+
+    type: ChangeEventType  # noqa: A003
+    unit_uuid: str | None
+    stage_id: str | None = None
+    schema_stage_id: str | None = None
+    name: str | None = None
+    number: int | None = None
+    completed: bool | None = None
+
+
+ChangeEvent: TypeAlias = UnitChangeEvent | StageChangeEvent
+
+
+def get_event_api_dict(event: ChangeEvent) -> dict[str, Any]:
+    return {**asdict(event), "type": event.type.value}
+
+
+@dataclass(frozen=True, slots=True)
+class EventFilter:
+    """
+    Subscription filter. An event passes if it has every one of the set attributes equal to the given value.
+    Unit-level attributes (e.g. `status`) filter out the stage events, as those do not carry them.
+    """
+
+    types: frozenset[ChangeEventType] | None = None
+    unit_uuid: str | None = None
+    unit_internal_id: str | None = None
+    schema_id: str | None = None
+    status: str | None = None
+
+    def matches(self, event: ChangeEvent) -> bool:
+        if self.types is not None and event.type not in self.types:
+            return False
+
+        for name in ("unit_uuid", "unit_internal_id", "schema_id", "status"):
+            value = getattr(self, name)
+
+            if value is not None and getattr(event, name, None) != value:
+                return False
+
+        return True
+
+
+@dataclass
+class EventSubscription:
+    """A single subscriber of the event bus. Provides awaitable interface for the matching events."""
+
+    event_filter: EventFilter = field(default_factory=EventFilter)
+    subscription_id: str = field(default_factory=lambda: uuid4().hex[:4])
+    feed: asyncio.Queue[ChangeEvent] = field(default_factory=lambda: asyncio.Queue(EVENT_BUS_QUEUE_SIZE))
+    dropped: int = 0
+
+    def put(self, event: ChangeEvent) -> None:
+        """queue the event, dropping the oldest one if the subscriber does not keep up"""
+        if self.feed.full():
+            self.feed.get_nowait()
+            self.dropped += 1
+
+        self.feed.put_nowait(event)
+
+    async def get_event(self) -> ChangeEvent:
+        return await self.feed.get()
+
+
+class EventBus(metaclass=SingletonMeta):
+    """
+    In-process bus of the stored data changes.
+
+    The storage engine publishes the changes made by any instance sharing the DB and the bus fans
+    them out to the subscribers whose filters they match. Publishing never blocks.
+
+    Singleton object.
+    """
+
+    def __init__(self) -> None:
+        self._subscriptions: list[EventSubscription] = []
+        self.published: int = 0
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped": sum(subscription.dropped for subscription in self._subscriptions),
+        }
+
+    def subscribe(self, event_filter: EventFilter | None = None) -> EventSubscription:
+        subscription = EventSubscription(event_filter or EventFilter())
+        self._subscriptions.append(subscription)
+        logger.debug(f"Event subscription {subscription.subscription_id} created")
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+            logger.debug(f"Event subscription {subscription.subscription_id} removed")
+
+    def publish(self, event: ChangeEvent) -> None:
+        self.published += 1
+
+        for subscription in self._subscriptions:
+            if subscription.event_filter.matches(event):
+                subscription.put(event)
+
+
+event_bus = EventBus()
+
+
+async def change_event_generator(event_filter: EventFilter | None = None) -> AsyncGenerator[dict[str, str], None]:
+    """Change event generator for SSE streaming"""
+    logger.info("SSE connection to change event streaming endpoint established.")
+    subscription = event_bus.subscribe(event_filter)
+
+    try:
+        while True:
+            event = await subscription.get_event()
+            yield {"event": event.type.value, "data": json.dumps(get_event_api_dict(event))}
+
+    except asyncio.CancelledError:
+        logger.info("SSE connection to change event streaming endpoint closed")
+
+    finally:
+        event_bus.unsubscribe(subscription)
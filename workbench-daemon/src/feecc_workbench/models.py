@@ -53,6 +53,10 @@ class UnitOut(GenericResponse):
     unit_internal_id: str | None
 
 
+class UnitsOut(GenericResponse):
+    unit_internal_ids: list[str]
+
+
 class UnitOutPendingEntry(BaseModel):
     unit_internal_id: str
     unit_name: str
@@ -60,6 +64,7 @@ class UnitOutPendingEntry(BaseModel):
 
 class UnitOutPending(GenericResponse):
     units: list[UnitOutPendingEntry]
+    next_cursor: str | None = None
 
 
 class BiographyStage(BaseModel):
@@ -121,3 +126,26 @@ class SchemaListEntry(BaseModel):
 
 class SchemasList(GenericResponse):
     available_schemas: list[SchemaListEntry]
+
+
+class StageStatsEntry(BaseModel):
+    stage_id: str
+    stage_name: str
+    expected_duration_seconds: int | None
+    count: int
+    mean_seconds: float | None
+    min_seconds: float | None
+    max_seconds: float | None
+    p50_seconds: float | None
+    p90_seconds: float | None
+    p99_seconds: float | None
+    overrun: float | None  # median duration over the expected one
+
+
+class StageStatsReport(GenericResponse):
+    schema_id: str
+    stages: list[StageStatsEntry]
+
+
+class DatabaseStats(GenericResponse):
+    stats: dict[str, dict[str, Any]]
@@ -1,4 +1,3 @@
-import datetime as dt
 import pathlib
 from typing import Any
 
@@ -7,14 +6,15 @@ from loguru import logger
 
 from .ProductionStage import ProductionStage
 from .Unit import Unit
+from .utils import format_timestamp
 
 
 def _construct_stage_dict(prod_stage: ProductionStage) -> dict[str, Any]:
     stage: dict[str, Any] = {
         "Наименование": prod_stage.name,
         "Код сотрудника": prod_stage.employee_name,
-        "Начало сборки": prod_stage.session_start_time,
-        "Конец сборки": prod_stage.session_end_time,
+        "Начало сборки": format_timestamp(prod_stage.session_start_time),
+        "Конец сборки": format_timestamp(prod_stage.session_end_time),
     }
 
     if prod_stage.prod_data_hashes is not None:
@@ -26,17 +26,6 @@ def _construct_stage_dict(prod_stage: ProductionStage) -> dict[str, Any]:
     return stage
 
 
-def _get_total_assembly_time(unit: Unit) -> dt.timedelta:
-    """Calculate total assembly time of the unit and all its components recursively"""
-    own_time: dt.timedelta = unit.total_assembly_time
-
-    for component in unit.components_units:
-        component_time = _get_total_assembly_time(component)
-        own_time += component_time
-
-    return own_time
-
-
 def _get_passport_dict(unit: Unit) -> dict[str, Any]:
     """
     form a nested dictionary containing all the unit
@@ -56,8 +45,8 @@ def _get_passport_dict(unit: Unit) -> dict[str, Any]:
         passport_dict["Этапы производства"] = [_construct_stage_dict(stage) for stage in unit.biography]
 
     if unit.components_units:
-        passport_dict["Компоненты изделия"] = [_get_passport_dict(c) for c in unit.components_units]
-        passport_dict["Общая продолжительность сборки (Включая компоненты)"] = str(_get_total_assembly_time(unit))
+        passport_dict["Компоненты изделия"] = [_get_passport_dict(c.load()) for c in unit.components_units]
+        passport_dict["Общая продолжительность сборки (Включая компоненты)"] = str(unit.total_tree_assembly_time)
 
     if unit.serial_number:
         passport_dict["Серийный номер изделия"] = unit.serial_number
@@ -79,6 +68,7 @@ def _save_passport(unit: Unit, passport_dict: dict[str, Any], path: str) -> None
 @logger.catch(reraise=True)
 async def construct_unit_passport(unit: Unit) -> pathlib.Path:
     """construct own passport, dump it as .yaml file and return a path to it"""
+    unit.prefetch_components()
     passport = _get_passport_dict(unit)
     path = f"unit-passports/unit-passport-{unit.uuid}.yaml"
     _save_passport(unit, passport, path)
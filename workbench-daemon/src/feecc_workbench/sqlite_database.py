@@ -0,0 +1,649 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import json
+import sqlite3
+from collections.abc import AsyncGenerator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+from typing import Any, TypeVar
+
+import pydantic
+from loguru import logger
+
+from ._db_utils import _get_unit_from_raw_db_data, _get_unit_tree
+from .Employee import Employee
+from .events import ChangeEventType, StageChangeEvent, UnitChangeEvent, event_bus
+from .exceptions import EmployeeNotFoundError, UnitNotFoundError
+from .models import ProductionSchema
+from .ProductionStage import ProductionStage
+from .stage_stats import StageDurationStats, bucket_index
+from .storage import StorageEngine
+from .Types import Document
+from .Unit import Unit
+from .unit_utils import StageSummary, UnitEvent, UnitStatus, UnitSummary
+from .utils import async_time_execution
+
+SQLITE_DB_PATH: str = getenv("SQLITE_DB_PATH", "feecc-workbench.sqlite3")
+SQLITE_BUSY_TIMEOUT_MS: int = int(getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+UNIT_TREE_MAX_DEPTH: int = int(getenv("UNIT_TREE_MAX_DEPTH", "16"))
+
+_T = TypeVar("_T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    rfid_card_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    position TEXT NOT NULL,
+    passport_code TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS production_schemas (
+    schema_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    internal_id TEXT PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    schema_id TEXT NOT NULL,
+    passport_ipfs_cid TEXT,
+    txn_hash TEXT,
+    serial_number TEXT,
+    components_internal_ids TEXT NOT NULL DEFAULT '[]',
+    featured_in_int_id TEXT,
+    creation_time TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status);
+CREATE TABLE IF NOT EXISTS production_stages (
+    id TEXT PRIMARY KEY,
+    parent_unit_uuid TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    schema_stage_id TEXT NOT NULL,
+    employee_name TEXT,
+    session_start_time TEXT,
+    session_end_time TEXT,
+    ended_prematurely INTEGER NOT NULL DEFAULT 0,
+    prod_data_hashes TEXT,
+    additional_info TEXT,
+    creation_time TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS production_stages_parent_unit_uuid_number ON production_stages (parent_unit_uuid, number);
+CREATE INDEX IF NOT EXISTS production_stages_session_end_time ON production_stages (session_end_time);
+CREATE TABLE IF NOT EXISTS stage_duration_stats (
+    schema_id TEXT NOT NULL,
+    schema_stage_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    zero_count INTEGER NOT NULL,
+    PRIMARY KEY (schema_id, schema_stage_id)
+);
+CREATE TABLE IF NOT EXISTS stage_duration_buckets (
+    schema_id TEXT NOT NULL,
+    schema_stage_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (schema_id, schema_stage_id, bucket)
+);
+"""
+
+# Upgrades of the stored data, applied in order on open. PRAGMA user_version holds the number of the applied ones.
+_MIGRATIONS = [
+    # stage timestamps used to be stored as "%d-%m-%Y %H:%M:%S" strings, which do not sort
+    "\n".join(
+        f"""
+        UPDATE production_stages
+        SET {column} = substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2)
+            || 'T' || substr({column}, 12)
+        WHERE {column} LIKE '__-__-____ __:__:__';
+        """
+        for column in ("session_start_time", "session_end_time")
+    ),
+]
+
+# all the statements are constant, so SQLite compiles each of them once and reuses the prepared statement
+_UPSERT_EMPLOYEE = """
+INSERT INTO employees (rfid_card_id, name, position, passport_code) VALUES (?, ?, ?, ?)
+ON CONFLICT (rfid_card_id) DO UPDATE SET name = excluded.name, position = excluded.position,
+    passport_code = excluded.passport_code
+"""
+_SELECT_EMPLOYEE = "SELECT rfid_card_id, name, position, passport_code FROM employees WHERE rfid_card_id = ?"
+_UPSERT_SCHEMA = """
+INSERT INTO production_schemas (schema_id, data) VALUES (?, ?)
+ON CONFLICT (schema_id) DO UPDATE SET data = excluded.data
+"""
+_SELECT_ALL_SCHEMAS = "SELECT data FROM production_schemas"
+_SELECT_SCHEMAS = "SELECT data FROM production_schemas WHERE schema_id IN (SELECT value FROM json_each(?))"
+_UNIT_COLUMNS = (
+    "internal_id",
+    "uuid",
+    "schema_id",
+    "passport_ipfs_cid",
+    "txn_hash",
+    "serial_number",
+    "components_internal_ids",
+    "featured_in_int_id",
+    "creation_time",
+    "status",
+)
+_UPSERT_UNIT = f"""
+INSERT INTO units ({", ".join(_UNIT_COLUMNS)}) VALUES ({", ".join("?" for _ in _UNIT_COLUMNS)})
+ON CONFLICT (internal_id) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in _UNIT_COLUMNS[1:])},
+    version = units.version + 1
+"""
+_BUMP_UNIT_VERSION = "UPDATE units SET version = version + 1 WHERE uuid = ?"
+_SELECT_UNIT_TREE = f"""
+WITH RECURSIVE tree (internal_id, depth) AS (
+    SELECT ?, 0
+    UNION
+    SELECT component.value, tree.depth + 1
+    FROM tree JOIN units ON units.internal_id = tree.internal_id, json_each(units.components_internal_ids) AS component
+    WHERE tree.depth < ?
+)
+SELECT {", ".join(f"units.{column}" for column in _UNIT_COLUMNS)}, units.version
+FROM units JOIN tree ON units.internal_id = tree.internal_id
+"""
+_STAGE_COLUMNS = (
+    "id",
+    "parent_unit_uuid",
+    "number",
+    "name",
+    "schema_stage_id",
+    "employee_name",
+    "session_start_time",
+    "session_end_time",
+    "ended_prematurely",
+    "prod_data_hashes",
+    "additional_info",
+    "creation_time",
+    "completed",
+)
+_UPSERT_STAGE = f"""
+INSERT INTO production_stages ({", ".join(_STAGE_COLUMNS)}) VALUES ({", ".join("?" for _ in _STAGE_COLUMNS)})
+ON CONFLICT (id) DO UPDATE SET {", ".join(f"{column} = excluded.{column}" for column in _STAGE_COLUMNS[1:])}
+"""
+_SELECT_STAGES = f"""
+SELECT {", ".join(_STAGE_COLUMNS)} FROM production_stages
+WHERE parent_unit_uuid IN (SELECT value FROM json_each(?))
+ORDER BY parent_unit_uuid, number
+"""
+_SELECT_UNIT_SUMMARY = "SELECT uuid, schema_id, status FROM units WHERE internal_id = ?"
+_SELECT_STAGE_SUMMARIES = """
+SELECT name, schema_stage_id, completed FROM production_stages WHERE parent_unit_uuid = ? ORDER BY number
+"""
+_UPSERT_STAGE_DURATION = """
+INSERT INTO stage_duration_stats (schema_id, schema_stage_id, count, sum, min, max, zero_count)
+VALUES (?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (schema_id, schema_stage_id) DO UPDATE SET count = count + 1, sum = sum + excluded.sum,
+    min = min(min, excluded.min), max = max(max, excluded.max), zero_count = zero_count + excluded.zero_count
+"""
+_UPSERT_STAGE_DURATION_BUCKET = """
+INSERT INTO stage_duration_buckets (schema_id, schema_stage_id, bucket, count) VALUES (?, ?, ?, 1)
+ON CONFLICT (schema_id, schema_stage_id, bucket) DO UPDATE SET count = count + 1
+"""
+_SELECT_STAGE_DURATION_STATS = """
+SELECT schema_stage_id, count, sum, min, max, zero_count FROM stage_duration_stats WHERE schema_id = ?
+"""
+_SELECT_STAGE_DURATION_BUCKETS = "SELECT schema_stage_id, bucket, count FROM stage_duration_buckets WHERE schema_id = ?"
+_SELECT_UNITS_BY_STATUS = """
+SELECT rowid, internal_id, schema_id FROM units WHERE status = ? AND rowid > ? ORDER BY rowid LIMIT ?
+"""
+_JSON_UNIT_COLUMNS = frozenset({"components_internal_ids"})
+_JSON_STAGE_COLUMNS = frozenset({"prod_data_hashes", "additional_info"})
+_BOOL_STAGE_COLUMNS = frozenset({"ended_prematurely", "completed"})
+_TIME_STAGE_COLUMNS = frozenset({"session_start_time", "session_end_time"})
+
+
+def _to_sql(value: Any) -> Any:
+    if isinstance(value, dt.datetime):
+        return value.isoformat()
+    if isinstance(value, UnitStatus):
+        return value.value
+    return value
+
+
+def _get_unit_row(unit: Unit) -> tuple[Any, ...]:
+    return (
+        unit.internal_id,
+        unit.uuid,
+        unit.schema.schema_id,
+        unit.passport_ipfs_cid,
+        unit.txn_hash,
+        unit.serial_number,
+        json.dumps(unit.components_internal_ids),
+        unit.featured_in_int_id,
+        unit.creation_time.isoformat(),
+        unit.status.value,
+    )
+
+
+def _get_stage_row(stage: ProductionStage) -> tuple[Any, ...]:
+    return tuple(
+        json.dumps(getattr(stage, column)) if column in _JSON_STAGE_COLUMNS else _to_sql(getattr(stage, column))
+        for column in _STAGE_COLUMNS
+    )
+
+
+def _get_unit_document(row: sqlite3.Row) -> Document:
+    """convert a unit row into the document shape shared with the MongoDB engine"""
+    document = dict(row)
+    document["components_internal_ids"] = json.loads(document["components_internal_ids"])
+    document["creation_time"] = dt.datetime.fromisoformat(document["creation_time"])
+    return document
+
+
+def _get_stage_document(row: sqlite3.Row) -> Document:
+    document = dict(row)
+
+    for column in _JSON_STAGE_COLUMNS:
+        document[column] = json.loads(document[column]) if document[column] is not None else None
+    for column in _BOOL_STAGE_COLUMNS:
+        document[column] = bool(document[column])
+    for column in _TIME_STAGE_COLUMNS:
+        document[column] = dt.datetime.fromisoformat(document[column]) if document[column] is not None else None
+
+    document["creation_time"] = dt.datetime.fromisoformat(document["creation_time"])
+    return document
+
+
+def _migrate(connection: sqlite3.Connection) -> None:
+    """apply the data upgrades the database has not seen yet"""
+    applied: int = connection.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, script in enumerate(_MIGRATIONS[applied:], start=applied + 1):
+        connection.executescript(f"BEGIN IMMEDIATE; {script} PRAGMA user_version = {number}; COMMIT;")
+        logger.info(f"SQLite database upgraded to version {number}")
+
+
+def _publish_changes(units: list[Unit], stages: list[ProductionStage], created: set[str]) -> None:
+    """the store is not shared with other instances, so the changes are published right after they are written"""
+    for stage in stages:
+        event_bus.publish(
+            StageChangeEvent(
+                type=ChangeEventType.stage_updated,
+                unit_uuid=stage.parent_unit_uuid,
+                stage_id=stage.id,
+                schema_stage_id=stage.schema_stage_id,
+                name=stage.name,
+                number=stage.number,
+                completed=stage.completed,
+            )
+        )
+
+    for unit in units:
+        event_bus.publish(
+            UnitChangeEvent(
+                type=ChangeEventType.unit_created if unit.uuid in created else ChangeEventType.unit_updated,
+                unit_uuid=unit.uuid,
+                unit_internal_id=unit.internal_id,
+                schema_id=unit.schema.schema_id,
+                status=unit.status.value,
+            )
+        )
+
+
+class SqliteWrapper(StorageEngine):
+    """
+    Embedded SQLite storage for single workbench deployments.
+
+    The database runs in WAL mode, so reads do not block on the writes. SQLite calls are blocking,
+    so they are executed in a dedicated thread owning the connection. Production schemas are
+    kept in memory as this process is the only writer.
+    """
+
+    def __init__(self) -> None:
+        self._path: str = SQLITE_DB_PATH
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection: sqlite3.Connection | None = None
+        self._schemas: dict[str, ProductionSchema] = {}
+        self._schemas_loaded: bool = False
+        self.statements: int = 0
+        self.transactions: int = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """open the connection on the first use. Must be called from the SQLite thread."""
+        if self._connection is None:
+            connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+            connection.executescript(_SCHEMA)
+            _migrate(connection)
+            self._connection = connection
+            logger.info(f"SQLite database {self._path} opened")
+
+        return self._connection
+
+    async def _run(self, func: Callable[..., _T], *args: Any) -> _T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _fetch_all(self, query: str, *params: Any) -> list[sqlite3.Row]:
+        self.statements += 1
+        return self._get_connection().execute(query, params).fetchall()
+
+    def _write(self, statements: list[tuple[str, list[tuple[Any, ...]]]]) -> None:
+        """execute the statements with their batches of parameters in a single transaction"""
+        connection = self._get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+
+        try:
+            for query, rows in statements:
+                if rows:
+                    connection.executemany(query, rows)
+                    self.statements += 1
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+        self.transactions += 1
+
+    async def connect(self) -> None:
+        await self._run(self._get_connection)
+        await self._load_schemas()
+
+    async def flush_pending_writes(self) -> None:
+        """every write is committed synchronously, nothing to flush"""
+
+    def close_connection(self) -> None:
+        def close() -> None:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        self._executor.submit(close).result()
+        logger.info("SQLite database closed")
+
+    @property
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            "sqlite": {
+                "path": self._path,
+                "statements": self.statements,
+                "transactions": self.transactions,
+                "schemas_cached": len(self._schemas),
+            },
+            "event_bus": event_bus.stats,
+        }
+
+    @async_time_execution
+    async def push_unit(
+        self, unit: Unit, include_components: bool = True, event: UnitEvent = UnitEvent.unit_updated
+    ) -> None:
+        """Upload or update data about the unit (and its component tree) in a single local transaction"""
+        units = _get_unit_tree(unit) if include_components else [unit]
+        unit_rows: list[tuple[Any, ...]] = []
+        version_bumps: list[tuple[Any, ...]] = []
+        stage_rows: list[tuple[Any, ...]] = []
+        snapshots: list[tuple[Unit | ProductionStage, dict[str, int]]] = []
+        changed_units: list[Unit] = []
+        changed_stages: list[ProductionStage] = []
+        created = {unit_.uuid for unit_ in units if not unit_.is_in_db}
+
+        for unit_ in units:
+            stages = [stage for stage in unit_.biography if not stage.is_in_db or stage.dirty_fields]
+
+            for stage in stages:
+                stage_rows.append(_get_stage_row(stage))
+                snapshots.append((stage, stage.dirty_fields))
+
+            if not unit_.is_in_db or unit_.dirty_fields:
+                unit_rows.append(_get_unit_row(unit_))
+                snapshots.append((unit_, unit_.dirty_fields))
+            elif stages:
+                version_bumps.append((unit_.uuid,))
+
+            if stages or not unit_.is_in_db or unit_.dirty_fields:
+                changed_units.append(unit_)
+                changed_stages.extend(stages)
+
+        await self._run(
+            self._write, [(_UPSERT_STAGE, stage_rows), (_UPSERT_UNIT, unit_rows), (_BUMP_UNIT_VERSION, version_bumps)]
+        )
+
+        for item, dirty_fields in snapshots:
+            item.is_in_db = True
+            item.mark_clean(dirty_fields)
+
+        _publish_changes(changed_units, changed_stages, created)
+
+    @async_time_execution
+    async def insert_units(self, units: list[Unit]) -> None:
+        """Insert new units along with their production stages in a single transaction"""
+        stage_rows = [_get_stage_row(stage) for unit in units for stage in unit.biography]
+        unit_rows = [_get_unit_row(unit) for unit in units]
+        await self._run(self._write, [(_UPSERT_STAGE, stage_rows), (_UPSERT_UNIT, unit_rows)])
+
+        for unit in units:
+            for item in [unit, *unit.biography]:
+                item.is_in_db = True
+                item.mark_clean()
+
+        _publish_changes(units, [stage for unit in units for stage in unit.biography], {unit.uuid for unit in units})
+
+    @async_time_execution
+    async def unit_update_single_field(self, unit_internal_id: str, field_name: str, field_val: Any) -> None:
+        if field_name not in _UNIT_COLUMNS:
+            raise ValueError(f"Unknown unit field {field_name}")
+
+        value = json.dumps(field_val) if field_name in _JSON_UNIT_COLUMNS else _to_sql(field_val)
+        query = f"UPDATE units SET {field_name} = ?, version = version + 1 WHERE internal_id = ?"
+        await self._run(self._write, [(query, [(value, unit_internal_id)])])
+        logger.debug(f"Unit {unit_internal_id} field '{field_name}' has been set to '{field_val}'")
+        event_bus.publish(
+            UnitChangeEvent(type=ChangeEventType.unit_updated, unit_uuid=None, unit_internal_id=unit_internal_id)
+        )
+
+    def _get_unit_tree_documents(self, unit_internal_id: str) -> tuple[list[Document], list[Document]]:
+        # one level past the limit, so that a tree nested too deep fails the depth check, not the component lookup
+        unit_rows = self._fetch_all(_SELECT_UNIT_TREE, unit_internal_id, UNIT_TREE_MAX_DEPTH + 1)
+
+        if not unit_rows:
+            return [], []
+
+        uuids = json.dumps([row["uuid"] for row in unit_rows])
+        stage_rows = self._fetch_all(_SELECT_STAGES, uuids)
+        return [_get_unit_document(row) for row in unit_rows], [_get_stage_document(row) for row in stage_rows]
+
+    @async_time_execution
+    async def get_unit_by_internal_id(self, unit_internal_id: str) -> Unit:
+        """Load the unit and its whole component tree with one recursive query for the units and one for the stages"""
+        unit_documents, stage_documents = await self._run(self._get_unit_tree_documents, unit_internal_id)
+
+        if not unit_documents:
+            message = f"Изделие с номером {unit_internal_id} не найдено!"
+            logger.warning(message)
+            raise UnitNotFoundError(message)
+
+        unit_docs: dict[str, Document] = {doc["internal_id"]: doc for doc in unit_documents}
+        stage_docs: dict[str, list[Document]] = {}
+
+        for stage_doc in stage_documents:
+            stage_docs.setdefault(stage_doc["parent_unit_uuid"], []).append(stage_doc)
+
+        schemas = await self.get_schemas_by_ids({doc["schema_id"] for doc in unit_docs.values()})
+        return _get_unit_from_raw_db_data(
+            unit_docs[unit_internal_id], unit_docs, stage_docs, schemas, UNIT_TREE_MAX_DEPTH
+        )
+
+    def _get_unit_summary_rows(self, unit_internal_id: str) -> tuple[sqlite3.Row | None, list[sqlite3.Row]]:
+        unit_rows = self._fetch_all(_SELECT_UNIT_SUMMARY, unit_internal_id)
+
+        if not unit_rows:
+            return None, []
+
+        return unit_rows[0], self._fetch_all(_SELECT_STAGE_SUMMARIES, unit_rows[0]["uuid"])
+
+    @async_time_execution
+    async def get_unit_summary(self, unit_internal_id: str) -> UnitSummary:
+        """Load the unit status and the names and completion of its stages"""
+        unit_row, stage_rows = await self._run(self._get_unit_summary_rows, unit_internal_id)
+
+        if unit_row is None:
+            message = f"Изделие с номером {unit_internal_id} не найдено!"
+            logger.warning(message)
+            raise UnitNotFoundError(message)
+
+        schema = await self.get_schema_by_id(unit_row["schema_id"])
+
+        return UnitSummary(
+            internal_id=unit_internal_id,
+            schema_id=unit_row["schema_id"],
+            status=UnitStatus(unit_row["status"]),
+            biography=[StageSummary(row["name"], row["schema_stage_id"], bool(row["completed"])) for row in stage_rows],
+            components_schema_ids=schema.required_components_schema_ids or [],
+        )
+
+    async def _get_unit_ids_and_names(self, rows: list[sqlite3.Row]) -> list[dict[str, str]]:
+        """resolve unit names from the cached schemas. Units of unknown schemas are skipped."""
+        schemas = await self._get_schemas({row["schema_id"] for row in rows})
+        return [
+            {"internal_id": row["internal_id"], "unit_name": schemas[row["schema_id"]].unit_name}
+            for row in rows
+            if row["schema_id"] in schemas
+        ]
+
+    @async_time_execution
+    async def get_unit_ids_and_names_by_status(
+        self, status: UnitStatus, after: str | None = None, limit: int | None = None
+    ) -> tuple[list[dict[str, str]], str | None]:
+        """Get a page of IDs and names of the units with the provided status, keyset-paginated on the rowid"""
+        if after is not None and not after.isdigit():
+            raise ValueError(f"Invalid pagination cursor: {after}")
+
+        rows = await self._run(
+            self._fetch_all, _SELECT_UNITS_BY_STATUS, status.value, int(after or 0), limit if limit is not None else -1
+        )
+        next_cursor = str(rows[-1]["rowid"]) if limit is not None and len(rows) == limit else None
+
+        return await self._get_unit_ids_and_names(rows), next_cursor
+
+    async def iter_unit_ids_and_names_by_status(
+        self, status: UnitStatus, batch_size: int = 100
+    ) -> AsyncGenerator[dict[str, str], None]:
+        """Yield IDs and names of the units with the provided status page by page"""
+        last_rowid = 0
+
+        while rows := await self._run(self._fetch_all, _SELECT_UNITS_BY_STATUS, status.value, last_rowid, batch_size):
+            for unit_entry in await self._get_unit_ids_and_names(rows):
+                yield unit_entry
+            last_rowid = rows[-1]["rowid"]
+
+    @async_time_execution
+    async def record_stage_durations(self, schema_id: str, durations: list[tuple[str, float]]) -> None:
+        """Count the durations into the stage statistics rows in place"""
+        stats_rows: list[tuple[Any, ...]] = []
+        bucket_rows: list[tuple[Any, ...]] = []
+
+        for schema_stage_id, seconds in durations:
+            index = bucket_index(seconds)
+            stats_rows.append((schema_id, schema_stage_id, seconds, seconds, seconds, int(index is None)))
+
+            if index is not None:
+                bucket_rows.append((schema_id, schema_stage_id, index))
+
+        await self._run(
+            self._write, [(_UPSERT_STAGE_DURATION, stats_rows), (_UPSERT_STAGE_DURATION_BUCKET, bucket_rows)]
+        )
+
+    def _get_stage_duration_stats(self, schema_id: str) -> list[StageDurationStats]:
+        stats = {
+            row["schema_stage_id"]: StageDurationStats(
+                schema_stage_id=row["schema_stage_id"],
+                count=row["count"],
+                total_seconds=row["sum"],
+                min_seconds=row["min"],
+                max_seconds=row["max"],
+                zero_count=row["zero_count"],
+            )
+            for row in self._fetch_all(_SELECT_STAGE_DURATION_STATS, schema_id)
+        }
+
+        for row in self._fetch_all(_SELECT_STAGE_DURATION_BUCKETS, schema_id):
+            stats[row["schema_stage_id"]].buckets[row["bucket"]] = row["count"]
+
+        return list(stats.values())
+
+    @async_time_execution
+    async def get_stage_duration_stats(self, schema_id: str) -> list[StageDurationStats]:
+        """Read the statistics of the schema stages"""
+        return await self._run(self._get_stage_duration_stats, schema_id)
+
+    @async_time_execution
+    async def get_employee_by_card_id(self, card_id: str) -> Employee:
+        """find the employee with the provided RFID card id"""
+        rows = await self._run(self._fetch_all, _SELECT_EMPLOYEE, card_id)
+
+        if not rows:
+            message = f"Сотрудник с картой {card_id} не найден!"
+            logger.error(message)
+            raise EmployeeNotFoundError(message)
+
+        return Employee(**dict(rows[0]))
+
+    @async_time_execution
+    async def upsert_employees(self, employees: list[Employee]) -> None:
+        rows = [(e.rfid_card_id, e.name, e.position, e.passport_code) for e in employees]
+        await self._run(self._write, [(_UPSERT_EMPLOYEE, rows)])
+
+    async def _load_schemas(self) -> None:
+        rows = await self._run(self._fetch_all, _SELECT_ALL_SCHEMAS)
+        schemas = (pydantic.parse_raw_as(ProductionSchema, row["data"]) for row in rows)
+        self._schemas = {schema.schema_id: schema for schema in schemas}
+        self._schemas_loaded = True
+
+    async def _get_schemas(self, schema_ids: set[str]) -> dict[str, ProductionSchema]:
+        """get the cached schemas, fetching the ones missing from the cache in one query"""
+        if not self._schemas_loaded:
+            await self._load_schemas()
+
+        schemas = {schema_id: self._schemas[schema_id] for schema_id in schema_ids if schema_id in self._schemas}
+
+        if missing := schema_ids - schemas.keys():
+            for row in await self._run(self._fetch_all, _SELECT_SCHEMAS, json.dumps(list(missing))):
+                schema = pydantic.parse_raw_as(ProductionSchema, row["data"])
+                self._schemas[schema.schema_id] = schemas[schema.schema_id] = schema
+
+        return schemas
+
+    @async_time_execution
+    async def get_all_schemas(self) -> list[ProductionSchema]:
+        """get all production schemas"""
+        if not self._schemas_loaded:
+            await self._load_schemas()
+
+        return list(self._schemas.values())
+
+    @async_time_execution
+    async def get_schemas_by_ids(self, schema_ids: set[str]) -> dict[str, ProductionSchema]:
+        """get the specified production schemas"""
+        schemas = await self._get_schemas(schema_ids)
+
+        if missing := schema_ids - schemas.keys():
+            raise ValueError(f"Schemas {', '.join(sorted(missing))} not found")
+
+        return schemas
+
+    @async_time_execution
+    async def get_schema_by_id(self, schema_id: str) -> ProductionSchema:
+        """get the specified production schema"""
+        schemas = await self._get_schemas({schema_id})
+
+        if schema_id not in schemas:
+            raise ValueError(f"Schema {schema_id} not found")
+
+        return schemas[schema_id]
+
+    @async_time_execution
+    async def upsert_schemas(self, schemas: list[ProductionSchema]) -> None:
+        """create or replace the production schemas"""
+        rows = [(schema.schema_id, schema.json()) for schema in schemas]
+        await self._run(self._write, [(_UPSERT_SCHEMA, rows)])
+        self._schemas.update({schema.schema_id: schema for schema in schemas})
@@ -0,0 +1,103 @@
+"""
+Production stage duration statistics.
+
+Durations are summarized per (schema_id, schema_stage_id) with a count, a sum, the extremes and
+a log-bucketed quantile sketch (DDSketch). A duration of x seconds is counted in the bucket
+ceil(log(x) / log(gamma)), gamma = (1 + a) / (1 - a), so every quantile estimate is within the
+relative accuracy `a` of the true value. All of it is made of counters, which the storage engines
+update in place as stages end, so the statistics never have to be recomputed from the history.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from .ProductionStage import ProductionStage
+
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket_index(seconds: float) -> int | None:
+    """the sketch bucket of the duration. Zero durations are counted apart (None)."""
+    return math.ceil(math.log(seconds) / _LOG_GAMMA) if seconds > 0 else None
+
+
+def _bucket_value(index: int) -> float:
+    return 2 * _GAMMA**index / (_GAMMA + 1)
+
+
+def quantile(buckets: Mapping[int, int], zero_count: int, q: float) -> float | None:
+    """estimate the q-quantile of the sketched durations"""
+    total = zero_count + sum(buckets.values())
+
+    if not total:
+        return None
+
+    rank = q * (total - 1)
+    seen = zero_count
+
+    if rank < seen:
+        return 0.0
+
+    for index in sorted(buckets):
+        seen += buckets[index]
+
+        if rank < seen:
+            return _bucket_value(index)
+
+    return _bucket_value(max(buckets))
+
+
+def get_session_duration(session_start_time: dt.datetime | None, session_end_time: dt.datetime | None) -> float | None:
+    """duration of a stage session in seconds if it has both ends"""
+    if session_start_time is None or session_end_time is None:
+        return None
+
+    return max((session_end_time - session_start_time).total_seconds(), 0.0)
+
+
+def get_stage_duration(stage: ProductionStage) -> float | None:
+    """duration of a completed stage in seconds. None for the pending and the prematurely ended ones."""
+    if not stage.completed or stage.ended_prematurely:
+        return None
+
+    return get_session_duration(stage.session_start_time, stage.session_end_time)
+
+
+@dataclass(slots=True)
+class StageDurationStats:
+    schema_stage_id: str
+    count: int = 0
+    total_seconds: float = 0.0
+    min_seconds: float | None = None
+    max_seconds: float | None = None
+    zero_count: int = 0
+    buckets: dict[int, int] = field(default_factory=dict)
+
+    def add(self, seconds: float) -> None:
+        """count the duration in"""
+        self.count += 1
+        self.total_seconds += seconds
+        self.min_seconds = seconds if self.min_seconds is None else min(self.min_seconds, seconds)
+        self.max_seconds = seconds if self.max_seconds is None else max(self.max_seconds, seconds)
+
+        if (index := bucket_index(seconds)) is None:
+            self.zero_count += 1
+        else:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    @property
+    def mean_seconds(self) -> float | None:
+        return self.total_seconds / self.count if self.count else None
+
+    def quantile(self, q: float) -> float | None:
+        value = quantile(self.buckets, self.zero_count, q)
+
+        if value is None or self.min_seconds is None or self.max_seconds is None:
+            return value
+
+        return min(max(value, self.min_seconds), self.max_seconds)
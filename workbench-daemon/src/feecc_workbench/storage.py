@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import enum
+from abc import ABCMeta, abstractmethod
+from collections.abc import AsyncGenerator
+from os import getenv
+from typing import Any
+
+from .Employee import Employee
+from .models import ProductionSchema
+from .Singleton import SingletonMeta
+from .stage_stats import StageDurationStats
+from .Unit import Unit
+from .unit_utils import UnitEvent, UnitStatus, UnitSummary
+
+
+class StorageEngineType(enum.Enum):
+    """supported storage engines"""
+
+    mongodb = "mongodb"
+    sqlite = "sqlite"
+
+
+STORAGE_ENGINE: StorageEngineType = StorageEngineType(getenv("STORAGE_ENGINE", "mongodb"))
+
+
+class _StorageEngineMeta(ABCMeta, SingletonMeta):
+    pass
+
+
+class StorageEngine(metaclass=_StorageEngineMeta):
+    """Persistent storage operations the daemon relies on. Every engine is a singleton."""
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Open the storage and prepare it for work. Awaited on startup."""
+
+    @abstractmethod
+    async def flush_pending_writes(self) -> None:
+        """Write all the deferred changes. Must be awaited before closing the connection."""
+
+    @abstractmethod
+    def close_connection(self) -> None:
+        ...
+
+    @property
+    @abstractmethod
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """engine specific statistics"""
+
+    @property
+    def is_journaled(self) -> bool:
+        """whether push_unit journals the events, making it worth to persist every mutation as it happens"""
+        return False
+
+    @abstractmethod
+    async def push_unit(
+        self, unit: Unit, include_components: bool = True, event: UnitEvent = UnitEvent.unit_updated
+    ) -> None:
+        """
+        Upload or update data about the unit (and its component tree) along with its production stages.
+        The event describes the mutation being persisted for the engines which journal them.
+        """
+
+    @abstractmethod
+    async def insert_units(self, units: list[Unit]) -> None:
+        """Insert new units along with their production stages in bulk. Components are not inserted."""
+
+    @abstractmethod
+    async def unit_update_single_field(self, unit_internal_id: str, field_name: str, field_val: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def get_unit_by_internal_id(self, unit_internal_id: str) -> Unit:
+        """Load the unit and its whole component tree. Raises UnitNotFoundError."""
+
+    @abstractmethod
+    async def get_unit_summary(self, unit_internal_id: str) -> UnitSummary:
+        """Load the status and the stages of the unit only. Raises UnitNotFoundError."""
+
+    @abstractmethod
+    async def get_unit_ids_and_names_by_status(
+        self, status: UnitStatus, after: str | None = None, limit: int | None = None
+    ) -> tuple[list[dict[str, str]], str | None]:
+        """Get a page of IDs and names of the units with the provided status and a cursor to the next page"""
+
+    @abstractmethod
+    def iter_unit_ids_and_names_by_status(self, status: UnitStatus) -> AsyncGenerator[dict[str, str], None]:
+        """Yield IDs and names of all the units with the provided status"""
+
+    @abstractmethod
+    async def record_stage_durations(self, schema_id: str, durations: list[tuple[str, float]]) -> None:
+        """count the (schema stage ID, seconds) durations of the ended stages into the statistics"""
+
+    @abstractmethod
+    async def get_stage_duration_stats(self, schema_id: str) -> list[StageDurationStats]:
+        """duration statistics of the schema stages which have ended at least once"""
+
+    @abstractmethod
+    async def get_employee_by_card_id(self, card_id: str) -> Employee:
+        """find the employee with the provided RFID card id. Raises EmployeeNotFoundError."""
+
+    @abstractmethod
+    async def upsert_employees(self, employees: list[Employee]) -> None:
+        """create or replace the employees"""
+
+    @abstractmethod
+    async def get_all_schemas(self) -> list[ProductionSchema]:
+        ...
+
+    @abstractmethod
+    async def get_schemas_by_ids(self, schema_ids: set[str]) -> dict[str, ProductionSchema]:
+        """get the specified production schemas. Raises ValueError if any of them is missing."""
+
+    @abstractmethod
+    async def get_schema_by_id(self, schema_id: str) -> ProductionSchema:
+        """get the specified production schema. Raises ValueError if it is missing."""
+
+    @abstractmethod
+    async def upsert_schemas(self, schemas: list[ProductionSchema]) -> None:
+        """create or replace the production schemas"""
+
+
+def get_storage() -> StorageEngine:
+    """get the storage engine selected by the STORAGE_ENGINE setting"""
+    if STORAGE_ENGINE is StorageEngineType.sqlite:
+        from .sqlite_database import SqliteWrapper
+
+        return SqliteWrapper()
+
+    from .database import MongoDbWrapper
+
+    engine: StorageEngine = MongoDbWrapper()
+    return engine
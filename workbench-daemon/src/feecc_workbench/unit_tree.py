@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections.abc import Iterator, Sequence
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from .models import ProductionSchema
+    from .Unit import Unit
+    from .unit_utils import UnitStatus
+
+
+class UnitNode(Protocol):
+    """A unit of a tree: either a Unit or a UnitProxy standing in for a component which is not loaded yet"""
+
+    parent: UnitNode | None  # the unit it is a component of
+
+    @property
+    def internal_id(self) -> str:
+        ...
+
+    @property
+    def schema(self) -> ProductionSchema:
+        ...
+
+    @property
+    def status(self) -> UnitStatus:
+        ...
+
+    @property
+    def featured_in_int_id(self) -> str | None:
+        ...
+
+    @property
+    def components_units(self) -> Sequence[UnitNode]:
+        ...
+
+    @property
+    def loaded_unit(self) -> Unit | None:
+        """the unit if it is loaded, None otherwise"""
+
+    def load(self) -> Unit:
+        """the unit, loading it if needed"""
+
+
+def _flatten(root: UnitNode) -> tuple[list[UnitNode], list[int], list[int]]:
+    """pre-order array of the tree units, the position of the parent and the end of the subtree of every unit"""
+    units: list[UnitNode] = []
+    parents: list[int] = []
+    pending: list[tuple[UnitNode, int]] = [(root, -1)]
+
+    while pending:
+        unit, parent = pending.pop()
+        position = len(units)
+        units.append(unit)
+        parents.append(parent)
+        pending.extend((component, position) for component in reversed(unit.components_units))
+
+    ends = [position + 1 for position in range(len(units))]
+
+    for position in range(len(units) - 1, 0, -1):
+        parent = parents[position]
+        ends[parent] = max(ends[parent], ends[position])
+
+    return units, parents, ends
+
+
+class UnitTree:
+    """
+    Index of a unit and its component tree.
+
+    The units are kept in a flat pre-order array along with the position of their parent and the end
+    of their subtree, so the tree can be walked and searched without recursion. The positions are also
+    grouped by unit status, which turns finding the first unit of the tree with the given status into
+    a lookup. Units report their status changes and component assignments to the indexes of all the trees
+    they are a part of, see `Unit.tree`. Building or querying the index does not load the components.
+    """
+
+    __slots__ = ("_units", "_parents", "_ends", "_positions", "_by_status")
+
+    def __init__(self, root: UnitNode) -> None:
+        self._units, self._parents, self._ends = _flatten(root)
+        self._positions: dict[str, int] = {}
+        self._by_status: dict[UnitStatus, list[int]] = {}
+
+        for position, unit in enumerate(self._units):
+            self._positions[unit.internal_id] = position
+            self._by_status.setdefault(unit.status, []).append(position)
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def __iter__(self) -> Iterator[UnitNode]:
+        """the units of the tree in pre-order: every unit comes before its components"""
+        return iter(self._units)
+
+    def __contains__(self, unit: UnitNode) -> bool:
+        return unit.internal_id in self._positions
+
+    @property
+    def root(self) -> UnitNode:
+        return self._units[0]
+
+    def parent(self, unit: UnitNode) -> UnitNode | None:
+        parent = self._parents[self._positions[unit.internal_id]]
+        return self._units[parent] if parent >= 0 else None
+
+    def subtree(self, unit: UnitNode) -> Iterator[UnitNode]:
+        """the unit and all its nested components in pre-order"""
+        position = self._positions[unit.internal_id]
+        return iter(self._units[position : self._ends[position]])
+
+    def post_order(self) -> Iterator[UnitNode]:
+        """the units of the tree, every unit after all its nested components"""
+        return reversed(self._units)
+
+    def first_with_status(self, *statuses: UnitStatus) -> UnitNode | None:
+        """the first unit of the tree in pre-order having one of the statuses"""
+        candidates = [positions[0] for status in statuses if (positions := self._by_status.get(status))]
+        return self._units[min(candidates)] if candidates else None
+
+    def update_status(self, unit: UnitNode, previous: UnitStatus) -> None:
+        position = self._positions[unit.internal_id]
+        positions = self._by_status[previous]
+        del positions[bisect_left(positions, position)]
+        insort(self._by_status.setdefault(unit.status, []), position)
+
+    def add_component(self, parent: UnitNode, component: UnitNode) -> None:
+        """insert the subtree of a component assigned to the parent unit after the existing components"""
+        parent_position = self._positions[parent.internal_id]
+        start = self._ends[parent_position]
+        units, parents, ends = _flatten(component)
+        count = len(units)
+
+        # the subtrees of the parent and all its ancestors grow, the units after them move
+        ancestor = parent_position
+        while ancestor >= 0:
+            self._ends[ancestor] += count
+            ancestor = self._parents[ancestor]
+
+        for position in range(start, len(self._units)):
+            self._ends[position] += count
+            if self._parents[position] >= start:
+                self._parents[position] += count
+
+        self._units[start:start] = units
+        self._parents[start:start] = [parent_position, *(start + parent for parent in parents[1:])]
+        self._ends[start:start] = [start + end for end in ends]
+
+        for status, positions in self._by_status.items():
+            self._by_status[status] = [position + count if position >= start else position for position in positions]
+
+        for position in range(start, len(self._units)):
+            self._positions[self._units[position].internal_id] = position
+
+        for position in range(start, start + count):
+            insort(self._by_status.setdefault(self._units[position].status, []), position)
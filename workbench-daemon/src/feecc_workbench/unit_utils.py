@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import datetime as dt
 import enum
-from typing import TYPE_CHECKING
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
 
 from .models import ProductionSchema
 from .ProductionStage import ProductionStage
@@ -10,6 +13,11 @@ if TYPE_CHECKING:
     from .Unit import Unit
 
 
+# Gap between the numbers of consecutive stages of a new biography. Stages inserted later (e.g. the remainder
+# of a prematurely ended one) take a free number inside the gap, so the following stages keep their numbers.
+STAGE_NUMBER_STEP = 1024
+
+
 def biography_factory(production_schema: ProductionSchema, parent_unit_uuid: str) -> list[ProductionStage]:
     biography = []
 
@@ -18,7 +26,7 @@ def biography_factory(production_schema: ProductionSchema, parent_unit_uuid: str
             operation = ProductionStage(
                 name=stage.name,
                 parent_unit_uuid=parent_unit_uuid,
-                number=i,
+                number=i * STAGE_NUMBER_STEP,
                 schema_stage_id=stage.stage_id,
             )
             biography.append(operation)
@@ -26,6 +34,47 @@ def biography_factory(production_schema: ProductionSchema, parent_unit_uuid: str
     return biography
 
 
+# stage attributes which are not set by the template or default to a mutable value
+_STAGE_DYNAMIC_FIELDS = frozenset({"name", "parent_unit_uuid", "number", "schema_stage_id", "id", "creation_time"})
+_STAGE_DEFAULTS: dict[str, Any] = {
+    field.name: field.default for field in fields(ProductionStage) if field.name not in _STAGE_DYNAMIC_FIELDS
+}
+
+
+class BiographyTemplate:
+    """
+    Production stages of a schema precompiled into attribute dicts.
+
+    Used to build the biographies of many units of the same schema: the stages are stamped out of
+    the template without running the dataclass constructor and its per attribute dirty tracking.
+    Like the constructed ones, the stamped out stages have all their tracked attributes dirty.
+    """
+
+    def __init__(self, production_schema: ProductionSchema) -> None:
+        self._stages: list[dict[str, Any]] = [
+            {**_STAGE_DEFAULTS, "name": stage.name, "number": i * STAGE_NUMBER_STEP, "schema_stage_id": stage.stage_id}
+            for i, stage in enumerate(production_schema.production_stages or [])
+        ]
+
+    def build(self, parent_unit_uuid: str, creation_time: dt.datetime | None = None) -> list[ProductionStage]:
+        creation_time = creation_time or dt.datetime.now()
+        biography = []
+
+        for attributes in self._stages:
+            stage = object.__new__(ProductionStage)
+
+            for name, value in attributes.items():
+                object.__setattr__(stage, name, value)
+
+            object.__setattr__(stage, "parent_unit_uuid", parent_unit_uuid)
+            object.__setattr__(stage, "id", uuid4().hex)
+            object.__setattr__(stage, "creation_time", creation_time)
+            stage.mark_dirty(*ProductionStage._tracked_fields)
+            biography.append(stage)
+
+        return biography
+
+
 class UnitStatus(enum.Enum):
     """supported Unit status descriptors"""
 
@@ -36,18 +85,47 @@ class UnitStatus(enum.Enum):
     finalized = "finalized"
 
 
-def _get_unit_list(unit_: Unit) -> list[Unit]:
-    """list all the units in the component tree"""
-    units_tree = [unit_]
-    for component_ in unit_.components_units:
-        nested = _get_unit_list(component_)
-        units_tree.extend(nested)
-    return units_tree
+class UnitEvent(enum.Enum):
+    """unit mutations recorded on push"""
+
+    unit_created = "unit_created"
+    unit_updated = "unit_updated"
+    stage_started = "stage_started"
+    stage_ended = "stage_ended"
+    component_assigned = "component_assigned"
+    passport_cid_set = "passport_cid_set"
+
+
+@dataclass(frozen=True, slots=True)
+class StageSummary:
+    name: str
+    schema_stage_id: str
+    completed: bool
+
+
+@dataclass(frozen=True, slots=True)
+class UnitSummary:
+    """What read-only endpoints show about a unit. Loaded without reconstructing the Unit and its components."""
+
+    internal_id: str
+    schema_id: str
+    status: UnitStatus
+    biography: list[StageSummary]
+    components_schema_ids: list[str]
+
+    @classmethod
+    def from_unit(cls, unit: Unit) -> UnitSummary:
+        return cls(
+            internal_id=unit.internal_id,
+            schema_id=unit.schema.schema_id,
+            status=unit.status,
+            biography=[StageSummary(stage.name, stage.schema_stage_id, stage.completed) for stage in unit.biography],
+            components_schema_ids=unit.components_schema_ids,
+        )
 
 
 def get_first_unit_matching_status(unit: Unit, *target_statuses: UnitStatus) -> Unit:
     """get first unit matching having target status in unit tree"""
-    for component in _get_unit_list(unit):
-        if component.status in target_statuses:
-            return component
+    if (component := unit.tree.first_with_status(*target_statuses)) is not None:
+        return component.load()
     raise AssertionError("Unit features no components that are in allowed states")
@@ -48,9 +48,20 @@ def is_a_ean13_barcode(string: str) -> bool:
     return bool(re.fullmatch(r"\d{13}", string))
 
 
-def timestamp() -> str:
-    """generate formatted timestamp for the invocation moment"""
-    return dt.datetime.now().strftime(TIMESTAMP_FORMAT)
+def timestamp() -> dt.datetime:
+    """the invocation moment, truncated to milliseconds as the DB stores it"""
+    moment = dt.datetime.now()
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+def format_timestamp(moment: dt.datetime | None) -> str | None:
+    """human readable timestamp for the passports"""
+    return moment.strftime(TIMESTAMP_FORMAT) if moment is not None else None
+
+
+def parse_timestamp(value: dt.datetime | str | None) -> dt.datetime | None:
+    """read a stage timestamp, including the ones stored as formatted strings by the earlier versions"""
+    return dt.datetime.strptime(value, TIMESTAMP_FORMAT) if isinstance(value, str) else value
 
 
 def service_is_up(service_endpoint: str | URL) -> bool:  # noqa: CAC001
@@ -0,0 +1,62 @@
+"""
+Online storage layout migration and data backfills.
+
+Usage:
+    MONGODB_URI=... MONGODB_DB_NAME=... python migrate.py embed|split|timestamps|stage-stats|archive [--batch-size N]
+
+To switch to the embedded layout run `embed` while the daemons are still running with the split layout,
+restart them with MONGODB_STORAGE_LAYOUT=embedded and run `embed` once again to pick up the units
+written in the meantime. `split` reverses the migration.
+
+`timestamps` converts the stage timestamps stored as strings by the earlier versions into datetimes.
+It only picks the documents which still hold strings, so it can be interrupted and run again.
+
+`stage-stats` rebuilds the stage duration statistics from the production history, the archived units
+included. The daemons keep them up to date afterwards.
+
+`archive` moves the finalized units older than UNIT_ARCHIVE_AFTER_DAYS into the archive collections.
+Schedule it, or let the daemons do it every UNIT_ARCHIVE_INTERVAL seconds instead.
+"""
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import Any
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from feecc_workbench._archive import archive_finalized_units
+from feecc_workbench._db_utils import _check_database_connection, _get_database_client
+from feecc_workbench._migrations import (
+    backfill_stage_stats,
+    convert_stage_timestamps,
+    embed_biographies,
+    split_biographies,
+)
+from feecc_workbench.database import MONGODB_DB_NAME, MONGODB_URI, UNIT_ARCHIVE_AFTER_DAYS
+
+MIGRATIONS: dict[str, Callable[[AsyncIOMotorDatabase, int], Awaitable[Any]]] = {
+    "embed": embed_biographies,
+    "split": split_biographies,
+    "timestamps": convert_stage_timestamps,
+    "stage-stats": backfill_stage_stats,
+    "archive": partial(archive_finalized_units, min_age_days=UNIT_ARCHIVE_AFTER_DAYS),
+}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Migrate unit documents between the storage layouts, backfill statistics or archive units"
+    )
+    parser.add_argument("direction", choices=MIGRATIONS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    client = _get_database_client(MONGODB_URI)
+    await _check_database_connection(client, MONGODB_URI)
+    await MIGRATIONS[args.direction](client[MONGODB_DB_NAME], args.batch_size)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
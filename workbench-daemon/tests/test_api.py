@@ -136,6 +136,16 @@ def test_get_composite_unit_data_valid() -> None:
     ], f"Components not found for {composite_unit_internal_id}"
 
 
+def test_create_new_units_bulk() -> None:
+    response = CLIENT.post(f"/unit/new/{VALID_SIMPLE_SCHEMA_ID}/bulk", params={"count": 3})
+    check_status(response, 200)
+    unit_internal_ids = response.json().get("unit_internal_ids")
+    assert len(set(unit_internal_ids)) == 3, "Expected 3 distinct units"
+    response = CLIENT.get(f"/unit/{unit_internal_ids[-1]}/info")
+    check_status(response, 200)
+    assert response.json().get("unit_biography_pending"), "Biography was not created"
+
+
 def test_get_workbench_status() -> None:
     response = CLIENT.get("/workbench/status")
     assert response.status_code == 200, "Status request failed"
@@ -288,6 +298,14 @@ def test_get_schemas_list() -> None:
     assert response.json().get("available_schemas", None), "No schema names were returned"
 
 
+def test_get_stage_stats() -> None:
+    response = CLIENT.get(f"/workbench/production-schemas/{VALID_SIMPLE_SCHEMA_ID}/stage-stats")
+    check_status(response, 200)
+    stages = response.json()["stages"]
+    assert stages, "No stages were returned"
+    assert sum(stage["count"] for stage in stages), "Ended stages were not counted"
+
+
 def test_get_schema_by_id_invalid() -> None:
     response = CLIENT.get("/workbench/production-schemas/42")
     check_status(response, 404)
@@ -298,6 +316,25 @@ def test_get_schema_by_id_valid() -> None:
     check_status(response, 200)
 
 
+def test_get_revision_pending_units_invalid_cursor() -> None:
+    response = CLIENT.get("/unit/pending_revision?cursor=invalid")
+    check_status(response, 422)
+
+
+def test_get_revision_pending_units_page() -> None:
+    response = CLIENT.get("/unit/pending_revision?limit=1")
+    check_status(response, 200)
+    assert len(response.json()["units"]) <= 1, "Page size limit was not respected"
+
+
+def test_get_database_stats() -> None:
+    response = CLIENT.get("/workbench/database/stats")
+    check_status(response, 200)
+    stats = response.json()["stats"]
+    assert stats["schema_cache"]["hits"] > 0, "Schema lookups were not served from the cache"
+    assert stats["unit_cache"]["misses"] > 0, "Unit lookups were not recorded"
+
+
 @no_type_check
 def send_hid_event(string: str, sender: str) -> Response:
     payload = {"string": string, "name": sender}
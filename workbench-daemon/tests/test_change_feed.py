@@ -0,0 +1,191 @@
+import asyncio
+import datetime as dt
+from collections.abc import AsyncIterator
+from operator import itemgetter
+from typing import Any
+
+from feecc_workbench._change_feed import ChangeFeed
+from feecc_workbench.events import ChangeEventType, EventSubscription, StageChangeEvent, UnitChangeEvent, event_bus
+from feecc_workbench.Types import Document
+
+NOW = dt.datetime(2022, 9, 1, 10, 30)
+LOOKBACK = 10
+
+
+class FakeCursor:
+    def __init__(self, documents: list[Document]) -> None:
+        self._documents = documents
+
+    def sort(self, key: str, direction: int) -> "FakeCursor":
+        return FakeCursor(sorted(self._documents, key=itemgetter(key), reverse=direction < 0))
+
+    async def __aiter__(self) -> AsyncIterator[Document]:
+        for document in self._documents:
+            yield document
+
+
+class FakeUnitCollection:
+    """supports the `updated_at` range queries the poller makes"""
+
+    def __init__(self) -> None:
+        self.documents: dict[int, Document] = {}
+        self.queries: list[Document] = []
+
+    def write(self, document_id: int, version: int, updated_at: dt.datetime, status: str = "production") -> None:
+        self.documents[document_id] = {
+            "_id": document_id,
+            "uuid": f"uuid-{document_id}",
+            "internal_id": f"internal-{document_id}",
+            "schema_id": "schema",
+            "status": status,
+            "version": version,
+            "updated_at": updated_at,
+        }
+
+    def _select(self, query: Document) -> list[Document]:
+        self.queries.append(query)
+        condition = query["updated_at"]
+        return [
+            dict(doc)
+            for doc in self.documents.values()
+            if ("$gte" not in condition or doc["updated_at"] >= condition["$gte"])
+            and ("$gt" not in condition or doc["updated_at"] > condition["$gt"])
+        ]
+
+    def find(self, query: Document, projection: Document) -> FakeCursor:
+        return FakeCursor(self._select(query))
+
+    async def find_one(self, query: Document, projection: Document, sort: list[tuple[str, int]]) -> Document | None:
+        [(key, direction)] = sort
+        documents = sorted(self._select(query), key=itemgetter(key), reverse=direction < 0)
+        return documents[0] if documents else None
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.units = FakeUnitCollection()
+
+    def __getitem__(self, name: str) -> FakeUnitCollection:
+        assert name == "unitData"
+        return self.units
+
+
+def get_events(subscription: EventSubscription) -> list[Any]:
+    events = []
+
+    while not subscription.feed.empty():
+        events.append(subscription.feed.get_nowait())
+
+    return events
+
+
+def test_poll_watermark() -> None:
+    async def run() -> None:
+        database = FakeDatabase()
+        feed = ChangeFeed(database, event_bus, poll_interval=1, poll_lookback=LOOKBACK)
+        database.units.write(1, 4, NOW)
+        database.units.write(2, 0, NOW - dt.timedelta(minutes=5))
+
+        await feed._poll()
+
+        assert not database.units.queries, "Nothing must be read while nobody is listening"
+
+        subscription = event_bus.subscribe()
+
+        try:
+            await feed._poll()
+
+            assert not get_events(subscription), "Changes made before the first poll must not be published"
+            assert database.units.queries[-1] == {"updated_at": {"$gte": NOW - dt.timedelta(seconds=LOOKBACK)}}
+
+            database.units.write(3, 0, NOW + dt.timedelta(seconds=1))
+            database.units.write(1, 5, NOW + dt.timedelta(seconds=2))
+            # written by an instance with its clock behind, still within the lookback
+            database.units.write(2, 1, NOW - dt.timedelta(seconds=3), status="built")
+            await feed._poll()
+
+            assert [(event.type, event.unit_uuid, event.version) for event in get_events(subscription)] == [
+                (ChangeEventType.unit_updated, "uuid-2", 1),
+                (ChangeEventType.unit_created, "uuid-3", 0),
+                (ChangeEventType.unit_updated, "uuid-1", 5),
+            ]
+            assert database.units.queries[-1]["updated_at"]["$gte"] == NOW - dt.timedelta(seconds=LOOKBACK)
+
+            await feed._poll()
+
+            assert not get_events(subscription), "Versions published already must be skipped"
+            assert database.units.queries[-1]["updated_at"]["$gte"] == NOW + dt.timedelta(seconds=2 - LOOKBACK)
+
+            database.units.write(1, 6, NOW + dt.timedelta(minutes=1), status="finalized")
+            await feed._poll()
+            await feed._poll()
+
+            [event] = get_events(subscription)
+            assert event == UnitChangeEvent(
+                ChangeEventType.unit_updated, "uuid-1", "internal-1", "schema", "finalized", 6
+            )
+            assert database.units.queries[-1]["updated_at"]["$gte"] == NOW + dt.timedelta(minutes=1, seconds=-LOOKBACK)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+        await feed._poll()
+        database.units.write(1, 7, NOW + dt.timedelta(minutes=2))
+        subscription = event_bus.subscribe()
+
+        try:
+            await feed._poll()
+
+            assert not get_events(subscription), "The watermark must be looked up anew after a pause"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    asyncio.run(run())
+
+
+def test_change_stream_events() -> None:
+    feed = ChangeFeed(FakeDatabase(), event_bus, poll_interval=1, poll_lookback=LOOKBACK)
+    subscription = event_bus.subscribe()
+    unit_doc: Document = {
+        "uuid": "uuid-1",
+        "internal_id": "internal-1",
+        "schema_id": "schema",
+        "status": "built",
+        "version": 3,
+    }
+    biography: list[Document] = [
+        {"id": f"stage-{i}", "parent_unit_uuid": "uuid-1", "schema_stage_id": f"schema-stage-{i}", "number": i}
+        for i in range(3)
+    ]
+
+    try:
+        feed._handle_change(
+            {
+                "operationType": "update",
+                "ns": {"coll": "unitData"},
+                "documentKey": {"_id": 1},
+                "fullDocument": {**unit_doc, "biography": biography},
+                "updateDescription": {"updatedFields": {"biography.1.completed": True, "version": 3}},
+            }
+        )
+        feed._handle_change({"operationType": "delete", "ns": {"coll": "unitData"}, "documentKey": {"_id": 1}})
+        feed._handle_change(
+            {
+                "operationType": "insert",
+                "ns": {"coll": "productionStagesData"},
+                "documentKey": {"_id": 2},
+                "fullDocument": biography[2],
+            }
+        )
+        feed._handle_change({"operationType": "drop", "ns": {"coll": "unitData"}})
+
+        unit_updated, stage_updated, unit_deleted, stage_inserted = get_events(subscription)
+
+        assert unit_updated == UnitChangeEvent(
+            ChangeEventType.unit_updated, "uuid-1", "internal-1", "schema", "built", 3
+        )
+        assert isinstance(stage_updated, StageChangeEvent) and stage_updated.stage_id == "stage-1"
+        assert unit_deleted.type is ChangeEventType.unit_deleted
+        assert unit_deleted.unit_internal_id == "internal-1", "Deletions must be told apart by the last seen event"
+        assert isinstance(stage_inserted, StageChangeEvent) and stage_inserted.stage_id == "stage-2"
+    finally:
+        event_bus.unsubscribe(subscription)
@@ -0,0 +1,106 @@
+import datetime as dt
+
+from feecc_workbench._codec import STAGE_FIELDS, decode_stage, decode_unit, encode_stage, encode_unit
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import UnitStatus
+
+COMPONENT_SCHEMA = ProductionSchema(schema_id="test_codec_component", unit_name="Component")
+SCHEMA = ProductionSchema(
+    schema_id="test_codec_unit",
+    unit_name="Test unit",
+    production_stages=[ProductionSchemaStage(name=f"Stage {i}", stage_id=f"test_codec_stage_{i}") for i in range(3)],
+    required_components_schema_ids=[COMPONENT_SCHEMA.schema_id],
+)
+UNIT_FIELDS = ["uuid", "internal_id", "passport_ipfs_cid", "txn_hash", "serial_number", "featured_in_int_id"]
+MOMENT = dt.datetime(2022, 9, 1, 10, 30)
+
+
+def get_unit() -> Unit:
+    unit = Unit(SCHEMA, serial_number="SN-1", passport_ipfs_cid="cid", creation_time=MOMENT)
+    unit.assign_component(Unit(COMPONENT_SCHEMA))
+    stage = unit.biography[0]
+    stage.employee_name = "employee"
+    stage.session_start_time = MOMENT
+    stage.session_end_time = MOMENT + dt.timedelta(minutes=5)
+    stage.additional_info = {"note": {"values": [1, 2]}}
+    stage.prod_data_hashes = ["hash"]
+    stage.completed = True
+    unit.status = UnitStatus.revision
+    return unit
+
+
+def test_stage_round_trip() -> None:
+    stage = get_unit().biography[0]
+    stage_dict = encode_stage(stage)
+
+    assert set(stage_dict) == set(STAGE_FIELDS)
+    assert stage_dict["additional_info"] is stage.additional_info, "Values must not be copied"
+
+    decoded = decode_stage(stage_dict, is_in_db=True)
+
+    assert all(getattr(decoded, field) == getattr(stage, field) for field in STAGE_FIELDS)
+    assert decoded.is_in_db
+    assert not decoded.dirty_fields
+
+    decoded.completed = False
+    assert set(decoded.dirty_fields) == {"completed"}
+
+
+def test_stage_defaults() -> None:
+    stage_dict = {"name": "Stage", "parent_unit_uuid": "uuid", "number": 0, "schema_stage_id": "stage"}
+    stage = decode_stage(stage_dict, is_in_db=False)
+
+    assert stage.id and stage.creation_time is not None
+    assert stage.employee_name is None and not stage.completed
+    assert not stage.is_in_db
+
+
+def test_legacy_timestamps() -> None:
+    stage_dict = encode_stage(get_unit().biography[0])
+    stage_dict["session_start_time"] = "01-09-2022 10:30:00"
+    stage_dict["session_end_time"] = "01-09-2022 10:35:00"
+    stage = decode_stage(stage_dict, is_in_db=True)
+
+    assert stage.session_start_time == MOMENT
+    assert stage.session_end_time == MOMENT + dt.timedelta(minutes=5)
+    assert set(stage.dirty_fields) == {"session_start_time", "session_end_time"}, "Parsed timestamps must be rewritten"
+
+
+def test_unit_round_trip() -> None:
+    unit = get_unit()
+    unit_dict = encode_unit(unit)
+
+    assert unit_dict["schema_id"] == SCHEMA.schema_id
+    assert unit_dict["status"] == UnitStatus.revision.value
+    assert unit_dict["components_internal_ids"] == unit.components_internal_ids
+
+    biography = [decode_stage(encode_stage(stage), is_in_db=True) for stage in unit.biography]
+    component = unit.components_units[0].load()
+    decoded = decode_unit(unit_dict, SCHEMA, biography, [component])
+
+    assert all(getattr(decoded, field) == getattr(unit, field) for field in UNIT_FIELDS)
+    assert decoded.creation_time == MOMENT
+    assert decoded.status is UnitStatus.revision
+    assert decoded.schema is SCHEMA
+    assert decoded.is_in_db and not decoded.dirty_fields
+    assert decoded.components_filled and component.parent is decoded
+    assert decoded.next_pending_operation is decoded.biography[1]
+    assert decoded.total_assembly_time == dt.timedelta(minutes=5)
+    assert encode_unit(decoded) == unit_dict
+
+    decoded.serial_number = "SN-2"
+    assert set(decoded.dirty_fields) == {"serial_number"}
+
+
+def test_unit_defaults() -> None:
+    unit_dict = {"uuid": "0123456789abcdef0123456789abcdef", "schema_id": SCHEMA.schema_id}
+    unit = decode_unit(unit_dict, SCHEMA, [], [])
+
+    assert unit.status is UnitStatus.production, "Documents without a status are of units in production"
+    assert unit.internal_id == Unit(SCHEMA, uuid=unit_dict["uuid"]).internal_id
+    assert [stage.schema_stage_id for stage in unit.biography] == [
+        stage.stage_id for stage in SCHEMA.production_stages or []
+    ]
+    assert not unit.components_filled
+    assert decode_unit(unit_dict, COMPONENT_SCHEMA, [], []).status is UnitStatus.built
@@ -0,0 +1,65 @@
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.ProductionStage import ProductionStage
+from feecc_workbench.Unit import Unit
+
+COMPONENT_SCHEMA = ProductionSchema(schema_id="test_dirty_tracking_component", unit_name="Component")
+SCHEMA = ProductionSchema(
+    schema_id="test_dirty_tracking_unit",
+    unit_name="Test unit",
+    production_stages=[ProductionSchemaStage(name="Stage", stage_id="test_dirty_tracking_stage")],
+    required_components_schema_ids=[COMPONENT_SCHEMA.schema_id],
+)
+
+
+def get_stage() -> ProductionStage:
+    stage = ProductionStage(name="Stage", parent_unit_uuid="uuid", number=0, schema_stage_id="stage")
+    stage.mark_clean()
+    return stage
+
+
+def test_new_objects_are_dirty() -> None:
+    stage = ProductionStage(name="Stage", parent_unit_uuid="uuid", number=0, schema_stage_id="stage")
+    unit = Unit(SCHEMA)
+
+    assert set(stage.dirty_fields) == ProductionStage._tracked_fields
+    assert set(unit.dirty_fields) == Unit._tracked_fields
+
+
+def test_only_tracked_fields_are_dirty() -> None:
+    stage = get_stage()
+    stage.is_in_db = True
+
+    assert not stage.dirty_fields
+
+    stage.completed = True
+    assert list(stage.dirty_fields) == ["completed"]
+
+    stage.mark_clean()
+    assert not stage.dirty_fields
+
+
+def test_changes_made_during_write_stay_dirty() -> None:
+    stage = get_stage()
+    stage.completed = True
+    stage.employee_name = "employee"
+    snapshot = stage.dirty_fields
+
+    # the write of the snapshot is in progress
+    stage.completed = False
+    stage.session_end_time = None
+    stage.mark_clean(snapshot)
+
+    assert set(stage.dirty_fields) == {"completed", "session_end_time"}
+    assert stage.dirty_fields["completed"] > snapshot["completed"]
+
+
+def test_in_place_changes_made_during_write_stay_dirty() -> None:
+    unit = Unit(SCHEMA)
+    unit.serial_number = "SN-1"
+    snapshot = unit.dirty_fields
+
+    # the components list is modified in place while the write of the snapshot is in progress
+    unit.assign_component(Unit(COMPONENT_SCHEMA))
+    unit.mark_clean(snapshot)
+
+    assert list(unit.dirty_fields) == ["components_units"]
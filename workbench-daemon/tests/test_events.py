@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from feecc_workbench.events import (
+    ChangeEventType,
+    EventFilter,
+    StageChangeEvent,
+    UnitChangeEvent,
+    change_event_generator,
+    event_bus,
+)
+
+CREATED = UnitChangeEvent(ChangeEventType.unit_created, "uuid-1", "internal-1", "schema-1", "production", 0)
+UPDATED = UnitChangeEvent(ChangeEventType.unit_updated, "uuid-2", "internal-2", "schema-2", "built", 3)
+STAGE_UPDATED = StageChangeEvent(ChangeEventType.stage_updated, "uuid-1", "stage-1", "schema-stage-1", "Stage", 0, True)
+
+
+def test_filter_matching() -> None:
+    assert EventFilter().matches(CREATED) and EventFilter().matches(STAGE_UPDATED)
+    assert EventFilter(unit_uuid="uuid-1").matches(STAGE_UPDATED)
+    assert not EventFilter(unit_uuid="uuid-1").matches(UPDATED)
+    assert EventFilter(types=frozenset({ChangeEventType.unit_updated})).matches(UPDATED)
+    assert not EventFilter(types=frozenset({ChangeEventType.unit_updated})).matches(CREATED)
+    assert EventFilter(schema_id="schema-2", status="built").matches(UPDATED)
+    assert not EventFilter(schema_id="schema-2", status="production").matches(UPDATED)
+    assert not EventFilter(status="production").matches(STAGE_UPDATED), "Stage events carry no unit status"
+
+
+def test_publish_subscribe() -> None:
+    everything = event_bus.subscribe()
+    units_only = event_bus.subscribe(EventFilter(types=frozenset({ChangeEventType.unit_created})))
+
+    try:
+        assert event_bus.has_subscribers
+
+        for event in [CREATED, UPDATED, STAGE_UPDATED]:
+            event_bus.publish(event)
+
+        assert [everything.feed.get_nowait() for _ in range(3)] == [CREATED, UPDATED, STAGE_UPDATED]
+        assert units_only.feed.get_nowait() == CREATED
+        assert units_only.feed.empty()
+    finally:
+        event_bus.unsubscribe(everything)
+        event_bus.unsubscribe(units_only)
+
+    event_bus.publish(CREATED)
+
+    assert everything.feed.empty(), "Unsubscribed feeds must not get events"
+
+
+def test_slow_subscriber_loses_oldest_events() -> None:
+    subscription = event_bus.subscribe()
+    size = subscription.feed.maxsize
+    events = [UnitChangeEvent(ChangeEventType.unit_updated, "uuid", version=version) for version in range(size + 2)]
+
+    try:
+        for event in events:
+            event_bus.publish(event)
+
+        assert subscription.dropped == 2
+        assert event_bus.stats["dropped"] == 2
+        assert [subscription.feed.get_nowait() for _ in range(size)] == events[2:]
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+def test_sse_generator() -> None:
+    async def run() -> None:
+        generator = change_event_generator(EventFilter(unit_uuid="uuid-2"))
+        message = asyncio.ensure_future(generator.__anext__())
+        await asyncio.sleep(0)  # subscribed
+
+        event_bus.publish(CREATED)
+        event_bus.publish(UPDATED)
+
+        assert await message == {
+            "event": "unit_updated",
+            "data": json.dumps(
+                {
+                    "type": "unit_updated",
+                    "unit_uuid": "uuid-2",
+                    "unit_internal_id": "internal-2",
+                    "schema_id": "schema-2",
+                    "status": "built",
+                    "version": 3,
+                }
+            ),
+        }
+
+        await generator.aclose()
+
+        assert not event_bus.has_subscribers, "Closed streams must unsubscribe"
+
+    asyncio.run(run())
@@ -0,0 +1,229 @@
+import asyncio
+from pathlib import Path
+
+from feecc_workbench._journal import UnitJournal
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.Types import Document
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import UnitEvent
+
+SCHEMA = ProductionSchema(
+    schema_id="test_journal_unit",
+    unit_name="Test unit",
+    production_stages=[ProductionSchemaStage(name="Stage", stage_id="test_journal_stage")],
+)
+MAX_BYTES = 1024 * 1024
+
+
+class FakeDb:
+    """collects the applied events, failing while `is_down` is set"""
+
+    def __init__(self) -> None:
+        self.applied: list[int] = []
+        self.is_down = False
+
+    async def apply_events(self, events: list[Document]) -> None:
+        if self.is_down:
+            raise ConnectionError("DB is down")
+
+        self.applied.extend(event["seq"] for event in events)
+
+
+def get_journal(path: Path, db: FakeDb, max_bytes: int = MAX_BYTES) -> UnitJournal:
+    return UnitJournal(str(path), db.apply_events, max_bytes, retry_delay=0.01)
+
+
+async def append_events(journal: UnitJournal, count: int) -> list[Unit]:
+    units = [Unit(SCHEMA) for _ in range(count)]
+    await asyncio.gather(*(journal.append(UnitEvent.unit_created, [unit]) for unit in units))
+    return units
+
+
+def test_concurrent_appends_share_fsync(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await append_events(journal, 10)
+        await journal.close()
+
+        assert journal.appended == 10
+        assert journal.commits == 1, "Events appended during an fsync must be committed together"
+        assert len((tmp_path / "journal").read_bytes().splitlines()) == 10
+        assert db.applied == list(range(1, 11))
+
+    asyncio.run(run())
+
+
+def test_applied_events_are_checkpointed(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        db.is_down = True
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        units = await append_events(journal, 3)
+
+        assert set(journal.pending_units) == {unit.internal_id for unit in units}
+
+        db.is_down = False
+        await journal.close()
+
+        assert (tmp_path / "journal.checkpoint").read_text() == "3"
+        assert not journal.pending_units
+
+    asyncio.run(run())
+
+
+def test_journal_is_truncated_once_applied(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db, max_bytes=0)
+        await journal.recover()
+        await append_events(journal, 3)
+        await journal.close()
+
+        assert (tmp_path / "journal").stat().st_size == 0
+        assert (tmp_path / "journal.checkpoint").read_text() == "3"
+
+        # the sequence continues after the truncation
+        journal = get_journal(tmp_path / "journal", db, max_bytes=0)
+        await journal.recover()
+        await append_events(journal, 1)
+        await journal.close()
+
+        assert db.applied == [1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_unapplied_events_are_kept_on_close(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        db.is_down = True
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await append_events(journal, 2)
+        await journal.close()
+
+        assert not db.applied
+        assert not (tmp_path / "journal.checkpoint").exists()
+
+        db.is_down = False
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+
+        assert db.applied == [1, 2]
+
+    asyncio.run(run())
+
+
+def test_recovery_after_crash(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await append_events(journal, 3)
+        await journal.close()
+        assert db.applied == [1, 2, 3]
+
+        # the last two events were journaled, but the checkpoint did not make it to the disk
+        (tmp_path / "journal.checkpoint").write_text("1")
+        # and the process died in the middle of writing the next event
+        with (tmp_path / "journal").open("ab") as file:
+            file.write(b'{"seq": 4, "type": "unit_upd')
+
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+
+        assert db.applied == [2, 3], "Only the events after the checkpoint must be applied"
+        assert journal.stats["last_seq"] == 3
+        assert len((tmp_path / "journal").read_bytes().splitlines()) == 3, "The torn write must be dropped"
+
+        await append_events(journal, 1)
+        await journal.close()
+
+        assert db.applied == [2, 3, 4]
+
+        # nothing is left to apply on the next start
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await journal.close()
+
+        assert not db.applied
+
+    asyncio.run(run())
+
+
+def test_recovery_after_crash_before_newline(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        db.is_down = True
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await append_events(journal, 2)
+        await journal.close()
+
+        # the process died right before the newline of the last event made it to the disk
+        with (tmp_path / "journal").open("rb+") as file:
+            file.truncate(file.seek(0, 2) - 1)
+
+        db.is_down = False
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await append_events(journal, 1)
+        await journal.close()
+
+        assert db.applied == [1, 2, 3]
+        assert len((tmp_path / "journal").read_bytes().splitlines()) == 3
+
+        # the journal is still readable on the next start
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await journal.close()
+
+        assert journal.stats["last_seq"] == 3
+        assert not db.applied
+
+    asyncio.run(run())
+
+
+def test_replay_retries_until_db_is_back(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        db.is_down = True
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        await append_events(journal, 2)
+        await asyncio.sleep(0.05)
+
+        assert journal.replay_failures > 0
+        assert len(journal.pending_units) == 2
+
+        db.is_down = False
+        await asyncio.sleep(0.05)
+
+        assert db.applied == [1, 2]
+        assert not journal.pending_units
+
+        await journal.close()
+
+    asyncio.run(run())
+
+
+def test_close_during_commit(tmp_path: Path) -> None:
+    async def run() -> None:
+        db = FakeDb()
+        journal = get_journal(tmp_path / "journal", db)
+        await journal.recover()
+        append = asyncio.create_task(journal.append(UnitEvent.unit_created, [Unit(SCHEMA)]))
+        await asyncio.sleep(0)  # the commit is in progress
+        await journal.close()
+        await append
+
+        assert db.applied == [1]
+        assert asyncio.all_tasks() == {asyncio.current_task()}, "No replayer must be left running after close"
+
+    asyncio.run(run())
@@ -0,0 +1,227 @@
+import asyncio
+import datetime as dt
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from feecc_workbench import sqlite_database
+from feecc_workbench.exceptions import UnitNotFoundError
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.Singleton import SingletonMeta
+from feecc_workbench.sqlite_database import SqliteWrapper
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import UnitStatus
+
+LEAF_SCHEMA = ProductionSchema(schema_id="test_sqlite_leaf", unit_name="Leaf")
+MIDDLE_SCHEMA = ProductionSchema(
+    schema_id="test_sqlite_middle", unit_name="Middle", required_components_schema_ids=[LEAF_SCHEMA.schema_id]
+)
+ROOT_SCHEMA = ProductionSchema(
+    schema_id="test_sqlite_root",
+    unit_name="Root",
+    production_stages=[ProductionSchemaStage(name="Assembly", stage_id="test_sqlite_assembly")],
+    required_components_schema_ids=[MIDDLE_SCHEMA.schema_id],
+)
+SCHEMAS = [LEAF_SCHEMA, MIDDLE_SCHEMA, ROOT_SCHEMA]
+
+
+def get_database(path: Path) -> SqliteWrapper:
+    """a fresh storage engine on the given file, bypassing the shared singleton instance"""
+    SingletonMeta._instances.pop(SqliteWrapper, None)
+    database = SqliteWrapper()
+    database._path = str(path)
+    SingletonMeta._instances.pop(SqliteWrapper, None)
+    return database
+
+
+def build_tree() -> tuple[Unit, Unit, Unit]:
+    """root -> middle -> leaf, the root having a pending stage"""
+    leaf, middle, root = Unit(LEAF_SCHEMA), Unit(MIDDLE_SCHEMA), Unit(ROOT_SCHEMA)
+    middle.assign_component(leaf)
+    root.assign_component(middle)
+    return root, middle, leaf
+
+
+def get_version(database: SqliteWrapper, unit: Unit) -> int:
+    version: int = database._fetch_all("SELECT version FROM units WHERE uuid = ?", unit.uuid)[0]["version"]
+    return version
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    async def run() -> None:
+        database = get_database(tmp_path / "db.sqlite3")
+
+        try:
+            await database.upsert_schemas(SCHEMAS)
+            root, middle, leaf = build_tree()
+            root.serial_number = "SN-1"
+            stage = root.biography[0]
+            stage.employee_name = "employee"
+            stage.session_start_time = dt.datetime(2022, 9, 1, 10, 0, 0)
+            stage.prod_data_hashes = ["hash"]
+            await database.push_unit(root)
+
+            loaded = await database.get_unit_by_internal_id(root.internal_id)
+
+            assert loaded.uuid == root.uuid
+            assert loaded.serial_number == "SN-1"
+            assert loaded.status is UnitStatus.production
+            assert loaded.components_internal_ids == [middle.internal_id]
+            assert [unit.internal_id for unit in loaded.tree] == [
+                root.internal_id,
+                middle.internal_id,
+                leaf.internal_id,
+            ]
+            assert [unit.status for unit in loaded.tree] == [UnitStatus.production, UnitStatus.built, UnitStatus.built]
+
+            loaded_stage = loaded.biography[0]
+            assert loaded_stage.id == stage.id
+            assert loaded_stage.employee_name == "employee"
+            assert loaded_stage.session_start_time == dt.datetime(2022, 9, 1, 10, 0, 0)
+            assert loaded_stage.prod_data_hashes == ["hash"]
+            assert not loaded_stage.completed
+
+            with pytest.raises(UnitNotFoundError):
+                await database.get_unit_by_internal_id("0000000000000")
+        finally:
+            database.close_connection()
+
+    asyncio.run(run())
+
+
+def test_only_dirty_rows_are_written(tmp_path: Path) -> None:
+    async def run() -> None:
+        database = get_database(tmp_path / "db.sqlite3")
+
+        try:
+            root, middle, leaf = build_tree()
+            await database.push_unit(root)
+            assert not root.dirty_fields and not root.biography[0].dirty_fields
+            assert [get_version(database, unit) for unit in (root, middle, leaf)] == [0, 0, 0]
+
+            statements = database.statements
+            await database.push_unit(root)
+            assert database.statements == statements, "Clean units must not be written again"
+
+            root.biography[0].employee_name = "employee"
+            await database.push_unit(root)
+            assert database.statements == statements + 2, "Only the stage is written, with the version bump"
+            assert [get_version(database, unit) for unit in (root, middle, leaf)] == [1, 0, 0]
+
+            leaf.serial_number = "SN-1"
+            await database.push_unit(root)
+            assert [get_version(database, unit) for unit in (root, middle, leaf)] == [1, 0, 1]
+
+            await database.unit_update_single_field(root.internal_id, "txn_hash", "hash")
+            assert get_version(database, root) == 2
+
+            with pytest.raises(ValueError):
+                await database.unit_update_single_field(root.internal_id, "version", 0)
+        finally:
+            database.close_connection()
+
+    asyncio.run(run())
+
+
+def test_keyset_pagination(tmp_path: Path) -> None:
+    async def run() -> None:
+        database = get_database(tmp_path / "db.sqlite3")
+
+        try:
+            await database.upsert_schemas(SCHEMAS)
+            built = [Unit(LEAF_SCHEMA) for _ in range(5)]
+            in_production = [Unit(ROOT_SCHEMA) for _ in range(2)]
+            await database.insert_units([built[0], in_production[0], *built[1:], in_production[1]])
+
+            pages: list[list[str]] = []
+            cursor: str | None = None
+
+            while True:
+                page, cursor = await database.get_unit_ids_and_names_by_status(UnitStatus.built, cursor, limit=2)
+                pages.append([entry["internal_id"] for entry in page])
+
+                if cursor is None:
+                    break
+
+            assert pages == [[unit.internal_id for unit in built[i : i + 2]] for i in range(0, 5, 2)]
+            assert all(entry["unit_name"] == "Leaf" for entry in page)
+
+            page, cursor = await database.get_unit_ids_and_names_by_status(UnitStatus.production)
+            assert [entry["internal_id"] for entry in page] == [unit.internal_id for unit in in_production]
+            assert cursor is None
+
+            entries = [entry async for entry in database.iter_unit_ids_and_names_by_status(UnitStatus.built, 2)]
+            assert [entry["internal_id"] for entry in entries] == [unit.internal_id for unit in built]
+
+            with pytest.raises(ValueError):
+                await database.get_unit_ids_and_names_by_status(UnitStatus.built, "abc", limit=2)
+        finally:
+            database.close_connection()
+
+    asyncio.run(run())
+
+
+def test_legacy_stage_timestamps_are_migrated(tmp_path: Path) -> None:
+    path = tmp_path / "db.sqlite3"
+
+    async def push() -> Unit:
+        database = get_database(path)
+
+        try:
+            await database.upsert_schemas(SCHEMAS)
+            unit = Unit(ROOT_SCHEMA)
+            await database.push_unit(unit, include_components=False)
+            return unit
+        finally:
+            database.close_connection()
+
+    unit = asyncio.run(push())
+
+    # downgrade the file to the pre-migration layout
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "UPDATE production_stages SET session_start_time = ?, session_end_time = ?",
+        ("01-09-2022 10:00:00", "01-09-2022 11:30:15"),
+    )
+    connection.execute("PRAGMA user_version = 0")
+    connection.commit()
+    connection.close()
+
+    async def load() -> Unit:
+        database = get_database(path)
+
+        try:
+            return await database.get_unit_by_internal_id(unit.internal_id)
+        finally:
+            database.close_connection()
+
+    stage = asyncio.run(load()).biography[0]
+    assert stage.session_start_time == dt.datetime(2022, 9, 1, 10, 0, 0)
+    assert stage.session_end_time == dt.datetime(2022, 9, 1, 11, 30, 15)
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == len(sqlite_database._MIGRATIONS)
+    connection.close()
+
+
+def test_too_deep_tree_is_rejected(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sqlite_database, "UNIT_TREE_MAX_DEPTH", 1)
+
+    async def run() -> None:
+        database = get_database(tmp_path / "db.sqlite3")
+
+        try:
+            await database.upsert_schemas(SCHEMAS)
+            root, middle, _ = build_tree()
+            await database.push_unit(root)
+
+            loaded = await database.get_unit_by_internal_id(middle.internal_id)
+            assert loaded.components_internal_ids == middle.components_internal_ids
+
+            with pytest.raises(UnitNotFoundError):
+                await database.get_unit_by_internal_id(root.internal_id)
+        finally:
+            database.close_connection()
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+import asyncio
+from uuid import uuid4
+
+from feecc_workbench.Employee import Employee
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.ProductionStage import ProductionStage
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_utils import STAGE_NUMBER_STEP, UnitStatus
+
+SCHEMA = ProductionSchema(
+    schema_id="test_unit_stages",
+    unit_name="Test unit",
+    production_stages=[ProductionSchemaStage(name=f"Stage {i}", stage_id=f"test_unit_stage_{i}") for i in range(3)],
+)
+EMPLOYEE = Employee(rfid_card_id="1111111111", name="Employee", position="Assembler")
+
+
+def end_stage(unit: Unit, premature: bool) -> None:
+    unit.start_operation(EMPLOYEE)
+    asyncio.run(unit.end_operation(premature=premature))
+
+
+def mark_clean(unit: Unit) -> None:
+    """pretend the unit has just been written into the DB"""
+    for stage in unit.biography:
+        stage.mark_clean(stage.dirty_fields)
+
+
+def first_pending(unit: Unit) -> ProductionStage | None:
+    return next((stage for stage in unit.biography if not stage.completed), None)
+
+
+def assert_ordered(unit: Unit) -> None:
+    numbers = [stage.number for stage in unit.biography]
+    assert numbers == sorted(set(numbers)), f"Stage numbers must be unique and ascending: {numbers}"
+
+
+def test_premature_end_keeps_following_stages() -> None:
+    unit = Unit(SCHEMA)
+    mark_clean(unit)
+    end_stage(unit, premature=True)
+
+    assert [stage.number for stage in unit.biography] == [0, 1, STAGE_NUMBER_STEP, 2 * STAGE_NUMBER_STEP]
+    assert [stage.schema_stage_id for stage in unit.biography[:2]] == ["test_unit_stage_0"] * 2
+    assert unit.biography[0].ended_prematurely and not unit.biography[1].completed
+    assert not any(stage.dirty_fields for stage in unit.biography[2:]), "Following stages must not be rewritten"
+
+
+def test_renumbering_once_gap_is_used_up() -> None:
+    unit = Unit(SCHEMA)
+    following = unit.biography[1]
+    renumbered_at = []
+
+    for i in range(1, STAGE_NUMBER_STEP + 10):
+        mark_clean(unit)
+        number = following.number
+        end_stage(unit, premature=True)
+        assert_ordered(unit)
+
+        if following.number != number:
+            renumbered_at.append(i)
+            assert following.dirty_fields and unit.biography[-1].dirty_fields
+
+    assert renumbered_at == [STAGE_NUMBER_STEP], "Following stages must be renumbered only once the gap is used up"
+    assert unit.next_pending_operation is unit.biography[-3]
+    assert unit.next_pending_operation.schema_stage_id == "test_unit_stage_0"
+
+
+def test_densely_numbered_stages_are_spread_out() -> None:
+    uuid = uuid4().hex
+    biography = [
+        ProductionStage(name=f"Stage {i}", parent_unit_uuid=uuid, number=i, schema_stage_id=f"test_unit_stage_{i}")
+        for i in range(3)
+    ]
+    unit = Unit(SCHEMA, uuid=uuid, biography=biography)
+    end_stage(unit, premature=True)
+
+    assert [stage.number for stage in unit.biography] == [0, 1, STAGE_NUMBER_STEP, 2 * STAGE_NUMBER_STEP]
+
+
+def test_pending_stage_cursor() -> None:
+    unit = Unit(SCHEMA)
+
+    for premature in [True, True, False, True, False]:
+        assert unit.next_pending_operation is first_pending(unit)
+        end_stage(unit, premature)
+        assert unit.next_pending_operation is first_pending(unit)
+        assert_ordered(unit)
+
+    assert [stage.schema_stage_id[-1] for stage in unit.biography] == list("000112")
+    assert [stage.ended_prematurely for stage in unit.biography] == [True, True, False, True, False, False]
+    assert unit.next_pending_operation is first_pending(unit) is unit.biography[-1]
+    assert unit.status is UnitStatus.production
+
+    end_stage(unit, premature=False)
+
+    assert unit.next_pending_operation is None
+    assert unit.status is UnitStatus.built
@@ -0,0 +1,121 @@
+import bson
+import pytest
+
+from feecc_workbench import _unit_cache
+from feecc_workbench._unit_cache import UnitCache, UnitTreeDocuments
+from feecc_workbench.Types import Document
+
+MAX_BYTES = 1024 * 1024
+
+
+def get_tree(root_id: str, *component_ids: str, version: int = 0) -> UnitTreeDocuments:
+    unit_docs: dict[str, Document] = {
+        internal_id: {"internal_id": internal_id, "uuid": f"uuid-{internal_id}", "version": version}
+        for internal_id in [root_id, *component_ids]
+    }
+    stage_docs: dict[str, list[Document]] = {
+        doc["uuid"]: [{"id": f"stage-{doc['uuid']}"}] for doc in unit_docs.values()
+    }
+    return UnitTreeDocuments(unit_docs[root_id], unit_docs, stage_docs)
+
+
+def get_size(tree: UnitTreeDocuments) -> int:
+    return len(bson.encode({"unit": tree.unit_dict, "units": tree.unit_docs, "stages": tree.stage_docs}))
+
+
+def test_hits_are_fresh_copies() -> None:
+    cache = UnitCache(MAX_BYTES, 16, 60)
+    cache.put("root", get_tree("root", "component", version=3), cache.generation)
+    cached = cache.get("root")
+    assert cached is not None
+    tree, versions = cached
+
+    assert versions == {"root": 3, "component": 3}
+    assert tree.unit_dict == get_tree("root", "component", version=3).unit_dict
+
+    tree.unit_dict["version"] = 4
+    tree.stage_docs.clear()
+    cached = cache.get("root")
+
+    assert cached is not None and cached[0] == get_tree("root", "component", version=3)
+
+
+def test_stale_and_invalidated_trees_are_dropped() -> None:
+    cache = UnitCache(MAX_BYTES, 16, 60)
+    cache.put("root", get_tree("root", "component"), cache.generation)
+    cache.put("other_root", get_tree("other_root", "other_component"), cache.generation)
+
+    # a writer elsewhere has changed the tree, as told by the versions in the DB
+    cache.mark_stale("root")
+
+    assert cache.get("root") is None
+    assert cache.stale == 1
+
+    # a local write of a component drops every tree containing it
+    cache.put("root", get_tree("root", "component"), cache.generation)
+    cache.invalidate(["other_component"])
+
+    assert cache.get("other_root") is None
+    assert cache.get("root") is not None
+    assert cache.invalidations == 1
+    assert cache.stats["size_bytes"] == get_size(get_tree("root", "component"))
+
+
+def test_fetch_racing_a_write_is_not_cached() -> None:
+    cache = UnitCache(MAX_BYTES, 16, 60)
+    generation = cache.generation
+
+    # the tree is written while it is being fetched, so the fetched documents might be outdated
+    cache.invalidate(["component"])
+    cache.put("root", get_tree("root", "component"), generation)
+    cache.remember_missing("missing", generation)
+
+    assert cache.get("root") is None
+    assert not cache.is_known_missing("missing")
+
+    cache.put("root", get_tree("root", "component"), cache.generation)
+
+    assert cache.get("root") is not None
+
+
+def test_missing_units_expire(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr(_unit_cache, "monotonic", lambda: now)
+    cache = UnitCache(MAX_BYTES, 2, 10)
+    cache.remember_missing("missing", cache.generation)
+
+    now += 5
+    assert cache.is_known_missing("missing")
+
+    now += 10
+    assert not cache.is_known_missing("missing")
+    assert cache.stats["unknown_units"] == 0
+
+    # inserting a unit forgets it was missing
+    cache.remember_missing("missing", cache.generation)
+    cache.invalidate(["missing"])
+
+    assert not cache.is_known_missing("missing")
+
+    # the oldest entries are dropped once there are too many
+    for internal_id in ["first", "second", "third"]:
+        cache.remember_missing(internal_id, cache.generation)
+
+    assert [cache.is_known_missing(internal_id) for internal_id in ["first", "second", "third"]] == [False, True, True]
+
+
+def test_eviction() -> None:
+    tree_size = get_size(get_tree("root_0"))
+    cache = UnitCache(2 * tree_size, 16, 60)
+
+    for i in range(3):
+        cache.put(f"root_{i}", get_tree(f"root_{i}"), cache.generation)
+
+    assert cache.get("root_0") is None, "The least recently used tree must be evicted"
+    assert cache.evictions == 1
+
+    cache.get("root_1")
+    cache.put("root_3", get_tree("root_3"), cache.generation)
+
+    assert cache.get("root_1") is not None and cache.get("root_2") is None
+    assert cache.stats["size_bytes"] == 2 * tree_size
@@ -0,0 +1,119 @@
+from feecc_workbench._codec import encode_stage, encode_unit
+from feecc_workbench._db_utils import _get_unit_from_raw_db_data
+from feecc_workbench._unit_proxy import UnitProxy
+from feecc_workbench.models import ProductionSchema, ProductionSchemaStage
+from feecc_workbench.Unit import Unit
+from feecc_workbench.unit_tree import UnitTree
+from feecc_workbench.unit_utils import UnitStatus, get_first_unit_matching_status
+
+LEAF_SCHEMA = ProductionSchema(schema_id="test_tree_leaf", unit_name="Leaf")
+OTHER_LEAF_SCHEMA = ProductionSchema(schema_id="test_tree_other_leaf", unit_name="Other leaf")
+MIDDLE_SCHEMA = ProductionSchema(
+    schema_id="test_tree_middle",
+    unit_name="Middle",
+    required_components_schema_ids=[LEAF_SCHEMA.schema_id, OTHER_LEAF_SCHEMA.schema_id],
+)
+ROOT_SCHEMA = ProductionSchema(
+    schema_id="test_tree_root",
+    unit_name="Root",
+    production_stages=[ProductionSchemaStage(name="Assembly", stage_id="test_tree_assembly")],
+    required_components_schema_ids=[MIDDLE_SCHEMA.schema_id, LEAF_SCHEMA.schema_id],
+)
+SCHEMAS = {schema.schema_id: schema for schema in [LEAF_SCHEMA, OTHER_LEAF_SCHEMA, MIDDLE_SCHEMA, ROOT_SCHEMA]}
+
+
+def build_tree() -> tuple[Unit, Unit, Unit, Unit, Unit]:
+    """root -> (middle -> (leaf, other leaf), second leaf), assembled with the trees indexed beforehand"""
+    leaf, other_leaf, second_leaf = Unit(LEAF_SCHEMA), Unit(OTHER_LEAF_SCHEMA), Unit(LEAF_SCHEMA)
+    middle, root = Unit(MIDDLE_SCHEMA), Unit(ROOT_SCHEMA)
+    assert middle.tree.root is middle and root.tree.root is root
+
+    middle.assign_component(leaf)
+    middle.assign_component(other_leaf)
+    root.assign_component(middle)
+    root.assign_component(second_leaf)
+    return root, middle, leaf, other_leaf, second_leaf
+
+
+def assert_same_index(tree: UnitTree, root: Unit) -> None:
+    rebuilt = UnitTree(root)
+    assert list(tree) == list(rebuilt)
+    assert list(tree.post_order()) == list(rebuilt.post_order())
+
+    for unit in rebuilt:
+        assert tree.parent(unit) is rebuilt.parent(unit)
+        assert list(tree.subtree(unit)) == list(rebuilt.subtree(unit))
+
+    for status in UnitStatus:
+        assert tree.first_with_status(status) is rebuilt.first_with_status(status)
+
+
+def test_pre_order() -> None:
+    leaf, other_leaf, second_leaf = Unit(LEAF_SCHEMA), Unit(OTHER_LEAF_SCHEMA), Unit(LEAF_SCHEMA)
+    middle = Unit(MIDDLE_SCHEMA, components_units=[leaf, other_leaf])
+    root = Unit(ROOT_SCHEMA, components_units=[middle, second_leaf])
+    tree = root.tree
+
+    assert len(tree) == 5
+    assert list(tree) == [root, middle, leaf, other_leaf, second_leaf]
+    assert list(tree.post_order()) == [second_leaf, other_leaf, leaf, middle, root]
+    assert list(tree.subtree(middle)) == [middle, leaf, other_leaf]
+    assert list(tree.subtree(second_leaf)) == [second_leaf]
+    assert tree.parent(root) is None
+    assert tree.parent(leaf) is middle
+    assert tree.parent(second_leaf) is root
+    assert leaf in tree and Unit(LEAF_SCHEMA) not in tree
+
+
+def test_add_component() -> None:
+    root, middle, leaf, other_leaf, second_leaf = build_tree()
+
+    assert list(root.tree) == [root, middle, leaf, other_leaf, second_leaf]
+    assert_same_index(root.tree, root)
+    assert_same_index(middle.tree, middle)
+
+
+def test_nested_status_changes() -> None:
+    root, middle, leaf, other_leaf, second_leaf = build_tree()
+
+    assert root.tree.first_with_status(UnitStatus.production) is root
+    assert root.tree.first_with_status(UnitStatus.built) is middle
+
+    other_leaf.status = UnitStatus.revision
+    middle.status = UnitStatus.approved
+
+    assert root.tree.first_with_status(UnitStatus.revision) is other_leaf
+    assert middle.tree.first_with_status(UnitStatus.revision) is other_leaf
+    assert root.tree.first_with_status(UnitStatus.built) is leaf
+    assert root.tree.first_with_status(UnitStatus.revision, UnitStatus.approved) is middle
+    assert get_first_unit_matching_status(root, UnitStatus.built, UnitStatus.revision) is leaf
+    assert_same_index(root.tree, root)
+    assert_same_index(middle.tree, middle)
+
+    other_leaf.status = UnitStatus.built
+
+    assert root.tree.first_with_status(UnitStatus.revision) is None
+    assert_same_index(root.tree, root)
+
+
+def test_first_unit_matching_status_over_proxies() -> None:
+    root, middle, leaf, other_leaf, second_leaf = build_tree()
+    other_leaf.status = UnitStatus.revision
+    unit_docs = {unit.internal_id: encode_unit(unit) for unit in root.tree}
+    stage_docs = {unit.uuid: [encode_stage(stage) for stage in unit.biography] for unit in root.tree}
+    loaded_root = _get_unit_from_raw_db_data(unit_docs[root.internal_id], unit_docs, stage_docs, SCHEMAS, 8)
+    middle_proxy, second_leaf_proxy = loaded_root.components_units
+    assert isinstance(middle_proxy, UnitProxy) and isinstance(second_leaf_proxy, UnitProxy)
+
+    found = get_first_unit_matching_status(loaded_root, UnitStatus.revision)
+
+    assert isinstance(found, Unit)
+    assert found.internal_id == other_leaf.internal_id
+    assert found.parent is middle_proxy
+    assert not middle_proxy.is_loaded and not second_leaf_proxy.is_loaded, "Only the found unit must be loaded"
+
+    # the status change of the loaded unit reaches the index of the root through the proxy
+    found.status = UnitStatus.built
+
+    assert loaded_root.tree.first_with_status(UnitStatus.revision) is None
+    assert not middle_proxy.is_loaded
@@ -0,0 +1,121 @@
+import asyncio
+
+from feecc_workbench._write_behind import WriteBehindQueue
+from feecc_workbench.models import ProductionSchema
+from feecc_workbench.Unit import Unit
+
+SCHEMA = ProductionSchema(schema_id="test_write_behind_unit", unit_name="Test unit")
+
+
+class FakeDb:
+    """records the flushed batches, failing the units listed in `failing`"""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.batches: list[list[str]] = []
+        self.failing: set[str] = set()
+        self.delay = delay
+
+    async def flush_units(self, units: list[Unit]) -> dict[str, bool]:
+        await asyncio.sleep(self.delay)
+        self.batches.append([unit.uuid for unit in units])
+        return {unit.uuid: unit.uuid not in self.failing for unit in units}
+
+
+def test_flush_on_size() -> None:
+    async def run() -> None:
+        db = FakeDb()
+        queue = WriteBehindQueue(db.flush_units, max_pending=3, max_delay=60)
+        units = [Unit(SCHEMA) for _ in range(3)]
+
+        for unit in units[:2]:
+            queue.enqueue(unit)
+        await asyncio.sleep(0.01)
+
+        assert not db.batches, "Nothing must be written below the threshold"
+        assert set(queue.pending_units) == {unit.internal_id for unit in units[:2]}
+
+        queue.enqueue(units[2])
+        await asyncio.sleep(0.01)
+
+        assert db.batches == [[unit.uuid for unit in units]]
+        assert not queue.pending_units
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_flush_on_delay() -> None:
+    async def run() -> None:
+        db = FakeDb()
+        queue = WriteBehindQueue(db.flush_units, max_pending=100, max_delay=0.05)
+        unit = Unit(SCHEMA)
+        queue.enqueue(unit)
+        queue.enqueue(unit)
+        await asyncio.sleep(0.01)
+
+        assert not db.batches
+
+        await asyncio.sleep(0.1)
+
+        assert db.batches == [[unit.uuid]], "Repeated pushes must be coalesced"
+        assert queue.stats["written"] == 1 and queue.stats["coalesced"] == 1
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_failed_units_are_retried() -> None:
+    async def run() -> None:
+        db = FakeDb()
+        queue = WriteBehindQueue(db.flush_units, max_pending=100, max_delay=60)
+        unit, other_unit = Unit(SCHEMA), Unit(SCHEMA)
+        db.failing.add(unit.uuid)
+        queue.enqueue(unit)
+        queue.enqueue(other_unit)
+        await queue.flush()
+
+        assert list(queue.pending_units) == [unit.internal_id]
+        assert queue.failures == 1
+
+        db.failing.clear()
+        await queue.flush()
+
+        assert db.batches == [[unit.uuid, other_unit.uuid], [unit.uuid]]
+        assert not queue.pending_units
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_shutdown_flush() -> None:
+    async def run() -> None:
+        db = FakeDb()
+        queue = WriteBehindQueue(db.flush_units, max_pending=100, max_delay=60)
+        units = [Unit(SCHEMA) for _ in range(2)]
+
+        for unit in units:
+            queue.enqueue(unit)
+        await queue.close()
+
+        assert db.batches == [[unit.uuid for unit in units]]
+        assert not queue.pending_units
+        assert asyncio.all_tasks() == {asyncio.current_task()}, "No flusher must be left running after close"
+
+    asyncio.run(run())
+
+
+def test_close_during_flush() -> None:
+    async def run() -> None:
+        db = FakeDb(delay=0.05)
+        queue = WriteBehindQueue(db.flush_units, max_pending=1, max_delay=60)
+        unit, other_unit = Unit(SCHEMA), Unit(SCHEMA)
+        queue.enqueue(unit)
+        await asyncio.sleep(0.01)  # the flush is in progress
+        queue.enqueue(other_unit)
+        await queue.close()
+
+        assert db.batches == [[unit.uuid], [other_unit.uuid]], "The write in progress must not be interrupted"
+        assert not queue.pending_units
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(run())